@@ -1,11 +1,12 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import asyncio
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import time
 import logging
-import pytz
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
@@ -17,19 +18,118 @@ logging.basicConfig(
 )
 logger = logging.getLogger("paperflux.app")
 
+from paperflux.src.models.models import PaperDetail
 from paperflux.src.services.database import DatabaseService
-from paperflux.src.services.paper_processor import PaperProcessor
-from paperflux.src.services.scheduler import PaperScheduler
-from paperflux.src.config.settings import TEMP_DIR
+from paperflux.src.services.renderer import content_hash
+from paperflux.src.services.profiling import ProfileSession, is_profiling_enabled
+from paperflux.src.config.settings import TEMP_DIR, READ_ONLY, PAGE_SIZE, METRICS_PORT, PROGRESS_STALE_SECONDS
+
+# How long metadata and paper lists may be served from cache between reruns
+METADATA_CACHE_TTL_SECONDS = 5
+PAPERS_CACHE_TTL_SECONDS = 30
+# How often the progress panel refreshes itself while a run is in progress
+PROGRESS_REFRESH_SECONDS = 5
+
+# Pre-rendered explanations are shown in a scrollable frame with math typeset by KaTeX
+EXPLANATION_FRAME_HEIGHT = 900
+EXPLANATION_PAGE_TEMPLATE = """
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
+<script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"></script>
+<script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js"
+    onload="renderMathInElement(document.body, {delimiters: [
+        {left: '$$', right: '$$', display: true},
+        {left: '\\\\[', right: '\\\\]', display: true},
+        {left: '$', right: '$', display: false},
+        {left: '\\\\(', right: '\\\\)', display: false}
+    ], throwOnError: false});"></script>
+<style>
+    body { font-family: "Source Sans Pro", sans-serif; line-height: 1.6; color: #31333F; }
+    pre { background: #f0f2f6; padding: 0.75em; overflow-x: auto; }
+    table { border-collapse: collapse; }
+    th, td { border: 1px solid #e6e9ef; padding: 0.25em 0.5em; }
+</style>
+<body>%s</body>
+"""
 
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Initialize services
-db_service = DatabaseService()
-paper_processor = PaperProcessor()
+# Services are created once per server process and shared across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def get_db_service():
+    return DatabaseService()
+
+# Processing services are imported on first use so viewers never load the analysis stack
+@st.cache_resource(show_spinner=False)
+def get_paper_processor():
+    from paperflux.src.services.paper_processor import PaperProcessor
+    return PaperProcessor()
+
+@st.cache_resource(show_spinner=False)
+def get_qa_service():
+    from paperflux.src.services.qa import PaperQAService
+    return PaperQAService()
+
+@st.cache_resource(show_spinner=False)
+def start_scheduler():
+    # Start the scheduler in the background
+    from paperflux.src.services.scheduler import PaperScheduler
+    if METRICS_PORT:
+        from paperflux.src.services.metrics import MetricsRegistry
+        MetricsRegistry().start_server(METRICS_PORT)
+    scheduler = PaperScheduler()
+    scheduler.start_scheduler()
+    return scheduler
+
+@st.cache_data(ttl=METADATA_CACHE_TTL_SECONDS, show_spinner=False)
+def load_processing_status():
+    """Read processing metadata and whether a manual run is allowed in one go"""
+    db_service = get_db_service()
+    metadata = db_service.get_processing_metadata()
+    should_process = db_service.should_process_today(metadata)
+    return metadata, should_process
+
+@st.cache_data(ttl=PAPERS_CACHE_TTL_SECONDS, show_spinner=False)
+def load_papers_count():
+    return get_db_service().get_papers_count()
+
+@st.cache_data(ttl=PAPERS_CACHE_TTL_SECONDS, show_spinner=False)
+def load_papers_page(cursor, backward):
+    """Load one page of list entries along with their display titles"""
+    page = get_db_service().get_papers_page(cursor, backward)
+    page["titles"] = [f"{p.title[:50]}..." for p in page["papers"]]
+    return page
+
+@st.cache_data(ttl=PAPERS_CACHE_TTL_SECONDS, show_spinner=False)
+def load_paper(paper_id):
+    """Load a single paper, deriving its display strings once per load"""
+    paper = get_db_service().get_paper_by_id(paper_id)
+    if paper is None:
+        return None
+    detail = PaperDetail.from_paper(paper)
+    # Only serve the pre-rendered artifact if it was rendered from this exact explanation
+    if detail.explanation_html and paper.explanation_hash != content_hash(paper.explanation or ""):
+        detail.explanation_html = None
+    return detail
 
-# Start the scheduler in the background
-scheduler = PaperScheduler()
+@st.cache_resource(show_spinner=False)
+def get_prefetch_executor():
+    # One worker shared by every session, instead of a new thread per rerun
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="paperflux-prefetch")
+
+def prefetch_papers(paper_ids):
+    """Warm the database cache for papers the user is likely to open next"""
+    pending = st.session_state.get("prefetch_future")
+    if not paper_ids or (pending is not None and not pending.done()):
+        return
+    st.session_state.prefetch_future = get_prefetch_executor().submit(
+        get_db_service().prefetch_papers, paper_ids
+    )
+
+def go_to_page(cursor, backward, page_number, paper_index):
+    st.session_state.page_cursor = cursor
+    st.session_state.page_backward = backward
+    st.session_state.page_number = page_number
+    st.session_state.current_paper_index = paper_index
 
 # Function to run asyncio tasks from Streamlit
 def run_async(func):
@@ -37,7 +137,7 @@ def run_async(func):
     return loop.run_until_complete(func)
 
 # Function to trigger paper processing in background
-def process_papers_background():
+def process_papers_background(paper_processor):
     try:
         st.session_state.processing_started = True
         run_async(paper_processor.process_papers())
@@ -46,22 +146,58 @@ def process_papers_background():
         logger.error(f"Error in background processing: {str(e)}")
         st.session_state.processing_started = False
 
+def is_progress_live(progress):
+    """Whether a progress document belongs to a run that is still going"""
+    if not progress or progress.get("status") != "running":
+        return False
+    age = (datetime.utcnow() - progress["updated_at"]).total_seconds()
+    return age < PROGRESS_STALE_SECONDS
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+@st.fragment(run_every=PROGRESS_REFRESH_SECONDS)
+def render_processing_progress():
+    """Show the progress the processor publishes, refreshing only this panel while it runs"""
+    metadata, _ = load_processing_status()
+    progress = metadata.progress
+    if progress and progress.get("status") in ("completed", "failed") and not metadata.is_processing:
+        # The run finished since the page was drawn, redraw everything
+        st.session_state.processing_started = False
+        st.rerun()
+
+    if not progress or not progress.get("total"):
+        st.info("Processing papers... This may take several minutes.")
+        return
+
+    counts = progress["counts"]
+    total = progress["total"]
+    finished = counts["stored"] + counts["failed"] + counts["skipped"]
+    st.progress(min(finished / total, 1.0), text=f"{finished} of {total} papers processed")
+    st.caption(
+        f"Downloaded {counts['downloaded']} · Analyzed {counts['analyzed']} · "
+        f"Stored {counts['stored']} · Skipped {counts['skipped']} · Failed {counts['failed']}"
+    )
+    if progress.get("eta_seconds") is not None:
+        st.caption(f"About {format_duration(progress['eta_seconds'])} remaining")
+    if progress.get("failures"):
+        with st.expander(f"Recent failures ({len(progress['failures'])})"):
+            for failure in progress["failures"]:
+                st.markdown(f"- `{failure['paper_id']}` ({failure['stage']}): {failure['error']}")
+
 # Get download link for paper
-def get_pdf_download_link(paper_id, paper_title):
+def get_pdf_download_link(paper):
     """Generate a direct download link for a paper PDF"""
-    try:
-        # Get the paper from the database
-        paper = db_service.get_paper_by_id(paper_id)
-        
-        # Use the PDF URL stored in the database
-        pdf_url = paper["pdf_url"]
-        
-        # Create direct link to the PDF
-        href = f'<a href="{pdf_url}" target="_blank">Download PDF</a>'
-        return href
-    except Exception as e:
-        logger.error(f"Error creating download link: {str(e)}")
+    pdf_url = paper.pdf_url
+    if not pdf_url:
         return "PDF download unavailable"
+    return f'<a href="{pdf_url}" target="_blank">Download PDF</a>'
 
 st.set_page_config(
     page_title="PaperFlux - AI Research Paper Insights",
@@ -70,16 +206,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling of the render path, enabled with PAPERFLUX_PROFILE
+if is_profiling_enabled():
+    # A render that ended early through st.rerun() never stopped its profile
+    unfinished_profile = st.session_state.pop("render_profile", None)
+    if unfinished_profile is not None:
+        unfinished_profile.stop()
+    st.session_state.render_profile = ProfileSession("streamlit_render").start()
+
+if not READ_ONLY:
+    start_scheduler()
+
 # Initialize session state
 if 'processing_started' not in st.session_state:
     st.session_state.processing_started = False
-if 'current_paper_index' not in st.session_state:
-    st.session_state.current_paper_index = 0
-if 'scheduler_started' not in st.session_state:
-    st.session_state.scheduler_started = False
-    # Start the scheduler when the app loads
-    scheduler.start_scheduler()
-    st.session_state.scheduler_started = True
+if 'page_cursor' not in st.session_state:
+    go_to_page(None, False, 0, 0)
 
 # App header
 st.title("📚 PaperFlux")
@@ -97,27 +239,35 @@ st.sidebar.markdown(
 )
 
 # Display processing status
-metadata = db_service.get_processing_metadata()
+metadata, should_process = load_processing_status()
 last_processed = metadata.last_processed_date.strftime("%Y-%m-%d %H:%M UTC")
-next_processing = "8:00 AM UTC Tomorrow" if datetime.now(pytz.UTC).hour >= 8 else "8:00 AM UTC Today"
+next_processing = "8:00 AM UTC Tomorrow" if datetime.now(timezone.utc).hour >= 8 else "8:00 AM UTC Today"
 
 st.sidebar.markdown(f"**Last updated:** {last_processed}")
 st.sidebar.markdown(f"**Next scheduled update:** {next_processing}")
 
 # Processing controls
 st.sidebar.header("Data Processing")
-is_processing = metadata.is_processing or st.session_state.processing_started
+is_processing = (
+    metadata.is_processing
+    or is_progress_live(metadata.progress)
+    or st.session_state.processing_started
+)
 
 if is_processing:
-    st.sidebar.info("Processing papers... This may take several minutes.")
-    st.sidebar.progress(0.5)  # Indeterminate progress bar
+    with st.sidebar:
+        render_processing_progress()
 else:
     # Check if manual processing is allowed
-    should_process = db_service.should_process_today()
-    if should_process:
+    if READ_ONLY:
+        st.sidebar.info("Papers are automatically updated each weekday at 8:00 AM UTC.")
+    elif should_process:
         if st.sidebar.button("Process Papers Now", key="process_btn"):
             # Start processing in background thread
-            threading.Thread(target=process_papers_background).start()
+            threading.Thread(
+                target=process_papers_background, args=(get_paper_processor(),)
+            ).start()
+            load_processing_status.clear()
             st.sidebar.info("Processing started! This may take several minutes.")
             time.sleep(1)  # Give time for the thread to start
             st.rerun()  # Rerun to update UI
@@ -129,87 +279,126 @@ else:
 tab1, tab2 = st.tabs(["📋 Paper List", "ℹ️ About"])
 
 with tab1:
-    # Get papers from database with caching
-    papers = db_service.get_all_papers()
+    # Only the current page of titles is loaded; papers are loaded one at a time
+    total_papers = load_papers_count()
     
-    if not papers:
+    if not total_papers:
         if is_processing:
             st.info("Loading papers... Please wait.")
         else:
             st.warning("No papers available yet. The system will automatically fetch the latest research papers at 8:00 AM UTC.")
     else:
-        st.success(f"Displaying {len(papers)} research papers")
+        st.success(f"Displaying {total_papers} research papers")
         
-        # Use all papers without filtering
-        filtered_papers = papers
+        page = load_papers_page(st.session_state.page_cursor, st.session_state.page_backward)
+        if not page["papers"]:
+            # The page emptied since it was opened, start again from the newest papers
+            go_to_page(None, False, 0, 0)
+            page = load_papers_page(None, False)
+        page_papers = page["papers"]
+        page_offset = st.session_state.page_number * PAGE_SIZE
+        current_index = min(st.session_state.current_paper_index, len(page_papers) - 1)
             
         # Paper navigation
         st.sidebar.header("Paper Navigation")
         
         # Paper selection dropdown
-        paper_titles = [f"{i+1}. {p['title'][:50]}..." for i, p in enumerate(filtered_papers)]
+        paper_titles = page["titles"]
         selected_index = st.sidebar.selectbox(
             "Select Paper:", 
-            range(len(paper_titles)),
-            format_func=lambda i: paper_titles[i],
-            index=st.session_state.current_paper_index
+            range(len(page_papers)),
+            format_func=lambda i: f"{page_offset + i + 1}. {paper_titles[i]}",
+            index=current_index
         )
         
         # Update current index if changed through dropdown
-        if selected_index != st.session_state.current_paper_index:
-            st.session_state.current_paper_index = selected_index
+        if selected_index != current_index:
+            current_index = selected_index
+        st.session_state.current_paper_index = current_index
         
-        # Previous/Next buttons
+        # Previous/Next buttons, moving to the neighbouring page at the edges
+        at_first = current_index <= 0
+        at_last = current_index >= len(page_papers) - 1
         col1, col2 = st.sidebar.columns(2)
         with col1:
-            if st.button("← Previous", disabled=st.session_state.current_paper_index <= 0):
-                st.session_state.current_paper_index -= 1
+            if st.button("← Previous", disabled=at_first and not page["prev_cursor"]):
+                if at_first:
+                    go_to_page(page["prev_cursor"], True, st.session_state.page_number - 1, PAGE_SIZE - 1)
+                else:
+                    st.session_state.current_paper_index -= 1
                 st.rerun()
         with col2:
-            if st.button("Next →", disabled=st.session_state.current_paper_index >= len(filtered_papers) - 1):
-                st.session_state.current_paper_index += 1
+            if st.button("Next →", disabled=at_last and not page["next_cursor"]):
+                if at_last:
+                    go_to_page(page["next_cursor"], False, st.session_state.page_number + 1, 0)
+                else:
+                    st.session_state.current_paper_index += 1
                 st.rerun()
         
         # Display current paper position
-        st.sidebar.markdown(f"**Paper {st.session_state.current_paper_index + 1} of {len(filtered_papers)}**")
+        st.sidebar.markdown(f"**Paper {page_offset + current_index + 1} of {total_papers}**")
         
         # Display the selected paper
-        if filtered_papers:
-            current_index = st.session_state.current_paper_index
-            if current_index < len(filtered_papers):
-                paper = filtered_papers[current_index]
-                
-                paper_id = paper["paper_id"]
-                title = paper["title"]
-                published_date = datetime.fromisoformat(paper["published_at"].replace('Z', '+00:00')).strftime("%b %d, %Y")
-                
-                # Format authors (limit to 3 with "et al." if more)
-                authors_list = paper["authors"]
-                if len(authors_list) > 3:
-                    authors_text = ", ".join(author.get("name", "") for author in authors_list[:3]) + " et al."
+        paper = load_paper(page_papers[current_index].paper_id)
+        prefetch_papers([
+            page_papers[i].paper_id
+            for i in (current_index - 1, current_index + 1)
+            if 0 <= i < len(page_papers)
+        ])
+        if paper is None:
+            st.warning("This paper is no longer available.")
+        else:
+            paper_id = paper.paper_id
+            title = paper.title
+            
+            # Paper header
+            st.markdown(f"## {title}")
+            st.markdown(f"**Authors:** {paper.authors_text}")
+            st.markdown(f"**Published:** {paper.published_date} | **Paper ID:** {paper_id}")
+            
+            # Paper download link
+            pdf_link = get_pdf_download_link(paper)
+            st.markdown(pdf_link, unsafe_allow_html=True)
+            
+            # Paper content in tabs; read-only replicas do not talk to Gemini, so no Q&A there
+            tab_names = ["Summary", "Detailed Analysis"] + ([] if READ_ONLY else ["Ask"])
+            paper_tab1, paper_tab2, *qa_tab = st.tabs(tab_names)
+            
+            with paper_tab1:
+                st.markdown(paper.summary)
+            
+            with paper_tab2:
+                if paper.explanation_html:
+                    components.html(
+                        EXPLANATION_PAGE_TEMPLATE % paper.explanation_html,
+                        height=EXPLANATION_FRAME_HEIGHT,
+                        scrolling=True,
+                    )
+                elif paper.explanation:
+                    # Papers without an artifact fall back to rendering the markdown
+                    st.markdown(paper.explanation)
                 else:
-                    authors_text = ", ".join(author.get("name", "") for author in authors_list)
-                
-                # Paper header
-                st.markdown(f"## {title}")
-                st.markdown(f"**Authors:** {authors_text}")
-                st.markdown(f"**Published:** {published_date} | **Paper ID:** {paper_id}")
-                
-                # Paper download link
-                pdf_link = get_pdf_download_link(paper_id, title)
-                st.markdown(pdf_link, unsafe_allow_html=True)
-                
-                # Paper content in tabs
-                paper_tab1, paper_tab2 = st.tabs(["Summary", "Detailed Analysis"])
-                
-                with paper_tab1:
-                    st.markdown(paper["summary"])
-                
-                with paper_tab2:
-                    if paper.get("explanation"):
-                        st.markdown(paper["explanation"])
-                    else:
-                        st.warning("Detailed analysis not available for this paper.")
+                    st.warning("Detailed analysis not available for this paper.")
+
+            for paper_tab3 in qa_tab:
+                with paper_tab3:
+                    # Questions asked about each paper during this browser session
+                    qa_history = st.session_state.setdefault("qa_history", {}).setdefault(paper_id, [])
+                    for asked, answer in qa_history:
+                        st.markdown(f"**Q:** {asked}")
+                        st.markdown(answer)
+                    with st.form(f"qa_form_{paper_id}", clear_on_submit=True):
+                        question = st.text_input("Ask a follow-up question about this paper")
+                        submitted = st.form_submit_button("Ask")
+                    if submitted and question.strip():
+                        with st.spinner("Thinking..."):
+                            try:
+                                answer = get_qa_service().ask(paper, question)
+                            except Exception as e:
+                                st.error(f"Could not answer the question: {str(e)}")
+                            else:
+                                qa_history.append((question.strip(), answer))
+                                st.rerun()
 
 with tab2:
     st.markdown("""
@@ -242,3 +431,6 @@ with tab2:
 # Footer
 st.markdown("---")
 st.markdown("PaperFlux © 2025 | Built with Streamlit and Gemini Pro")
+
+if is_profiling_enabled() and "render_profile" in st.session_state:
+    st.session_state.pop("render_profile").stop()
@@ -1,11 +1,89 @@
+import os
+
+from dotenv import find_dotenv, load_dotenv
+
+# Settings are read at import, so the .env of the working directory (where
+# app.py and worker.py are run from) must be loaded before any of them
+load_dotenv(find_dotenv(usecwd=True))
+
 # MongoDB configurations
-DB_NAME = "papers_summary_database"
-COLLECTION_NAME = "papers"
-METADATA_COLLECTION = "metadata"
+DB_NAME = os.getenv("DB_NAME", "papers_summary_database")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "papers")
+METADATA_COLLECTION = os.getenv("METADATA_COLLECTION", "metadata")
 
 # API and URL configurations
-HF_API_URL = "https://huggingface.co/api/daily_papers"
-PDF_BASE_URL = "https://arxiv.org/pdf/{id}.pdf"
+HF_API_URL = os.getenv("HF_API_URL", "https://huggingface.co/api/daily_papers")
+PDF_BASE_URL = os.getenv("PDF_BASE_URL", "https://arxiv.org/pdf/{id}.pdf")
+# Maximum number of PDF downloads in flight at once
+DOWNLOAD_CONCURRENCY = 20
+
+# Pagination and caching configurations
+PAGE_SIZE = 25
+PAPER_CACHE_SIZE = 64
 
 # Storage configurations
-TEMP_DIR = "temp_papers"
+TEMP_DIR = os.getenv("TEMP_DIR", "temp_papers")
+# Keep downloaded PDFs in memory and upload them from there instead of TEMP_DIR.
+# Downloads wait while the pool is full; PDFs above the per-file limit go to disk.
+IN_MEMORY_DOWNLOADS = os.getenv("PAPERFLUX_IN_MEMORY_DOWNLOADS", "").lower() in ("1", "true", "yes")
+DOWNLOAD_MEMORY_LIMIT_BYTES = int(os.getenv("PAPERFLUX_DOWNLOAD_MEMORY_LIMIT_MB", "256")) * 1024 * 1024
+MAX_IN_MEMORY_PDF_BYTES = 32 * 1024 * 1024
+
+# Gemini file store: PDFs are uploaded ahead of generation by a separate pool, and
+# every upload is named with this prefix so uploads left by crashed runs can be reaped
+GEMINI_UPLOAD_CONCURRENCY = 4
+# Uploads not yet deleted per analysis worker, i.e. how far uploads may run ahead of analysis
+GEMINI_UPLOADS_PER_WORKER = 2
+GEMINI_FILE_PREFIX = "paperflux-"
+# Older uploads with the prefix are orphans; must exceed any analysis or Q&A session
+GEMINI_ORPHAN_MAX_AGE_SECONDS = 2 * 3600
+
+# Backfill configurations
+BACKFILL_MAX_CONCURRENT_DAYS = 4
+BACKFILL_CHECKPOINT_ID = "backfill_checkpoint"
+
+# Version of the stored documents; data migrations run once when it is behind
+SCHEMA_VERSION_ID = "schema_version"
+SCHEMA_VERSION = 2
+
+# Progress reporting configurations
+PROGRESS_WRITE_INTERVAL_SECONDS = 2
+PROGRESS_MAX_FAILURES = 10
+# Runs renew their processing lease this often; a lease (or progress) not renewed
+# for PROGRESS_STALE_SECONDS belongs to a run that died and may be taken over
+PROCESSING_HEARTBEAT_SECONDS = 60
+PROGRESS_STALE_SECONDS = 900
+
+# Metrics configurations; the /metrics endpoint is disabled when the port is 0
+METRICS_PORT = int(os.getenv("PAPERFLUX_METRICS_PORT", "0"))
+RUN_METRICS_TYPE = "run_metrics"
+# Only the summaries of this many latest runs are kept
+RUN_METRICS_KEEP = 100
+
+# Profiling configurations; PAPERFLUX_PROFILE=1 profiles every processing run and render
+PROFILING_ENABLED = os.getenv("PAPERFLUX_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PAPERFLUX_PROFILE_DIR", "profiles")
+PROFILE_LOOP_LAG_INTERVAL_SECONDS = 0.05
+PROFILE_SLOW_CALLBACK_SECONDS = 0.1
+
+# Read-only JSON API configurations; the data version document is bumped by every paper write
+API_HOST = os.getenv("PAPERFLUX_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("PAPERFLUX_API_PORT", "8080"))
+API_MAX_PAGE_SIZE = 100
+API_RESPONSE_CACHE_SIZE = 1024
+API_VERSION_CHECK_SECONDS = 1
+API_GZIP_MIN_BYTES = 1024
+DATA_VERSION_ID = "data_version"
+
+# Parquet export of the archive for analytics (worker.py export)
+EXPORT_DIR = os.getenv("PAPERFLUX_EXPORT_DIR", "exports")
+
+# Follow-up Q&A on a paper: its upload (and cached context, when the model allows it)
+# is kept for a session TTL and shared by every question; answers are memoized
+QA_SESSION_TTL_SECONDS = int(os.getenv("PAPERFLUX_QA_SESSION_TTL_SECONDS", "1800"))
+QA_MAX_SESSIONS = 16
+QA_ANSWER_CACHE_SIZE = 512
+QA_DOWNLOAD_TIMEOUT_SECONDS = 60
+
+# Read-only replicas only serve the UI: no scheduler, no manual processing
+READ_ONLY = os.getenv("PAPERFLUX_READ_ONLY", "").lower() in ("1", "true", "yes")
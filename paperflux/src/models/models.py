@@ -1,8 +1,40 @@
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from paperflux.src.config.settings import PDF_BASE_URL
+
+
+class PaperSchemaError(ValueError):
+    """Raised when a daily_papers entry does not have the expected shape"""
+
+
+def _require_str(data: Dict, key: str) -> str:
+    value = data.get(key)
+    if not isinstance(value, str):
+        raise PaperSchemaError(f"Expected string field '{key}', got {type(value).__name__}")
+    return value
+
 
 class Paper:
+    """
+    A stored paper. Slotted to keep large cached archives small; processed_at
+    is only stamped when the paper is serialized for storage.
+    """
+
+    __slots__ = (
+        "paper_id",
+        "title",
+        "authors",
+        "summary",
+        "published_at",
+        "explanation",
+        "pdf_url",
+        "daily_date",
+        "explanation_html",
+        "explanation_hash",
+        "processed_at",
+    )
+
     def __init__(
         self,
         paper_id: str,
@@ -12,6 +44,10 @@ class Paper:
         published_at: str,
         explanation: Optional[str] = None,
         pdf_url: Optional[str] = None,
+        daily_date: Optional[str] = None,
+        explanation_html: Optional[str] = None,
+        explanation_hash: Optional[str] = None,
+        processed_at: Optional[datetime] = None,
     ):
         self.paper_id = paper_id
         self.title = title
@@ -20,7 +56,55 @@ class Paper:
         self.published_at = published_at
         self.explanation = explanation
         self.pdf_url = pdf_url
-        self.processed_at = datetime.utcnow()
+        self.daily_date = daily_date
+        self.explanation_html = explanation_html
+        self.explanation_hash = explanation_hash
+        self.processed_at = processed_at
+
+    @classmethod
+    def from_hf_entry(cls, entry: Dict, daily_date: Optional[str] = None) -> "Paper":
+        """
+        Decode one entry of the Hugging Face daily_papers response, validating
+        the fields we use. Authors are reduced to their names.
+        """
+        try:
+            data = entry["paper"]
+            authors = data["authors"]
+        except (KeyError, TypeError):
+            raise PaperSchemaError("Entry has no 'paper' object with 'authors'")
+        try:
+            authors = [{"name": author.get("name", "")} for author in authors]
+        except (AttributeError, TypeError):
+            raise PaperSchemaError("Expected 'authors' to be a list of objects")
+
+        paper_id = _require_str(data, "id")
+        return cls(
+            paper_id=paper_id,
+            title=_require_str(data, "title"),
+            authors=authors,
+            summary=_require_str(data, "summary"),
+            published_at=_require_str(data, "publishedAt"),
+            pdf_url=PDF_BASE_URL.format(id=paper_id),
+            daily_date=daily_date,
+        )
+
+    @classmethod
+    def from_document(cls, doc: Dict) -> "Paper":
+        """Build a paper from a stored Mongo document"""
+        get = doc.get
+        return cls(
+            doc["paper_id"],
+            get("title", ""),
+            get("authors") or [],
+            get("summary", ""),
+            get("published_at", ""),
+            get("explanation"),
+            get("pdf_url"),
+            get("daily_date"),
+            get("explanation_html"),
+            get("explanation_hash"),
+            get("processed_at"),
+        )
 
     def to_dict(self) -> Dict:
         return {
@@ -31,17 +115,101 @@ class Paper:
             "published_at": self.published_at,
             "explanation": self.explanation,
             "pdf_url": self.pdf_url,
-            "processed_at": self.processed_at,
+            "daily_date": self.daily_date,
+            "explanation_html": self.explanation_html,
+            "explanation_hash": self.explanation_hash,
+            "processed_at": self.processed_at or datetime.utcnow(),
         }
 
 
+class PaperListItem:
+    """The fields of a paper shown in the paper list"""
+
+    __slots__ = ("paper_id", "title", "daily_date")
+
+    def __init__(self, paper_id: str, title: str, daily_date: Optional[str] = None):
+        self.paper_id = paper_id
+        self.title = title
+        self.daily_date = daily_date
+
+    @classmethod
+    def from_document(cls, doc: Dict) -> "PaperListItem":
+        return cls(doc["paper_id"], doc.get("title", ""), doc.get("daily_date"))
+
+    def to_dict(self) -> Dict:
+        return {"paper_id": self.paper_id, "title": self.title, "daily_date": self.daily_date}
+
+
+class PaperDetail:
+    """A paper as shown on its detail view, with display strings derived once"""
+
+    __slots__ = (
+        "paper_id",
+        "title",
+        "authors_text",
+        "published_date",
+        "summary",
+        "explanation",
+        "explanation_html",
+        "pdf_url",
+    )
+
+    def __init__(
+        self,
+        paper_id: str,
+        title: str,
+        authors_text: str,
+        published_date: str,
+        summary: str,
+        explanation: Optional[str] = None,
+        explanation_html: Optional[str] = None,
+        pdf_url: Optional[str] = None,
+    ):
+        self.paper_id = paper_id
+        self.title = title
+        self.authors_text = authors_text
+        self.published_date = published_date
+        self.summary = summary
+        self.explanation = explanation
+        self.explanation_html = explanation_html
+        self.pdf_url = pdf_url
+
+    @staticmethod
+    def format_authors(authors: List[Dict]) -> str:
+        """Format authors (limit to 3 with "et al." if more)"""
+        names = ", ".join(author.get("name", "") for author in authors[:3])
+        return names + " et al." if len(authors) > 3 else names
+
+    @classmethod
+    def from_paper(cls, paper: Paper) -> "PaperDetail":
+        published_date = paper.published_at
+        try:
+            published_date = datetime.fromisoformat(
+                paper.published_at.replace("Z", "+00:00")
+            ).strftime("%b %d, %Y")
+        except ValueError:
+            pass
+        return cls(
+            paper.paper_id,
+            paper.title,
+            cls.format_authors(paper.authors),
+            published_date,
+            paper.summary,
+            paper.explanation,
+            paper.explanation_html,
+            paper.pdf_url,
+        )
+
+
 class ProcessingMetadata:
     def __init__(self, last_processed_date: datetime = None):
         self.last_processed_date = last_processed_date or datetime.utcnow()
         self.is_processing = False
-    
+        self.progress: Optional[Dict] = None
+
     def to_dict(self) -> Dict:
         return {
             "last_processed_date": self.last_processed_date,
-            "is_processing": self.is_processing
+            "is_processing": self.is_processing,
+            "progress": self.progress,
         }
@@ -0,0 +1,273 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from paperflux.src.config.settings import (
+    API_GZIP_MIN_BYTES,
+    API_MAX_PAGE_SIZE,
+    API_RESPONSE_CACHE_SIZE,
+    API_VERSION_CHECK_SECONDS,
+    PAGE_SIZE,
+)
+from paperflux.src.models.models import Paper
+from paperflux.src.services.database import DatabaseService
+from paperflux.src.services.metrics import MetricsRegistry
+from paperflux.src.services.renderer import content_hash
+
+logger = logging.getLogger("paperflux.api")
+
+
+class APIError(Exception):
+    """A client error, answered with its status and message as JSON"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class CachedResponse:
+    """A serialized JSON response with its ETag and, when worth it, a gzipped copy"""
+
+    __slots__ = ("status", "etag", "body", "gzipped")
+
+    def __init__(self, status: int, etag: str, body: bytes):
+        self.status = status
+        self.etag = etag
+        self.body = body
+        self.gzipped = gzip.compress(body, 6) if len(body) >= API_GZIP_MIN_BYTES else None
+
+
+def paper_to_json(paper: Paper) -> Dict:
+    """The public JSON form of a paper's detail"""
+    # Only serve the pre-rendered artifact if it was rendered from this exact explanation
+    explanation_html = paper.explanation_html
+    if explanation_html and paper.explanation_hash != content_hash(paper.explanation or ""):
+        explanation_html = None
+    return {
+        "paper_id": paper.paper_id,
+        "title": paper.title,
+        "authors": [author.get("name", "") for author in paper.authors],
+        "summary": paper.summary,
+        "published_at": paper.published_at,
+        "daily_date": paper.daily_date,
+        "pdf_url": paper.pdf_url,
+        "explanation": paper.explanation,
+        "explanation_html": explanation_html,
+        "processed_at": paper.processed_at.isoformat() if paper.processed_at else None,
+    }
+
+
+class PaperAPI:
+    """
+    Read-only JSON API over DatabaseService: the paper list, paper details and
+    search, with cursor pagination. Responses are serialized once per data
+    version and kept in an LRU, with their gzipped copy and an ETag derived
+    from the version, so repeated requests are answered from memory and
+    unchanged ones with 304. The version is polled in the background every
+    `version_check_seconds`, so serving a cached response never waits on Mongo.
+    """
+
+    def __init__(
+        self,
+        db: Optional[DatabaseService] = None,
+        version_check_seconds: float = API_VERSION_CHECK_SECONDS,
+        cache_size: int = API_RESPONSE_CACHE_SIZE,
+    ):
+        self.db = db or DatabaseService()
+        self.version_check_seconds = version_check_seconds
+        self.cache_size = cache_size
+        self.metrics = MetricsRegistry()
+        self.version = self.db.get_data_version()
+        self._responses: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._responses_lock = threading.Lock()
+        # Responses being built, so concurrent misses on one key share a single build
+        self._building: Dict[Tuple, asyncio.Future] = {}
+        self._version_task = None
+
+    async def _poll_version(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.version_check_seconds)
+            try:
+                version = await loop.run_in_executor(None, self.db.get_data_version)
+            except Exception as e:
+                logger.warning(f"Could not check the data version: {str(e)}")
+                continue
+            if version != self.version:
+                logger.info(f"Data version changed from {self.version} to {version}")
+                self.version = version
+
+    async def _start_polling(self, app):
+        self._version_task = asyncio.get_running_loop().create_task(self._poll_version())
+
+    async def _stop_polling(self, app):
+        self._version_task.cancel()
+        try:
+            await self._version_task
+        except asyncio.CancelledError:
+            pass
+
+    async def _cached(self, key: Tuple, build: Callable[[], Tuple[int, Dict]]) -> CachedResponse:
+        """
+        Get the response for `key` at the current version, building it in a thread
+        on a miss. Concurrent misses on the same key wait for a single build.
+        """
+        version = self.version
+        cache_key = (version,) + key
+        with self._responses_lock:
+            response = self._responses.get(cache_key)
+            if response is not None:
+                self._responses.move_to_end(cache_key)
+                return response
+
+        # The build is not tied to the request that started it, so a client
+        # going away does not fail the others waiting on the same response
+        building = self._building.get(cache_key)
+        if building is None:
+            building = asyncio.get_running_loop().run_in_executor(None, self._build, version, cache_key, build)
+            self._building[cache_key] = building
+            building.add_done_callback(lambda future: self._built(cache_key, future))
+        else:
+            self.metrics.inc("paperflux_api_coalesced_total")
+        return await asyncio.shield(building)
+
+    def _built(self, cache_key: Tuple, future: asyncio.Future):
+        del self._building[cache_key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._responses_lock:
+            self._responses[cache_key] = future.result()
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+
+    @staticmethod
+    def _build(version: int, cache_key: Tuple, build: Callable[[], Tuple[int, Dict]]) -> CachedResponse:
+        status, payload = build()
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+        digest = hashlib.sha1(repr(cache_key).encode("utf-8")).hexdigest()[:20]
+        return CachedResponse(status, f'W/"{version}-{digest}"', body)
+
+    def _respond(self, request, route: str, response: CachedResponse):
+        from aiohttp import web
+
+        headers = {
+            "ETag": response.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or response.etag in (tag.strip() for tag in if_none_match.split(","))
+        ):
+            self.metrics.inc("paperflux_api_requests_total", route=route, status=304)
+            return web.Response(status=304, headers=headers)
+
+        body = response.body
+        if response.gzipped is not None and "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = response.gzipped
+            headers["Content-Encoding"] = "gzip"
+        self.metrics.inc("paperflux_api_requests_total", route=route, status=response.status)
+        return web.Response(
+            status=response.status,
+            body=body,
+            headers=headers,
+            content_type="application/json",
+            charset="utf-8",
+        )
+
+    def _error(self, route: str, error: APIError):
+        from aiohttp import web
+
+        self.metrics.inc("paperflux_api_requests_total", route=route, status=error.status)
+        return web.json_response({"error": error.message}, status=error.status)
+
+    @staticmethod
+    def _page_params(request) -> Tuple[Optional[str], bool, int]:
+        """Parse and validate the cursor, direction and limit query parameters"""
+        query = request.query
+        cursor = query.get("cursor") or None
+        if cursor is not None and "|" not in cursor:
+            raise APIError(400, "Invalid cursor")
+        direction = query.get("direction", "next")
+        if direction not in ("next", "prev"):
+            raise APIError(400, "direction must be 'next' or 'prev'")
+        try:
+            limit = int(query.get("limit", PAGE_SIZE))
+        except ValueError:
+            raise APIError(400, "limit must be an integer")
+        if not 1 <= limit <= API_MAX_PAGE_SIZE:
+            raise APIError(400, f"limit must be between 1 and {API_MAX_PAGE_SIZE}")
+        return cursor, direction == "prev", limit
+
+    def _page(self, cursor, backward, limit, search=None) -> Tuple[int, Dict]:
+        page = self.db.get_papers_page(cursor, backward, limit, search=search)
+        return 200, {
+            "papers": [paper.to_dict() for paper in page["papers"]],
+            "next_cursor": page["next_cursor"],
+            "prev_cursor": page["prev_cursor"],
+        }
+
+    async def list_papers(self, request):
+        """GET /api/papers?cursor=&direction=next|prev&limit="""
+        try:
+            cursor, backward, limit = self._page_params(request)
+        except APIError as e:
+            return self._error("papers", e)
+        response = await self._cached(
+            ("papers", cursor, backward, limit), lambda: self._page(cursor, backward, limit)
+        )
+        return self._respond(request, "papers", response)
+
+    async def search_papers(self, request):
+        """GET /api/search?q=&cursor=&direction=next|prev&limit="""
+        try:
+            search = request.query.get("q", "").strip()
+            if not search:
+                raise APIError(400, "q is required")
+            cursor, backward, limit = self._page_params(request)
+        except APIError as e:
+            return self._error("search", e)
+        response = await self._cached(
+            ("search", search, cursor, backward, limit),
+            lambda: self._page(cursor, backward, limit, search),
+        )
+        return self._respond(request, "search", response)
+
+    def _paper(self, paper_id: str) -> Tuple[int, Dict]:
+        paper = self.db.get_paper_by_id(paper_id)
+        if paper is None:
+            return 404, {"error": f"Paper {paper_id} not found"}
+        return 200, paper_to_json(paper)
+
+    async def get_paper(self, request):
+        """GET /api/papers/{paper_id}"""
+        paper_id = request.match_info["paper_id"]
+        response = await self._cached(("paper", paper_id), lambda: self._paper(paper_id))
+        return self._respond(request, "paper", response)
+
+    def create_app(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/api/papers", self.list_papers)
+        app.router.add_get("/api/papers/{paper_id:.+}", self.get_paper)
+        app.router.add_get("/api/search", self.search_papers)
+        app.on_startup.append(self._start_polling)
+        app.on_cleanup.append(self._stop_polling)
+        return app
+
+
+def run_api(host: str, port: int, db: Optional[DatabaseService] = None):
+    """Serve the read-only API until interrupted"""
+    from aiohttp import web
+
+    api = PaperAPI(db)
+    logger.info(f"Serving the read-only API on http://{host}:{port}/api/papers")
+    web.run_app(api.create_app(), host=host, port=port, access_log=None, print=None)
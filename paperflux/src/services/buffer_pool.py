@@ -0,0 +1,113 @@
+import asyncio
+import io
+import logging
+import threading
+from collections import deque
+
+from paperflux.src.services.metrics import MetricsRegistry
+
+logger = logging.getLogger("paperflux.buffer_pool")
+
+
+class PDFBuffer:
+    """A downloaded PDF held in memory, returned to its pool by release()"""
+
+    __slots__ = ("name", "data", "size", "_pool")
+
+    def __init__(self, name: str, data: bytes, size: int, pool: "BufferPool"):
+        self.name = name
+        self.data = data
+        # Bytes reserved in the pool for this buffer
+        self.size = size
+        self._pool = pool
+
+    def open(self) -> io.BytesIO:
+        """A file object over the bytes; BytesIO shares them instead of copying"""
+        return io.BytesIO(self.data)
+
+    def release(self):
+        if self._pool is not None:
+            self._pool.release(self.size)
+            self._pool = None
+            self.data = b""
+
+    def __str__(self):
+        return f"<memory:{self.name}>"
+
+
+class BufferPool:
+    """
+    Caps the bytes of downloaded PDFs held in memory at once.
+    Downloads reserve their size before requesting the PDF and wait, in FIFO
+    order, while the pool is full; analysis threads release it after upload.
+    Files larger than `max_buffer_bytes` are not admitted, so callers can
+    fall back to disk for them.
+    """
+
+    def __init__(self, capacity_bytes: int, max_buffer_bytes: int):
+        self.capacity_bytes = capacity_bytes
+        self.max_buffer_bytes = min(max_buffer_bytes, capacity_bytes)
+        self.used_bytes = 0
+        self.metrics = MetricsRegistry()
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def admits(self, size: int) -> bool:
+        return size <= self.max_buffer_bytes
+
+    async def acquire(self, size: int) -> int:
+        """Reserve `size` bytes, waiting for releases while the pool is full"""
+        if not self.admits(size):
+            raise ValueError(f"{size} bytes exceeds the largest in-memory buffer")
+        with self._lock:
+            if not self._waiters and self.used_bytes + size <= self.capacity_bytes:
+                self._reserve(size)
+                return size
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append((waiter, size))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as we were cancelled, give it back
+                    self._release(size)
+                elif (waiter, size) in self._waiters:
+                    self._waiters.remove((waiter, size))
+            raise
+        return size
+
+    def release(self, size: int):
+        """Return reserved bytes to the pool; safe to call from any thread"""
+        if size:
+            with self._lock:
+                self._release(size)
+
+    def buffer(self, name: str, data: bytes, reserved: int) -> PDFBuffer:
+        """Wrap downloaded bytes, returning any over-reservation to the pool"""
+        self.release(reserved - len(data))
+        return PDFBuffer(name, data, len(data), self)
+
+    def _reserve(self, size: int):
+        self.used_bytes += size
+        self.metrics.set_gauge("paperflux_buffer_pool_bytes", self.used_bytes)
+
+    def _release(self, size: int):
+        self.used_bytes -= size
+        # Wake waiters in order for as long as the head of the queue fits
+        while self._waiters:
+            waiter, waiter_size = self._waiters[0]
+            if self.used_bytes + waiter_size > self.capacity_bytes:
+                break
+            self._waiters.popleft()
+            self.used_bytes += waiter_size
+            waiter.get_loop().call_soon_threadsafe(self._grant, waiter, waiter_size)
+        self.metrics.set_gauge("paperflux_buffer_pool_bytes", self.used_bytes)
+
+    def _grant(self, waiter: asyncio.Future, size: int):
+        if waiter.cancelled():
+            # The waiter left before its grant arrived
+            self.release(size)
+        else:
+            waiter.set_result(None)
+
@@ -1,60 +1,223 @@
 import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from paperflux.src.models.models import Paper, ProcessingMetadata
+from paperflux.src.models.models import Paper, PaperListItem, ProcessingMetadata
+from paperflux.src.services.metrics import MetricsRegistry
 import threading
 import logging
 import os
-from paperflux.src.config.settings import DB_NAME, COLLECTION_NAME, METADATA_COLLECTION
+from typing import Dict, List, Optional, Set
+from paperflux.src.config.settings import (
+    DB_NAME,
+    COLLECTION_NAME,
+    METADATA_COLLECTION,
+    BACKFILL_CHECKPOINT_ID,
+    DATA_VERSION_ID,
+    RUN_METRICS_KEEP,
+    RUN_METRICS_TYPE,
+    SCHEMA_VERSION,
+    SCHEMA_VERSION_ID,
+    PAGE_SIZE,
+    PAPER_CACHE_SIZE,
+    PROGRESS_STALE_SECONDS,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
 
 logger = logging.getLogger("paperflux.database")
 
+# Newest day first, then by paper ID; backed by the compound index in _ensure_indexes
+LIST_SORT = [("daily_date", -1), ("paper_id", 1)]
+# Explanation stored in place of an analysis by older versions when it failed
+FAILED_EXPLANATION_PREFIX = "Error analyzing paper:"
+# Fields needed to render a list entry, everything else is loaded per paper
+LIST_PROJECTION = {"_id": 0, "paper_id": 1, "title": 1, "daily_date": 1}
+# Newest run first; runs finishing within the same millisecond keep their insertion order
+RUN_METRICS_SORT = [("finished_at", -1), ("_id", -1)]
+
+
 class DatabaseService:
     _instance = None
     _lock = threading.Lock()
 
-    def __new__(cls):
+    def __new__(cls, client=None):
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(DatabaseService, cls).__new__(cls)
                 cls._instance._initialized = False
         return cls._instance
 
-    def __init__(self):
+    def __init__(self, client=None):
+        """
+        `client` lets callers supply a ready Mongo client (e.g. a local stand-in);
+        it is only used by the first construction of the singleton.
+        """
         if self._initialized:
             return
         logger.info("Initializing DatabaseService")
-        self.client = MongoClient(os.environ["MONGODB_URI"])
+        if client is None:
+            from pymongo import MongoClient
+
+            client = MongoClient(os.environ["MONGODB_URI"])
+        self.client = client
         self.db = self.client[DB_NAME]
         self.collection = self.db[COLLECTION_NAME]
         self.metadata_collection = self.db[METADATA_COLLECTION]
         self._cache = {}
         self._cache_timestamp = 0
         self._cache_lock = threading.Lock()
+        self._paper_cache = OrderedDict()
+        self._data_version = None
+        self.metrics = MetricsRegistry()
+        self._ensure_indexes()
         self._initialized = True
 
+    def _ensure_indexes(self):
+        """Create the indexes used for lookups and de-duplication"""
+        try:
+            self.collection.create_index("paper_id", unique=True)
+        except Exception as e:
+            logger.warning(f"Could not create unique index on paper_id: {str(e)}")
+        self.collection.create_index(LIST_SORT)
+        try:
+            self.collection.create_index([("title", "text"), ("summary", "text")], name="paper_text")
+        except Exception as e:
+            logger.warning(f"Could not create text index on papers: {str(e)}")
+
+        self._migrate()
+
+    def _migrate(self):
+        """Bring stored documents up to SCHEMA_VERSION, once per database rather than per process"""
+        data = self.metadata_collection.find_one({"_id": SCHEMA_VERSION_ID})
+        version = data.get("version", 0) if data else 0
+        if version >= SCHEMA_VERSION:
+            return
+
+        if version < 1:
+            # Papers stored before daily_date existed are dated by when they were processed
+            logger.info("Migrating papers without a daily_date")
+            for doc in self.collection.find({"daily_date": None}, {"paper_id": 1, "processed_at": 1}):
+                processed_at = doc.get("processed_at") or datetime.utcnow()
+                self.collection.update_one(
+                    {"_id": doc["_id"]},
+                    {"$set": {"daily_date": processed_at.date().isoformat()}},
+                )
+
+        if version < 2:
+            # Start the per-day change markers (see _bump_data_version) for the stored days
+            logger.info("Recording change markers of the stored days")
+            days = [day for day in self.collection.distinct("daily_date") if day]
+            if days:
+                self.metadata_collection.update_one(
+                    {"_id": DATA_VERSION_ID},
+                    {"$max": {f"days.{day}": 1 for day in days}},
+                    upsert=True,
+                )
+
+        self.metadata_collection.update_one(
+            {"_id": SCHEMA_VERSION_ID}, {"$set": {"version": SCHEMA_VERSION}}, upsert=True
+        )
+
+    def _record_cache_lookup(self, cache: str, hits: int = 0, misses: int = 0):
+        if hits:
+            self.metrics.inc("paperflux_db_cache_requests_total", hits, cache=cache, result="hit")
+        if misses:
+            self.metrics.inc("paperflux_db_cache_requests_total", misses, cache=cache, result="miss")
+
+    def _invalidate_cache(self):
+        with self._cache_lock:
+            self._cache = {}
+            self._cache_timestamp = 0
+            self._paper_cache.clear()
+
+    def _bump_data_version(self, *days: Optional[str]):
+        """
+        Record that the stored papers changed, for readers in other processes,
+        and bump the change marker of every given daily_date, for the exporter
+        """
+        increments = {"version": 1}
+        increments.update({f"days.{day}": 1 for day in days if day})
+        self.metadata_collection.update_one(
+            {"_id": DATA_VERSION_ID}, {"$inc": increments}, upsert=True
+        )
+
+    def get_day_versions(self) -> Dict[str, int]:
+        """
+        Get the change marker of every daily_date, which moves whenever one of
+        its papers is written or removed. Markers never go back, so a marker
+        seen before identifies unchanged papers.
+        """
+        data = self.metadata_collection.find_one({"_id": DATA_VERSION_ID}, {"days": 1})
+        return dict(data.get("days", {})) if data else {}
+
+    def forget_day_version(self, daily_date: str, version: int):
+        """Drop the marker of a day left without papers, unless it moved since `version`"""
+        self.metadata_collection.update_one(
+            {"_id": DATA_VERSION_ID, f"days.{daily_date}": version},
+            {"$unset": {f"days.{daily_date}": ""}},
+        )
+
+    def get_data_version(self) -> int:
+        """
+        Get the version of the stored papers, bumped by every paper write.
+        Local caches are dropped when the version moved since the last check,
+        so readers see writes made by other processes.
+        """
+        data = self.metadata_collection.find_one({"_id": DATA_VERSION_ID})
+        version = data.get("version", 0) if data else 0
+        if version != self._data_version:
+            if self._data_version is not None:
+                self._invalidate_cache()
+            self._data_version = version
+        return version
+
     def clear_papers_collection(self):
         """Clear the papers collection"""
         logger.info("Clearing papers collection")
         self.collection.delete_many({})
-        with self._cache_lock:
-            self._cache = {}
-            self._cache_timestamp = 0
+        self._invalidate_cache()
+        self._bump_data_version(*self.get_day_versions())
 
     def insert_paper(self, paper: Paper):
         """Insert a paper into the database"""
         logger.info(f"Inserting paper: {paper.paper_id}")
         result = self.collection.insert_one(paper.to_dict())
-        # Invalidate cache
-        with self._cache_lock:
-            self._cache = {}
-            self._cache_timestamp = 0
+        self._invalidate_cache()
+        self._bump_data_version(paper.daily_date)
         return result
 
-    def get_all_papers(self, max_cache_age_seconds=20):
+    def upsert_paper(self, paper: Paper):
+        """Insert a paper, or replace the stored copy if it already exists"""
+        logger.info(f"Upserting paper: {paper.paper_id}")
+        previous = self.collection.find_one_and_replace(
+            {"paper_id": paper.paper_id},
+            paper.to_dict(),
+            projection={"_id": 0, "daily_date": 1},
+            upsert=True,
+        )
+        self._invalidate_cache()
+        # A reprocessed paper may move to another day, which changes both days
+        self._bump_data_version(paper.daily_date, previous and previous.get("daily_date"))
+
+    def get_existing_paper_ids(self, paper_ids: List[str]) -> Set[str]:
+        """
+        Return the subset of the given paper IDs that are already stored with
+        an analysis. Papers stored with a failed analysis are left out, so they
+        are analyzed again.
+        """
+        if not paper_ids:
+            return set()
+        cursor = self.collection.find(
+            {
+                "paper_id": {"$in": list(paper_ids)},
+                "explanation": {"$not": {"$regex": f"^{FAILED_EXPLANATION_PREFIX}"}},
+            },
+            {"paper_id": 1, "_id": 0},
+        )
+        return {doc["paper_id"] for doc in cursor}
+
+    def get_all_papers(self, max_cache_age_seconds=20) -> List[Paper]:
         """Get all papers, with caching for better performance"""
         current_time = time.time()
 
@@ -64,11 +227,13 @@ class DatabaseService:
                 self._cache
                 and current_time - self._cache_timestamp <= max_cache_age_seconds
             ):
+                self._record_cache_lookup("all_papers", hits=1)
                 return self._cache.get("all_papers", [])
 
         # Cache miss
+        self._record_cache_lookup("all_papers", misses=1)
         logger.debug("Cache miss for all_papers, fetching from database")
-        papers = list(self.collection.find())
+        papers = [Paper.from_document(doc) for doc in self.collection.find({}, {"_id": 0})]
 
         # Update cache
         with self._cache_lock:
@@ -77,16 +242,133 @@ class DatabaseService:
 
         return papers
 
-    def get_paper_by_id(self, paper_id: str):
+    def _cache_papers(self, papers: List[Paper]):
+        """Add full papers to the bounded per-paper cache"""
+        with self._cache_lock:
+            for paper in papers:
+                self._paper_cache[paper.paper_id] = paper
+                self._paper_cache.move_to_end(paper.paper_id)
+            while len(self._paper_cache) > PAPER_CACHE_SIZE:
+                self._paper_cache.popitem(last=False)
+
+    def get_paper_by_id(self, paper_id: str) -> Optional[Paper]:
         """Get a paper by ID with caching"""
         with self._cache_lock:
-            if "all_papers" in self._cache:
-                for paper in self._cache["all_papers"]:
-                    if paper["paper_id"] == paper_id:
-                        return paper
-        
+            paper = self._paper_cache.get(paper_id)
+            if paper is not None:
+                self._paper_cache.move_to_end(paper_id)
+                self._record_cache_lookup("paper", hits=1)
+                return paper
+
         # Cache miss
-        return self.collection.find_one({"paper_id": paper_id})
+        self._record_cache_lookup("paper", misses=1)
+        doc = self.collection.find_one({"paper_id": paper_id}, {"_id": 0})
+        if doc is None:
+            return None
+        paper = Paper.from_document(doc)
+        self._cache_papers([paper])
+        return paper
+
+    def prefetch_papers(self, paper_ids: List[str]):
+        """Load any of the given papers that are not cached yet in a single query"""
+        with self._cache_lock:
+            missing = [pid for pid in paper_ids if pid not in self._paper_cache]
+        self._record_cache_lookup("paper", hits=len(paper_ids) - len(missing), misses=len(missing))
+        if missing:
+            self._cache_papers(
+                [
+                    Paper.from_document(doc)
+                    for doc in self.collection.find({"paper_id": {"$in": missing}}, {"_id": 0})
+                ]
+            )
+
+    @staticmethod
+    def _page_cursor(paper: PaperListItem) -> str:
+        return f"{paper.daily_date or ''}|{paper.paper_id}"
+
+    def get_papers_page(
+        self,
+        cursor: Optional[str] = None,
+        backward: bool = False,
+        limit: int = PAGE_SIZE,
+        search: Optional[str] = None,
+    ) -> Dict:
+        """
+        Get one page of list entries (paper_id, title, daily_date), newest first.
+        Without a cursor the first page is returned. Otherwise the page is the
+        `limit` entries after the cursor, or before it when `backward` is set.
+        `search` restricts the list to papers whose title or summary match the
+        given words (through the text index). Returns the entries with the
+        cursors of the neighbouring pages, which are None when there is no such page.
+        Raises ValueError for a cursor that was not returned by this method.
+        """
+        query = {}
+        if cursor:
+            if "|" not in cursor:
+                raise ValueError(f"Invalid page cursor '{cursor}'")
+            daily_date, paper_id = cursor.split("|", 1)
+            # Entries after the cursor are on older days, or the same day with a greater ID
+            date_op, id_op = ("$gt", "$lt") if backward else ("$lt", "$gt")
+            query = {
+                "$or": [
+                    {"daily_date": {date_op: daily_date}},
+                    {"daily_date": daily_date, "paper_id": {id_op: paper_id}},
+                ]
+            }
+        if search:
+            query = {"$and": [{"$text": {"$search": search}}, query]} if query else {"$text": {"$search": search}}
+        sort = [(field, -direction) for field, direction in LIST_SORT] if backward else LIST_SORT
+
+        papers = [
+            PaperListItem.from_document(doc)
+            for doc in self.collection.find(query, LIST_PROJECTION).sort(sort).limit(limit + 1)
+        ]
+        has_more = len(papers) > limit
+        papers = papers[:limit]
+        if backward:
+            papers.reverse()
+
+        next_cursor = prev_cursor = None
+        if papers:
+            if backward:
+                prev_cursor = self._page_cursor(papers[0]) if has_more else None
+                next_cursor = self._page_cursor(papers[-1])
+            else:
+                prev_cursor = self._page_cursor(papers[0]) if cursor else None
+                next_cursor = self._page_cursor(papers[-1]) if has_more else None
+
+        return {"papers": papers, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+    def iter_explanations(self):
+        """Iterate over the paper_id, explanation and explanation_hash of every analyzed paper"""
+        return self.collection.find(
+            {"explanation": {"$nin": [None, ""]}},
+            {"_id": 0, "paper_id": 1, "explanation": 1, "explanation_hash": 1},
+        )
+
+    def _analytics_collection(self):
+        """The papers collection read from a secondary when one is available"""
+        from pymongo.read_preferences import SecondaryPreferred
+
+        return self.collection.with_options(read_preference=SecondaryPreferred())
+
+    def iter_papers_for_date(self, daily_date: str):
+        """Iterate over the stored documents of one day by paper ID, without the HTML artifact"""
+        return (
+            self._analytics_collection()
+            .find({"daily_date": daily_date}, {"_id": 0, "explanation_html": 0})
+            .sort("paper_id", 1)
+        )
+
+    def set_explanation_artifact(self, paper_id: str, explanation_html: str, explanation_hash: str):
+        """Store the pre-rendered HTML artifact of a paper's explanation"""
+        doc = self.collection.find_one_and_update(
+            {"paper_id": paper_id},
+            {"$set": {"explanation_html": explanation_html, "explanation_hash": explanation_hash}},
+            projection={"_id": 0, "daily_date": 1},
+        )
+        self._invalidate_cache()
+        self._bump_data_version(doc and doc.get("daily_date"))
 
     def get_papers_count(self):
         """Get the count of papers in the database"""
@@ -113,6 +395,65 @@ class DatabaseService:
             upsert=True
         )
 
+    def try_start_processing(self, owner: str) -> bool:
+        """
+        Atomically take the processing lease for `owner` if no live run holds it,
+        so a daily run and a backfill never run at once, even from different
+        processes. A lease whose heartbeat is older than PROGRESS_STALE_SECONDS
+        belongs to a run that died and is taken over. Returns whether `owner`
+        now holds it; renew it with renew_processing_lease and give it back
+        with release_processing.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=PROGRESS_STALE_SECONDS)
+        try:
+            previous = self.metadata_collection.find_one_and_update(
+                {
+                    "_id": "processing_metadata",
+                    "$or": [
+                        {"is_processing": {"$ne": True}},
+                        {"heartbeat": {"$lt": stale_before}},
+                        # Held by a version that did not record heartbeats
+                        {"heartbeat": {"$exists": False}},
+                    ],
+                },
+                {"$set": {"is_processing": True, "owner": owner, "heartbeat": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The metadata exists and another run holds a live lease
+            return False
+        if previous and previous.get("is_processing"):
+            logger.warning(f"Taking over the stale processing lease of {previous.get('owner')}")
+        logger.info(f"Processing lease taken by {owner}")
+        return True
+
+    def renew_processing_lease(self, owner: str) -> bool:
+        """Renew the heartbeat of `owner`'s lease; False when it no longer holds it"""
+        result = self.metadata_collection.update_one(
+            {"_id": "processing_metadata", "is_processing": True, "owner": owner},
+            {"$set": {"heartbeat": datetime.utcnow()}},
+        )
+        return result.matched_count == 1
+
+    def release_processing(self, owner: str):
+        """Give back `owner`'s lease, leaving a lease taken over by another run alone"""
+        logger.info(f"Processing lease released by {owner}")
+        self.metadata_collection.update_one(
+            {"_id": "processing_metadata", "owner": owner},
+            {"$set": {"is_processing": False}, "$unset": {"owner": "", "heartbeat": ""}},
+        )
+
+    def update_processing_progress(self, progress: Dict):
+        """Publish the progress of the current run alongside the processing status"""
+        self.metadata_collection.update_one(
+            {"_id": "processing_metadata"},
+            {"$set": {"progress": progress}},
+            upsert=True
+        )
+
     def get_processing_metadata(self) -> ProcessingMetadata:
         """Get the processing metadata"""
         data = self.metadata_collection.find_one({"_id": "processing_metadata"})
@@ -123,13 +464,66 @@ class DatabaseService:
         
         metadata = ProcessingMetadata()
         metadata.last_processed_date = data.get("last_processed_date", datetime.utcnow())
-        metadata.is_processing = data.get("is_processing", False)
+        # A lease that stopped being renewed belongs to a run that died
+        heartbeat = data.get("heartbeat")
+        metadata.is_processing = (
+            data.get("is_processing", False)
+            and heartbeat is not None
+            and (datetime.utcnow() - heartbeat).total_seconds() < PROGRESS_STALE_SECONDS
+        )
+        metadata.progress = data.get("progress")
         
         return metadata
 
-    def should_process_today(self) -> bool:
-        """Check if papers should be processed today based on last processed date"""
-        metadata = self.get_processing_metadata()
+    def get_backfill_checkpoint(self) -> Set[str]:
+        """Get the ISO dates that a backfill has already completed"""
+        data = self.metadata_collection.find_one({"_id": BACKFILL_CHECKPOINT_ID})
+        if not data:
+            return set()
+        return set(data.get("completed_dates", []))
+
+    def mark_backfill_date_completed(self, date_str: str):
+        """Record that every paper for the given ISO date has been stored"""
+        logger.info(f"Marking backfill date {date_str} as completed")
+        self.metadata_collection.update_one(
+            {"_id": BACKFILL_CHECKPOINT_ID},
+            {
+                "$addToSet": {"completed_dates": date_str},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True
+        )
+
+    def save_run_metrics(self, run_type: str, summary: Dict):
+        """Store the metrics summary of a processing run, dropping all but the latest RUN_METRICS_KEEP"""
+        logger.info(f"Saving {run_type} run metrics")
+        self.metadata_collection.insert_one(
+            {"type": RUN_METRICS_TYPE, "run_type": run_type, "finished_at": datetime.utcnow(), **summary}
+        )
+        expired = [
+            doc["_id"]
+            for doc in self.metadata_collection.find({"type": RUN_METRICS_TYPE}, {"_id": 1})
+            .sort(RUN_METRICS_SORT)
+            .skip(RUN_METRICS_KEEP)
+        ]
+        if expired:
+            self.metadata_collection.delete_many({"_id": {"$in": expired}})
+
+    def get_run_metrics(self, limit: int = 10) -> List[Dict]:
+        """Get the metrics summaries of the latest processing runs, newest first"""
+        return list(
+            self.metadata_collection.find({"type": RUN_METRICS_TYPE})
+            .sort(RUN_METRICS_SORT)
+            .limit(limit)
+        )
+
+    def should_process_today(self, metadata: Optional[ProcessingMetadata] = None) -> bool:
+        """
+        Check if papers should be processed today based on last processed date.
+        Pass already loaded metadata to avoid reading it again.
+        """
+        if metadata is None:
+            metadata = self.get_processing_metadata()
         
         # If already processing, don't start another process
         if metadata.is_processing:
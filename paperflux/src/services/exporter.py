@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from paperflux.src.config.settings import EXPORT_DIR
+from paperflux.src.services.database import DatabaseService
+
+logger = logging.getLogger("paperflux.exporter")
+
+# Bumped when the columns change, so old exports are rewritten rather than mixed
+EXPORT_SCHEMA_VERSION = "1"
+MANIFEST_FILE = "_manifest.json"
+PAPERS_DIR = "papers"
+
+
+def _pyarrow():
+    """Import pyarrow on first use; it is only needed to export or load the archive"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "Exporting the archive requires pyarrow. Install it with `pip install pyarrow`."
+        )
+    return pyarrow
+
+
+def paper_schema():
+    """Arrow schema of the exported papers; daily_date is the partition key, kept in the path"""
+    pa = _pyarrow()
+    return pa.schema(
+        [
+            pa.field("paper_id", pa.string(), nullable=False),
+            pa.field("title", pa.string()),
+            pa.field("authors", pa.list_(pa.struct([pa.field("name", pa.string())]))),
+            pa.field("author_count", pa.int32()),
+            pa.field("summary", pa.string()),
+            pa.field("published_at", pa.timestamp("ms", tz="UTC")),
+            pa.field("pdf_url", pa.string()),
+            pa.field("explanation", pa.string()),
+            pa.field("explanation_length", pa.int32()),
+            pa.field("explanation_hash", pa.string()),
+            pa.field("processed_at", pa.timestamp("ms", tz="UTC")),
+        ],
+        metadata={"paperflux_schema_version": EXPORT_SCHEMA_VERSION},
+    )
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return None
+
+
+def _to_row(doc: Dict) -> Dict:
+    authors = [{"name": author.get("name", "")} for author in doc.get("authors") or []]
+    explanation = doc.get("explanation")
+    return {
+        "paper_id": doc["paper_id"],
+        "title": doc.get("title"),
+        "authors": authors,
+        "author_count": len(authors),
+        "summary": doc.get("summary"),
+        "published_at": _parse_timestamp(doc.get("published_at")),
+        "pdf_url": doc.get("pdf_url"),
+        "explanation": explanation,
+        "explanation_length": len(explanation) if explanation else 0,
+        "explanation_hash": doc.get("explanation_hash"),
+        "processed_at": _parse_timestamp(doc.get("processed_at")),
+    }
+
+
+class ArchiveExporter:
+    """
+    Writes the paper archive to date-partitioned Parquet files under
+    `export_dir`/papers/daily_date=YYYY-MM-DD/. A manifest records the paper
+    count and change marker (DatabaseService.get_day_versions) of every
+    exported day, so each run only writes days that are new or changed (filled
+    in by a backfill, or a paper reprocessed or re-rendered) without reading
+    the others, and removes days that no longer have papers. Paper reads go to
+    a secondary when the deployment has one.
+    """
+
+    def __init__(self, db: Optional[DatabaseService] = None, export_dir: str = EXPORT_DIR):
+        self.db = db or DatabaseService()
+        self.export_dir = export_dir
+        self.manifest_path = os.path.join(export_dir, MANIFEST_FILE)
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"schema_version": EXPORT_SCHEMA_VERSION, "days": {}}
+        if manifest.get("schema_version") != EXPORT_SCHEMA_VERSION:
+            logger.info("Export schema changed, rewriting every day")
+            return {"schema_version": EXPORT_SCHEMA_VERSION, "days": {}}
+        return manifest
+
+    def _save_manifest(self, manifest: Dict):
+        manifest["updated_at"] = datetime.utcnow().isoformat()
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _partition_dir(self, daily_date: str) -> str:
+        return os.path.join(self.export_dir, PAPERS_DIR, f"daily_date={daily_date}")
+
+    def _exported_days(self, manifest: Dict) -> List[str]:
+        """Days in the manifest or with a partition on disk"""
+        days = set(manifest["days"])
+        try:
+            entries = os.listdir(os.path.join(self.export_dir, PAPERS_DIR))
+        except FileNotFoundError:
+            entries = []
+        days.update(entry.split("=", 1)[1] for entry in entries if entry.startswith("daily_date="))
+        return sorted(days)
+
+    def _remove_day(self, daily_date: str, manifest: Dict):
+        shutil.rmtree(self._partition_dir(daily_date), ignore_errors=True)
+        manifest["days"].pop(daily_date, None)
+        self._save_manifest(manifest)
+        logger.info(f"Removed {daily_date}, which no longer has papers")
+
+    def _write_day(self, daily_date: str) -> int:
+        """
+        Write one day's partition, replacing the previous file atomically.
+        Returns the rows written; a day without papers is not written.
+        """
+        pa = _pyarrow()
+        rows = [_to_row(doc) for doc in self.db.iter_papers_for_date(daily_date)]
+        if not rows:
+            return 0
+        table = pa.Table.from_pylist(rows, schema=paper_schema())
+
+        partition_dir = self._partition_dir(daily_date)
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, "part-0.parquet")
+        tmp_path = path + ".tmp"
+        pa.parquet.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        return table.num_rows
+
+    def export(self, include_today: bool = False, full: bool = False) -> List[str]:
+        """
+        Export every day that is new or changed since the last export, remove
+        the days that no longer have papers, and return the days written or
+        removed. Today is skipped unless `include_today`, since its papers may
+        still be processing. `full` rewrites every day.
+        """
+        _pyarrow()
+        os.makedirs(self.export_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        versions = self.db.get_day_versions()
+
+        removed = [day for day in self._exported_days(manifest) if day not in versions]
+        for day in removed:
+            self._remove_day(day, manifest)
+        if full:
+            manifest["days"] = {}
+
+        today = datetime.utcnow().date().isoformat()
+        pending = sorted(
+            day
+            for day, version in versions.items()
+            if (include_today or day < today) and not _exported_at(manifest["days"].get(day), version)
+        )
+        logger.info(f"Exporting {len(pending)} of {len(versions)} days to {self.export_dir}")
+
+        for day in pending:
+            # The marker is read before the papers, so a write racing the export is picked up next time
+            rows = self._write_day(day)
+            if not rows:
+                self._remove_day(day, manifest)
+                # Saved first, so the manifest never keeps a day whose marker is gone
+                self.db.forget_day_version(day, versions[day])
+                removed.append(day)
+                continue
+            manifest["days"][day] = {"papers": rows, "version": versions[day]}
+            # Saved per day so an interrupted export resumes where it stopped
+            self._save_manifest(manifest)
+            logger.info(f"Exported {rows} papers for {day}")
+        return sorted(set(pending) | set(removed))
+
+
+def _exported_at(entry, version: int) -> bool:
+    """Whether a manifest entry was written at the given change marker"""
+    return isinstance(entry, dict) and entry.get("version") == version
+
+
+def open_archive(export_dir: str = EXPORT_DIR):
+    """
+    Open an exported archive as a pyarrow dataset over memory-mapped files.
+    Filters on daily_date only read the matching partitions, e.g.
+    `open_archive().to_table(columns=["title"], filter=ds.field("daily_date") >= "2025-01-01")`.
+    """
+    _pyarrow()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(
+        os.path.abspath(os.path.join(export_dir, PAPERS_DIR)),
+        schema=paper_schema().append(pa.field("daily_date", pa.string())),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("daily_date", pa.string())]), flavor="hive"),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def load_papers(
+    export_dir: str = EXPORT_DIR,
+    columns: Optional[List[str]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    """Load exported papers between two ISO dates (inclusive) as a pyarrow Table"""
+    dataset = open_archive(export_dir)
+    import pyarrow.dataset as ds
+
+    date_filter = None
+    if start_date:
+        date_filter = ds.field("daily_date") >= start_date
+    if end_date:
+        end_filter = ds.field("daily_date") <= end_date
+        date_filter = end_filter if date_filter is None else date_filter & end_filter
+    return dataset.to_table(columns=columns, filter=date_filter)
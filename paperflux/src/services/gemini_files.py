@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from paperflux.src.config.settings import (
+    GEMINI_FILE_PREFIX,
+    GEMINI_ORPHAN_MAX_AGE_SECONDS,
+    GEMINI_UPLOAD_CONCURRENCY,
+    QA_SESSION_TTL_SECONDS,
+)
+from paperflux.src.services.metrics import MetricsRegistry
+from paperflux.src.services.profiling import thread_profiled
+
+logger = logging.getLogger("paperflux.gemini_files")
+
+ANALYSIS_DISPLAY_NAME_PREFIX = f"{GEMINI_FILE_PREFIX}analysis-"
+
+
+class GeminiFileManager:
+    """
+    Owns the lifecycle of the PDFs a processing run uploads to Gemini.
+    Uploads run on their own small pool, so papers are uploaded while others
+    are being generated and analysis workers only wait on generation. Every
+    upload is deleted on a background thread once its paper is done, however
+    the analysis ended, with the API key it was uploaded with. Uploads are
+    named with GEMINI_FILE_PREFIX, so ones left behind by a crashed run are
+    found and reaped, in the file store of every key, by the next run. With
+    `max_live`, uploads wait while that many are not yet deleted, which bounds
+    how far uploads run ahead of analysis.
+    Close the manager (or use it as a context manager) to finish pending
+    deletes and stop its threads.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        upload_concurrency: int = GEMINI_UPLOAD_CONCURRENCY,
+        max_live: Optional[int] = None,
+    ):
+        self.analyzer = analyzer
+        self.metrics = MetricsRegistry()
+        self._uploads = ThreadPoolExecutor(upload_concurrency, thread_name_prefix="paperflux-upload")
+        self._deletes = ThreadPoolExecutor(1, thread_name_prefix="paperflux-delete")
+        # Uploads of this process not yet deleted, with the index of the key they were
+        # uploaded with; the reaper leaves them alone
+        self._live: Dict[str, Tuple[object, int]] = {}
+        self._lock = threading.Lock()
+        # Taken by upload and given back by delete, both on the event loop
+        self._live_slots = asyncio.Semaphore(max_live) if max_live else None
+
+    @thread_profiled
+    def _upload(self, pdf, paper_id: str):
+        key_index = self.analyzer.key_index
+        with self.metrics.timer("gemini_upload"):
+            uploaded_file = self.analyzer.upload_file(
+                pdf, f"{ANALYSIS_DISPLAY_NAME_PREFIX}{paper_id}", key_index
+            )
+        with self._lock:
+            self._live[uploaded_file.name] = (uploaded_file, key_index)
+            self.metrics.set_gauge("paperflux_gemini_live_files", len(self._live))
+        self.metrics.inc("paperflux_gemini_files_total", action="uploaded")
+        return uploaded_file, key_index
+
+    async def upload(self, pdf, paper_id: str) -> Tuple[object, int]:
+        """
+        Upload a paper's PDF on the upload pool and return the uploaded file
+        with the index of the API key it was uploaded with, which is the only
+        key that can read it
+        """
+        if self._live_slots is not None:
+            await self._live_slots.acquire()
+        self.metrics.inc("paperflux_queue_depth", queue="upload")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._uploads, self._upload, pdf, paper_id
+            )
+        except BaseException:
+            if self._live_slots is not None:
+                self._live_slots.release()
+            raise
+        finally:
+            self.metrics.inc("paperflux_queue_depth", -1, queue="upload")
+
+    def delete(self, uploaded_file):
+        """Delete an upload in the background"""
+        self._deletes.submit(self._delete, uploaded_file)
+        if self._live_slots is not None:
+            self._live_slots.release()
+
+    def _delete(self, uploaded_file):
+        with self._lock:
+            live = self._live.get(uploaded_file.name)
+        key_index = live[1] if live is not None else self.analyzer.key_index
+        try:
+            self.analyzer.delete_file(uploaded_file, key_index)
+            self.metrics.inc("paperflux_gemini_files_total", action="deleted")
+        except Exception as e:
+            # Left for the reaper of a later run
+            logger.warning(f"Failed to delete uploaded file {uploaded_file.name}: {str(e)}")
+            self.metrics.inc("paperflux_gemini_files_total", action="delete_failed")
+        finally:
+            with self._lock:
+                self._live.pop(uploaded_file.name, None)
+                self.metrics.set_gauge("paperflux_gemini_live_files", len(self._live))
+
+    def reap_orphans(self, max_age_seconds: int = GEMINI_ORPHAN_MAX_AGE_SECONDS) -> int:
+        """
+        Delete uploads named with GEMINI_FILE_PREFIX that are older than
+        `max_age_seconds` and not in use by this process, from the file store
+        of every API key. Q&A sessions are never reaped before their TTL.
+        Returns the number of files deleted.
+        """
+        max_age_seconds = max(max_age_seconds, QA_SESSION_TTL_SECONDS)
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        reaped = 0
+        for key_index in range(len(self.analyzer.api_keys)):
+            try:
+                uploaded_files = self.analyzer.list_files(key_index)
+            except Exception as e:
+                logger.warning(f"Could not list uploaded files of API key {key_index}: {str(e)}")
+                continue
+            for uploaded_file in uploaded_files:
+                display_name = getattr(uploaded_file, "display_name", None) or ""
+                create_time = getattr(uploaded_file, "create_time", None)
+                if not display_name.startswith(GEMINI_FILE_PREFIX) or create_time is None:
+                    continue
+                if create_time.tzinfo is None:
+                    create_time = create_time.replace(tzinfo=timezone.utc)
+                with self._lock:
+                    live = uploaded_file.name in self._live
+                if live or create_time > cutoff:
+                    continue
+                try:
+                    self.analyzer.delete_file(uploaded_file, key_index)
+                except Exception as e:
+                    logger.warning(f"Failed to reap uploaded file {uploaded_file.name}: {str(e)}")
+                    continue
+                reaped += 1
+                self.metrics.inc("paperflux_gemini_files_total", action="reaped")
+        if reaped:
+            logger.info(f"Reaped {reaped} orphaned uploads")
+        return reaped
+
+    def reap_orphans_in_background(self):
+        """Reap orphans on the delete thread, logging rather than raising failures"""
+
+        def reap():
+            try:
+                self.reap_orphans()
+            except Exception as e:
+                logger.warning(f"Could not reap orphaned uploads: {str(e)}")
+
+        self._deletes.submit(reap)
+
+    def close(self):
+        """Finish pending uploads and deletes, then stop the upload and delete threads"""
+        self._uploads.shutdown(wait=True)
+        self._deletes.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,215 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("paperflux.metrics")
+
+# Latency buckets in seconds, from quick Mongo writes up to long Gemini generations
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# Every metric the pipeline reports: name -> (type, help)
+METRICS = {
+    "paperflux_stage_duration_seconds": (
+        HISTOGRAM,
+        "Latency of pipeline stages (hf_fetch, pdf_download, gemini_upload, gemini_generate, mongo_insert)"
+        " and of paper Q&A (qa_download, qa_upload, qa_cache, qa_generate)",
+    ),
+    "paperflux_gemini_requests_total": (
+        COUNTER,
+        "Gemini generation attempts per API key index and outcome (success, failure, retry)",
+    ),
+    "paperflux_gemini_rate_limited_total": (COUNTER, "Gemini 429/quota errors per API key index"),
+    "paperflux_gemini_tokens_total": (COUNTER, "Gemini tokens used per API key index and kind"),
+    "paperflux_gemini_files_total": (
+        COUNTER,
+        "Gemini file store operations by action (uploaded, deleted, delete_failed, reaped)",
+    ),
+    "paperflux_gemini_live_files": (GAUGE, "Uploads of this process not yet deleted from the Gemini file store"),
+    "paperflux_downloads_total": (COUNTER, "PDF downloads by outcome"),
+    "paperflux_downloaded_bytes_total": (COUNTER, "Bytes of PDF downloaded"),
+    "paperflux_papers_total": (COUNTER, "Papers finished by outcome (stored, failed)"),
+    "paperflux_queue_depth": (GAUGE, "Papers waiting in or being worked on by a pipeline queue"),
+    "paperflux_buffer_pool_bytes": (GAUGE, "Bytes of downloaded PDFs reserved in the in-memory buffer pool"),
+    "paperflux_buffer_pool_spills_total": (COUNTER, "In-memory downloads written to disk because they were too large"),
+    "paperflux_qa_questions_total": (COUNTER, "Paper Q&A questions by outcome (answered, memoized, failed)"),
+    "paperflux_qa_sessions": (GAUGE, "Papers with a live Q&A context (uploaded file or cached content)"),
+    "paperflux_api_requests_total": (COUNTER, "Read-only API responses per route and status"),
+    "paperflux_api_coalesced_total": (
+        COUNTER,
+        "Read-only API requests that waited for a response already being built instead of building it",
+    ),
+    "paperflux_db_cache_requests_total": (
+        COUNTER,
+        "DatabaseService cache lookups per cache (all_papers, paper) and result (hit, miss)",
+    ),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide store of pipeline counters, gauges and latency histograms"""
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super(MetricsRegistry, cls).__new__(cls)
+                cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._values: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], List] = {}
+        self._values_lock = threading.Lock()
+        self._server = None
+        self._initialized = True
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increase a counter, or move a gauge by `amount`"""
+        key = (name, _label_key(labels))
+        with self._values_lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._values_lock:
+            self._values[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        key = (name, _label_key(labels))
+        with self._values_lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+            index = bisect.bisect_left(DEFAULT_BUCKETS, value)
+            if index < len(DEFAULT_BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a pipeline stage into paperflux_stage_duration_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("paperflux_stage_duration_seconds", time.perf_counter() - start, stage=stage)
+
+    def snapshot(self) -> Dict:
+        """Copy of the current values, to compute what a single run contributed"""
+        with self._values_lock:
+            return {
+                "values": dict(self._values),
+                "histograms": {key: (h[1], h[2]) for key, h in self._histograms.items()},
+                "taken_at": time.time(),
+            }
+
+    def summary_since(self, before: Dict) -> Dict:
+        """Summarize counter and stage latency changes since `before` (from snapshot())"""
+        after = self.snapshot()
+        stages = {}
+        for (name, labels), (total, count) in after["histograms"].items():
+            prev_total, prev_count = before["histograms"].get((name, labels), (0.0, 0))
+            if count == prev_count:
+                continue
+            stage = dict(labels).get("stage", name)
+            stages[stage] = {
+                "count": count - prev_count,
+                "total_seconds": total - prev_total,
+                "mean_seconds": (total - prev_total) / (count - prev_count),
+            }
+        counters = []
+        for (name, labels), value in after["values"].items():
+            if METRICS.get(name, (COUNTER,))[0] != COUNTER:
+                continue
+            delta = value - before["values"].get((name, labels), 0)
+            if delta:
+                counters.append({"name": name, "labels": dict(labels), "value": delta})
+        return {
+            "duration_seconds": after["taken_at"] - before["taken_at"],
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._values_lock:
+            values = dict(self._values)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == HISTOGRAM:
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', str(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, port: int, host: str = "127.0.0.1"):
+        """Serve /metrics on a local port from a daemon thread; later calls are no-ops"""
+        with self._values_lock:
+            if self._server is not None:
+                return self._server
+            registry = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?", 1)[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    logger.debug(format % args)
+
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+            return self._server
@@ -1,18 +1,42 @@
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from dotenv import load_dotenv
 import os
+import threading
 import time
 import logging
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+from paperflux.src.services.buffer_pool import PDFBuffer
+from paperflux.src.services.metrics import MetricsRegistry
 
 load_dotenv()
 
 logger = logging.getLogger("paperflux.paper_analyzer")
 
+
+def _genai():
+    """Import the Gemini SDK on first use, so processes that never analyze never load it"""
+    import google.generativeai as genai
+    return genai
+
+
+QA_SYSTEM_INSTRUCTION = (
+    "You answer follow-up questions about the attached research paper. "
+    "An earlier in-depth analysis of it is included for reference. Answer precisely, "
+    "cite sections, equations or figures of the paper where relevant, use LaTeX for math, "
+    "and say so when the paper does not answer the question."
+)
+
+
 class PaperAnalyzer:
+    model_name = "gemini-2.5-flash-preview-05-20"
+    # Backoff after a rate-limit error grows by this much per attempt, up to the maximum
+    rate_limit_backoff_seconds = 60
+    max_backoff_seconds = 180
+
     def __init__(self):
         logger.info("Initializing PaperAnalyzer")
         load_dotenv()
+        self.metrics = MetricsRegistry()
 
         # API keys from environment variables
         self.api_keys = [
@@ -27,14 +51,20 @@ class PaperAnalyzer:
             
         logger.info(f"Found {len(self.api_keys)} Gemini API keys")
         self.key_index = 0
+        # Clients bound to one key each, unaffected by the rotation of genai.configure
+        self._key_clients: Dict[int, object] = {}
+        self._key_clients_lock = threading.Lock()
         
         # Configure with the first API key
         self._configure_client()
         
     def _configure_client(self):
         """Configure the Gemini client with the current API key"""
+        genai = _genai()
+        from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
         genai.configure(api_key=self.api_keys[self.key_index])
-        self.model = genai.GenerativeModel("gemini-2.5-flash-preview-05-20")
+        self.model = genai.GenerativeModel(self.model_name)
         self.safety_settings = {
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
             HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
@@ -49,12 +79,185 @@ class PaperAnalyzer:
         self._configure_client()
         logger.info(f"Switched to API key index: {self.key_index}")
 
-    def analyze_paper(self, pdf_path: str) -> str:
-        """Analyze a paper using Gemini API"""
-        logger.info(f"Analyzing paper: {pdf_path}")
-        
+    def _record_token_usage(self, response, key_index: int):
+        """Count the tokens a generation used, when the response reports them"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        for kind, field in (
+            ("prompt", "prompt_token_count"),
+            ("output", "candidates_token_count"),
+            ("total", "total_token_count"),
+            # Prompt tokens served from a context cache, billed at a reduced rate
+            ("cached", "cached_content_token_count"),
+        ):
+            count = getattr(usage, field, 0) or 0
+            if count:
+                self.metrics.inc("paperflux_gemini_tokens_total", count, key_index=key_index, kind=kind)
+
+    def _client(self, key_index: int, service: str):
+        """The Gemini `service` client ("file", "cache", "generative") of one API key"""
+        with self._key_clients_lock:
+            manager = self._key_clients.get(key_index)
+            if manager is None:
+                _genai()
+                from google.generativeai.client import _ClientManager
+
+                manager = _ClientManager()
+                manager.configure(api_key=self.api_keys[key_index])
+                self._key_clients[key_index] = manager
+        return manager.get_default_client(service)
+
+    def _model(self, key_index: int):
+        """A model that generates with one API key, which can read that key's uploads"""
+        model = _genai().GenerativeModel(self.model_name)
+        model._client = self._client(key_index, "generative")
+        return model
+
+    def upload_file(self, pdf, display_name: Optional[str] = None, key_index: Optional[int] = None):
+        """
+        Upload a PDF, from its path or straight from memory, to the Gemini file
+        store of an API key (the current one by default)
+        """
+        from google.generativeai.types import file_types
+
+        key_index = self.key_index if key_index is None else key_index
+        if isinstance(pdf, PDFBuffer):
+            path, display_name = pdf.open(), display_name or f"{pdf.name}.pdf"
+        else:
+            path, display_name = pdf, display_name or os.path.basename(pdf)
+        response = self._client(key_index, "file").create_file(
+            path=path, mime_type="application/pdf", name=None, display_name=display_name, resumable=True
+        )
+        return file_types.File(response)
+
+    def delete_file(self, uploaded_file, key_index: Optional[int] = None):
+        """Delete an uploaded PDF from the Gemini file store of the key it was uploaded with"""
+        key_index = self.key_index if key_index is None else key_index
+        self._client(key_index, "file").delete_file(
+            request=_genai().protos.DeleteFileRequest(name=uploaded_file.name)
+        )
+
+    def list_files(self, key_index: Optional[int] = None):
+        """Files in the Gemini file store of an API key (the current one by default)"""
+        from google.generativeai.types import file_types
+
+        key_index = self.key_index if key_index is None else key_index
+        response = self._client(key_index, "file").list_files(_genai().protos.ListFilesRequest(page_size=100))
+        return [file_types.File(proto) for proto in response]
+
+    def create_qa_context(
+        self, pdf, explanation: Optional[str], ttl_seconds: int, display_name: str, key_index: int
+    ) -> Tuple[object, Optional[object]]:
+        """
+        Upload a paper for follow-up questions and try to cache it, with its
+        analysis, as model context for `ttl_seconds`. Everything is created with
+        the given API key, which the session keeps while other work rotates keys.
+        Returns the uploaded file and the cached content, which is None when
+        caching is not available (e.g. the paper is below the model's minimum
+        cacheable size).
+        """
+        genai = _genai()
+        with self.metrics.timer("qa_upload"):
+            uploaded_file = self.upload_file(pdf, display_name, key_index)
+        try:
+            with self.metrics.timer("qa_cache"):
+                request = genai.caching.CachedContent._prepare_create_request(
+                    model=f"models/{self.model_name}",
+                    display_name=display_name,
+                    system_instruction=QA_SYSTEM_INSTRUCTION,
+                    contents=[uploaded_file, f"Earlier analysis of this paper:\n\n{explanation or ''}"],
+                    ttl=timedelta(seconds=ttl_seconds),
+                )
+                cached_content = genai.caching.CachedContent._from_obj(
+                    self._client(key_index, "cache").create_cached_content(request)
+                )
+        except Exception as e:
+            logger.info(f"Context caching unavailable for {display_name}, reusing the upload: {str(e)}")
+            cached_content = None
+        return uploaded_file, cached_content
+
+    def answer_question(
+        self,
+        question: str,
+        uploaded_file,
+        cached_content=None,
+        explanation: Optional[str] = None,
+        key_index: Optional[int] = None,
+    ) -> str:
+        """Answer a question about a paper set up by create_qa_context, with the key it was set up with"""
+        genai = _genai()
+        key_index = self.key_index if key_index is None else key_index
+        if cached_content is not None:
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+            contents = [question]
+        else:
+            model = genai.GenerativeModel(self.model_name)
+            contents = [
+                QA_SYSTEM_INSTRUCTION,
+                uploaded_file,
+                f"Earlier analysis of this paper:\n\n{explanation or ''}",
+                f"Question: {question}",
+            ]
+        model._client = self._client(key_index, "generative")
+        with self.metrics.timer("qa_generate"):
+            response = model.generate_content(
+                contents,
+                safety_settings=self.safety_settings,
+                generation_config={"temperature": 0.2},
+            )
+        self.metrics.inc("paperflux_gemini_requests_total", key_index=key_index, outcome="success")
+        self._record_token_usage(response, key_index)
+        return response.text
+
+    def release_qa_context(self, uploaded_file, cached_content=None, key_index: Optional[int] = None):
+        """Delete the cached content and uploaded file of a Q&A context"""
+        key_index = self.key_index if key_index is None else key_index
+        if cached_content is not None:
+            try:
+                self._client(key_index, "cache").delete_cached_content(
+                    _genai().protos.DeleteCachedContentRequest(name=cached_content.name)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to delete cached content: {str(e)}")
+        try:
+            self.delete_file(uploaded_file, key_index)
+        except Exception as e:
+            logger.warning(f"Failed to delete uploaded file: {str(e)}")
+
+    def analyze_paper(self, pdf) -> str:
+        """
+        Analyze a paper, given as a path or an in-memory PDFBuffer, using Gemini API.
+        The upload is deleted afterwards whether or not the analysis succeeded.
+        Raises if the paper could not be uploaded or analyzed.
+        """
+        key_index = self.key_index
+        try:
+            with self.metrics.timer("gemini_upload"):
+                uploaded_file = self.upload_file(pdf, key_index=key_index)
+        except Exception as e:
+            logger.error(f"Failed to upload paper {pdf}: {str(e)}")
+            raise
+        try:
+            return self.analyze_uploaded_file(uploaded_file, key_index)
+        finally:
+            try:
+                self.delete_file(uploaded_file, key_index)
+            except Exception as e:
+                logger.warning(f"Failed to delete uploaded file: {str(e)}")
+
+    def analyze_uploaded_file(self, uploaded_file, key_index: Optional[int] = None) -> str:
+        """
+        Analyze a paper already in the Gemini file store of `key_index` (the
+        current key by default). Uploads are only readable with the key they
+        were uploaded with, so every attempt, retries after a 429 included,
+        generates with that key; the shared key still rotates, so later uploads
+        go to other keys. Deleting the upload is left to the caller. Raises once
+        every attempt failed, so a failure is never stored as an explanation.
+        """
+        logger.info(f"Analyzing paper: {uploaded_file.name}")
+
         try:
-            uploaded_file = genai.upload_file(pdf_path)
             prompt = """Analyze this research paper thoroughly and provide:
 
             # Paper Title
@@ -71,22 +274,21 @@ class PaperAnalyzer:
             
             max_attempts = 3
             attempt = 0
+            key_index = self.key_index if key_index is None else key_index
+            model = self._model(key_index)
             
             while attempt < max_attempts:
                 attempt += 1
                 try:
-                    logger.info(f"Attempt {attempt} to analyze paper with api key {self.key_index}")
-                    response = self.model.generate_content(
-                        [prompt, uploaded_file],
-                        safety_settings=self.safety_settings,
-                        generation_config={"temperature": 0.2},
-                    )
-                    
-                    # Clean up
-                    try:
-                        genai.delete_file(uploaded_file.name)
-                    except Exception as e:
-                        logger.warning(f"Failed to delete uploaded file: {str(e)}")
+                    logger.info(f"Attempt {attempt} to analyze paper with api key {key_index}")
+                    with self.metrics.timer("gemini_generate"):
+                        response = model.generate_content(
+                            [prompt, uploaded_file],
+                            safety_settings=self.safety_settings,
+                            generation_config={"temperature": 0.2},
+                        )
+                    self.metrics.inc("paperflux_gemini_requests_total", key_index=key_index, outcome="success")
+                    self._record_token_usage(response, key_index)
                     
                     # Rotate to the next API key after successful completion
                     # This way we distribute load across all keys
@@ -97,17 +299,21 @@ class PaperAnalyzer:
                 except Exception as e:
                     logger.error(f"Error analyzing paper (attempt {attempt}): {str(e)}")
                     
-                    # If rate limited, wait and try again with different key
+                    # If rate limited, wait and try again; other papers move on to the next key
                     if "429" in str(e) or "quota" in str(e).lower():
-                        wait_time = min(60 * attempt, 180)  # Progressive backoff
+                        self.metrics.inc("paperflux_gemini_rate_limited_total", key_index=key_index)
+                        self.metrics.inc("paperflux_gemini_requests_total", key_index=key_index, outcome="retry")
+                        # Progressive backoff
+                        wait_time = min(self.rate_limit_backoff_seconds * attempt, self.max_backoff_seconds)
                         logger.info(f"Rate limited, waiting {wait_time} seconds")
                         time.sleep(wait_time)
                         self.change_api_key()
                     else:
+                        self.metrics.inc("paperflux_gemini_requests_total", key_index=key_index, outcome="failure")
                         raise
             
             raise Exception(f"Failed to analyze paper after {max_attempts} attempts")
                 
         except Exception as e:
             logger.error(f"Failed to analyze paper: {str(e)}")
-            return f"Error analyzing paper: {str(e)}"
+            raise
@@ -1,90 +1,231 @@
 import os
-import aiohttp
 import asyncio
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional
-from paperflux.src.config.settings import HF_API_URL, PDF_BASE_URL, TEMP_DIR
-from paperflux.src.models.models import Paper
+from contextlib import asynccontextmanager
+from typing import Iterable, List, Dict, Optional, Tuple, Union
+from paperflux.src.config.settings import (
+    HF_API_URL,
+    TEMP_DIR,
+    DOWNLOAD_CONCURRENCY,
+    IN_MEMORY_DOWNLOADS,
+    DOWNLOAD_MEMORY_LIMIT_BYTES,
+    MAX_IN_MEMORY_PDF_BYTES,
+)
+from paperflux.src.models.models import Paper, PaperSchemaError
+from paperflux.src.services.buffer_pool import BufferPool, PDFBuffer
+from paperflux.src.services.metrics import MetricsRegistry
 
 logger = logging.getLogger("paperflux.paper_fetcher")
 
+# A downloaded PDF: a path under TEMP_DIR, or a buffer in memory
+PDFSource = Union[str, PDFBuffer]
+
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
 class PaperFetcher:
-    def __init__(self):
-        os.makedirs(TEMP_DIR, exist_ok=True)
-        logger.info(f"PaperFetcher initialized with temp directory: {TEMP_DIR}")
+    def __init__(self, in_memory: bool = IN_MEMORY_DOWNLOADS):
+        self.metrics = MetricsRegistry()
+        self.buffer_pool = (
+            BufferPool(DOWNLOAD_MEMORY_LIMIT_BYTES, MAX_IN_MEMORY_PDF_BYTES) if in_memory else None
+        )
+        if in_memory:
+            logger.info(
+                f"PaperFetcher initialized with an in-memory buffer pool of "
+                f"{DOWNLOAD_MEMORY_LIMIT_BYTES // (1024 * 1024)} MB"
+            )
+        else:
+            os.makedirs(TEMP_DIR, exist_ok=True)
+            logger.info(f"PaperFetcher initialized with temp directory: {TEMP_DIR}")
 
-    async def fetch_papers(self) -> List[dict]:
-        """Fetch daily papers from the Hugging Face API."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(HF_API_URL) as response:
-                if response.status == 200:
-                    papers = await response.json()
-                    logger.info(f"Found {len(papers)} papers from Hugging Face API")
-                    return papers
-                error_msg = f"API request failed: {response.status}"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-
-    async def download_paper(self, paper_entry: dict) -> Optional[str]:
+    async def fetch_papers(self, date: Optional[str] = None) -> List[Paper]:
         """
-        Download a single paper's PDF.
-        Returns the path to the downloaded PDF or None if download failed.
+        Fetch daily papers from the Hugging Face API.
+        Fetches today's list unless an ISO date (YYYY-MM-DD) is given.
+        Entries that do not match the expected schema are skipped.
         """
-        try:
-            paper_id = paper_entry["paper"]["id"]
-            pdf_url = PDF_BASE_URL.format(id=paper_id)
-            # Clean ID for safe filename
-            clean_id = paper_id.replace("/", "_").replace(":", "_")
-            filename = f"{datetime.now().date()}_{clean_id}.pdf"
-            filepath = os.path.join(TEMP_DIR, filename)
+        import aiohttp
 
-            logger.info(f"Downloading paper {paper_id} from {pdf_url}")
-            
+        params = {"date": date} if date else None
+        with self.metrics.timer("hf_fetch"):
             async with aiohttp.ClientSession() as session:
-                async with session.get(pdf_url) as response:
+                async with session.get(HF_API_URL, params=params) as response:
                     if response.status == 200:
-                        content = await response.read()
-                        with open(filepath, "wb") as f:
-                            f.write(content)
-                        logger.info(f"Successfully downloaded: {paper_id}")
-                        return filepath
-                    logger.error(f"Failed to download {paper_id}: HTTP {response.status}")
-                    return None
+                        entries = await response.json()
+                        papers = self.decode_papers(entries, date or datetime.utcnow().date().isoformat())
+                        logger.info(f"Found {len(papers)} papers from Hugging Face API for {date or 'today'}")
+                        return papers
+                    error_msg = f"API request failed for {date or 'today'}: {response.status}"
+                    logger.error(error_msg)
+                    raise Exception(error_msg)
+
+    @staticmethod
+    def decode_papers(entries: List[Dict], daily_date: Optional[str] = None) -> List[Paper]:
+        """Decode a daily_papers response, logging and dropping malformed entries"""
+        if not isinstance(entries, list):
+            raise PaperSchemaError(f"Expected a list of papers, got {type(entries).__name__}")
+        papers = []
+        for index, entry in enumerate(entries):
+            try:
+                papers.append(Paper.from_hf_entry(entry, daily_date))
+            except PaperSchemaError as e:
+                logger.warning(f"Skipping malformed paper entry {index}: {str(e)}")
+        return papers
+
+    @asynccontextmanager
+    async def download_session(self):
+        """An aiohttp session allowing at most DOWNLOAD_CONCURRENCY downloads in flight"""
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=DOWNLOAD_CONCURRENCY)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            yield session
+
+    async def download_paper(self, paper: Paper, session=None) -> Optional[PDFSource]:
+        """
+        Download a single paper's PDF, using the given aiohttp session if any.
+        Returns the downloaded PDF (in memory when the buffer pool is enabled
+        and it fits, otherwise a path under TEMP_DIR) or None if download failed.
+        """
+        import aiohttp
+
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await self.download_paper(paper, session)
+
+        paper_id = paper.paper_id
+        try:
+            pdf_url = paper.pdf_url
+            logger.info(f"Downloading paper {paper_id} from {pdf_url}")
+            
+            self.metrics.inc("paperflux_queue_depth", queue="download")
+            reserved = 0
+            try:
+                if self.buffer_pool is not None:
+                    reserved = await self._reserve_buffer(paper_id, pdf_url, session)
+                with self.metrics.timer("pdf_download"):
+                    async with session.get(pdf_url) as response:
+                        if response.status == 200:
+                            if reserved:
+                                # The buffer owns the reservation from here on
+                                reserved, held = 0, reserved
+                                pdf, size = await self._read_into_memory(paper_id, response, held)
+                            else:
+                                pdf, size = await self._read_to_disk(paper_id, response)
+                            self.metrics.inc("paperflux_downloaded_bytes_total", size)
+                            self.metrics.inc("paperflux_downloads_total", outcome="success")
+                            logger.info(f"Successfully downloaded: {paper_id}")
+                            return pdf
+                        logger.error(f"Failed to download {paper_id}: HTTP {response.status}")
+                        self.metrics.inc("paperflux_downloads_total", outcome="http_error")
+                        return None
+            finally:
+                if reserved:
+                    self.buffer_pool.release(reserved)
+                self.metrics.inc("paperflux_queue_depth", -1, queue="download")
 
         except Exception as e:
             logger.error(f"Error downloading {paper_id}: {str(e)}")
+            self.metrics.inc("paperflux_downloads_total", outcome="error")
             return None
 
-    async def download_papers(self, papers: List[dict]) -> Dict[str, str]:
-        """Download all papers in parallel."""
-        tasks = []
-        for paper in papers:
-            tasks.append(self.download_paper(paper))
+    async def _read_to_disk(self, paper_id: str, response, head: Iterable[bytes] = ()) -> Tuple[str, int]:
+        """Stream a response body to TEMP_DIR, after any `head` chunks already read"""
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        # Clean ID for safe filename
+        clean_id = paper_id.replace("/", "_").replace(":", "_")
+        filename = f"{datetime.now().date()}_{clean_id}.pdf"
+        filepath = os.path.join(TEMP_DIR, filename)
+
+        size = 0
+        try:
+            with open(filepath, "wb") as f:
+                for chunk in head:
+                    f.write(chunk)
+                    size += len(chunk)
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            raise
+        return filepath, size
+
+    async def _reserve_buffer(self, paper_id: str, pdf_url: str, session) -> int:
+        """
+        Reserve buffer pool space for a PDF before requesting it, so downloads
+        waiting for memory do not hold connections. The size comes from a HEAD
+        request; without one the largest buffer is reserved, and the rest given
+        back after the download. Returns 0 for PDFs too large for memory.
+        """
+        pool = self.buffer_pool
+        length = None
+        try:
+            async with session.head(pdf_url, allow_redirects=True) as response:
+                if response.status == 200:
+                    length = response.content_length
+        except Exception as e:
+            logger.debug(f"HEAD request for {paper_id} failed, reserving the largest buffer: {str(e)}")
+        if length is not None and not pool.admits(length):
+            logger.info(f"{paper_id} is {length} bytes, too large for memory, writing it to disk")
+            self.metrics.inc("paperflux_buffer_pool_spills_total")
+            return 0
+        return await pool.acquire(length or pool.max_buffer_bytes)
+
+    async def _read_into_memory(self, paper_id: str, response, reserved: int) -> Tuple[PDFSource, int]:
+        """
+        Read a response body into `reserved` bytes of the buffer pool. Bodies
+        that turn out larger than the reservation are streamed to disk instead.
+        """
+        pool = self.buffer_pool
+        length = response.content_length
+        try:
+            if length is not None and length <= reserved:
+                # A single bytes object that BytesIO will share when uploading
+                data = await response.read()
+            elif length is not None:
+                logger.info(f"{paper_id} is larger than its HEAD response said, writing it to disk")
+                self.metrics.inc("paperflux_buffer_pool_spills_total")
+                pool.release(reserved)
+                reserved = 0
+                return await self._read_to_disk(paper_id, response)
+            else:
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > reserved:
+                        logger.info(f"{paper_id} exceeded the in-memory limit, writing it to disk")
+                        self.metrics.inc("paperflux_buffer_pool_spills_total")
+                        pool.release(reserved)
+                        reserved = 0
+                        return await self._read_to_disk(paper_id, response, chunks)
+                data = b"".join(chunks)
+        except Exception:
+            pool.release(reserved)
+            raise
+        return pool.buffer(paper_id, data, reserved), len(data)
+
+    async def download_papers(self, papers: List[Paper]) -> Dict[str, PDFSource]:
+        """Download all papers in parallel, at most DOWNLOAD_CONCURRENCY at a time."""
+        async with self.download_session() as session:
+            tasks = []
+            for paper in papers:
+                tasks.append(self.download_paper(paper, session))
 
-        results = await asyncio.gather(*tasks)
+            results = await asyncio.gather(*tasks)
         
         # Dictionary mapping paper IDs to file paths
         paper_paths = {}
         successful = 0
         
         for paper, file_path in zip(papers, results):
-            paper_id = paper["paper"]["id"]
             if file_path:
-                paper_paths[paper_id] = file_path
+                paper_paths[paper.paper_id] = file_path
                 successful += 1
                 
         logger.info(f"Downloaded {successful}/{len(papers)} papers successfully")
         return paper_paths
-
-    def parse_paper_data(self, paper_entry: dict) -> Paper:
-        """Convert raw paper data to Paper model."""
-        paper_data = paper_entry["paper"]
-        return Paper(
-            paper_id=paper_data["id"],
-            title=paper_data["title"],
-            authors=paper_data["authors"],
-            summary=paper_data["summary"],
-            published_at=paper_data["publishedAt"],
-            pdf_url=PDF_BASE_URL.format(id=paper_data["id"]),
-        )
@@ -1,110 +1,438 @@
 import os
+import socket
+import uuid
+import asyncio
 import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
 from concurrent.futures import ThreadPoolExecutor
-from paperflux.src.services.paper_fetcher import PaperFetcher
+from paperflux.src.models.models import Paper
+from paperflux.src.services.buffer_pool import PDFBuffer
+from paperflux.src.services.paper_fetcher import PaperFetcher, PDFSource
 from paperflux.src.services.paper_analyzer import PaperAnalyzer
+from paperflux.src.services.gemini_files import GeminiFileManager
 from paperflux.src.services.database import DatabaseService
+from paperflux.src.services.renderer import render_explanation
+from paperflux.src.services.metrics import MetricsRegistry
+from paperflux.src.services.progress import ProgressReporter
+from paperflux.src.services.profiling import profiled, thread_profiled
+from paperflux.src.config.settings import (
+    BACKFILL_MAX_CONCURRENT_DAYS,
+    GEMINI_UPLOADS_PER_WORKER,
+    PROCESSING_HEARTBEAT_SECONDS,
+)
 
 logger = logging.getLogger("paperflux.paper_processor")
 
+
+class LLMBudget:
+    """Thread-safe cap on the number of paper analyses a run may request"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int) -> int:
+        """Reserve up to `count` analyses and return how many were granted"""
+        with self._lock:
+            if self.limit is None:
+                granted = count
+            else:
+                granted = max(0, min(count, self.limit - self.used))
+            self.used += granted
+            return granted
+
+    def refund(self, count: int):
+        """Return reserved analyses that were never started"""
+        with self._lock:
+            self.used = max(0, self.used - count)
+
+    @property
+    def exhausted(self) -> bool:
+        with self._lock:
+            return self.limit is not None and self.used >= self.limit
+
+
 class PaperProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        fetcher: Optional[PaperFetcher] = None,
+        analyzer: Optional[PaperAnalyzer] = None,
+    ):
+        """A fetcher or analyzer passed in (e.g. a stand-in) is used instead of creating one"""
         logger.info("Initializing PaperProcessor")
-        self.fetcher = PaperFetcher()
-        self.analyzer = PaperAnalyzer()
         self.db = DatabaseService()
+        self.metrics = MetricsRegistry()
+        self._fetcher = fetcher
+        self._analyzer = analyzer
+        self._init_lock = threading.Lock()
         self._running = False
-        
-    def analyze_and_store_paper(self, paper_entry, pdf_path):
-        """Analyze a paper and store it in the database"""
-        paper_id = paper_entry["paper"]["id"]
-        
+        # Identifies this processor's processing lease across processes and hosts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def fetcher(self) -> PaperFetcher:
+        """Created on first use"""
+        if self._fetcher is None:
+            with self._init_lock:
+                if self._fetcher is None:
+                    self._fetcher = PaperFetcher()
+        return self._fetcher
+
+    @property
+    def analyzer(self) -> PaperAnalyzer:
+        """Created on first use, so the Gemini SDK and API keys are only loaded for analysis"""
+        if self._analyzer is None:
+            with self._init_lock:
+                if self._analyzer is None:
+                    self._analyzer = PaperAnalyzer()
+        return self._analyzer
+
+    @staticmethod
+    async def _close_files(files: Optional[GeminiFileManager]):
+        """Wait for a run's pending deletes and stop its upload threads, off the event loop"""
+        if files is not None:
+            await asyncio.get_running_loop().run_in_executor(None, files.close)
+
+    def _max_workers(self) -> int:
+        """Size the analysis thread pool based on number of available API keys"""
+        return min(len(self.analyzer.api_keys), 10)
+
+    def _file_manager(self) -> GeminiFileManager:
+        """A run's file manager, letting uploads run a few papers ahead of each analysis worker"""
+        return GeminiFileManager(self.analyzer, max_live=GEMINI_UPLOADS_PER_WORKER * self._max_workers())
+
+    def _release_pdf(self, pdf: Optional[PDFSource]):
+        """Free a downloaded PDF: return its buffer to the pool or remove its temporary file"""
+        if isinstance(pdf, PDFBuffer):
+            pdf.release()
+            return
+        pdf_path = pdf
+        if pdf_path and os.path.exists(pdf_path):
+            try:
+                os.remove(pdf_path)
+                logger.debug(f"Removed temporary file: {pdf_path}")
+            except Exception as e:
+                logger.warning(f"Could not remove temporary file {pdf_path}: {str(e)}")
+
+    def _save_run_metrics(self, run_type: str, run_started: Dict):
+        """Store what this run contributed to the metrics in the metadata collection"""
+        try:
+            self.db.save_run_metrics(run_type, self.metrics.summary_since(run_started))
+        except Exception as e:
+            logger.warning(f"Could not save run metrics: {str(e)}")
+
+    @thread_profiled
+    def analyze_and_store_paper(
+        self,
+        paper: Paper,
+        uploaded_file,
+        progress: Optional[ProgressReporter] = None,
+        key_index: Optional[int] = None,
+    ):
+        """
+        Analyze a paper already uploaded to Gemini, with the API key it was
+        uploaded with, and store it in the database
+        """
+        paper_id = paper.paper_id
+        stage = "analysis"
+
         try:
             logger.info(f"Analyzing paper {paper_id}")
-            explanation = self.analyzer.analyze_paper(pdf_path)
-            
-            logger.info(f"Creating paper object for {paper_id}")
-            paper_obj = self.fetcher.parse_paper_data(paper_entry)
-            paper_obj.explanation = explanation
-            
+            explanation = self.analyzer.analyze_uploaded_file(uploaded_file, key_index)
+            if progress:
+                progress.advance("analyzed")
+            stage = "storage"
+
+            paper.explanation = explanation
+
+            # Pre-render the explanation so viewers never parse the markdown
+            try:
+                artifact = render_explanation(explanation)
+                paper.explanation_html = artifact["html"]
+                paper.explanation_hash = artifact["hash"]
+            except Exception as e:
+                logger.warning(f"Could not pre-render explanation for {paper_id}: {str(e)}")
+
             logger.info(f"Storing paper {paper_id} in database")
-            self.db.insert_paper(paper_obj)
+            with self.metrics.timer("mongo_insert"):
+                self.db.upsert_paper(paper)
 
+            self.metrics.inc("paperflux_papers_total", outcome="stored")
+            if progress:
+                progress.advance("stored")
             return True
-            
+
         except Exception as e:
             logger.error(f"Error analyzing paper {paper_id}: {str(e)}")
+            self.metrics.inc("paperflux_papers_total", outcome="failed")
+            if progress:
+                progress.fail(paper_id, stage, str(e))
             return False
-            
-        finally:
-            # Clean up
-            if pdf_path and os.path.exists(pdf_path):
-                try:
-                    os.remove(pdf_path)
-                    logger.debug(f"Removed temporary file: {pdf_path}")
-                except Exception as e:
-                    logger.warning(f"Could not remove temporary file {pdf_path}: {str(e)}")
 
+    async def _ingest_papers(
+        self,
+        papers: List[Paper],
+        daily_date: str,
+        executor: ThreadPoolExecutor,
+        files: GeminiFileManager,
+        claimed: Optional[Set[str]] = None,
+        budget: Optional[LLMBudget] = None,
+        progress: Optional[ProgressReporter] = None,
+    ) -> Dict[str, int]:
+        """
+        Download, analyze and store one day's papers.
+        Papers already in the database, or claimed by another day of the same
+        run, are skipped. Returns counts of stored, failed and budget-skipped papers.
+        """
+        claimed = claimed if claimed is not None else set()
+        if progress:
+            progress.add_total(len(papers))
+
+        paper_ids = [paper.paper_id for paper in papers]
+        existing = self.db.get_existing_paper_ids(paper_ids)
+        new_papers = []
+        for paper, paper_id in zip(papers, paper_ids):
+            if paper_id in existing or paper_id in claimed:
+                continue
+            claimed.add(paper_id)
+            new_papers.append(paper)
+        logger.info(
+            f"{daily_date}: {len(new_papers)} new papers out of {len(papers)} "
+            f"({len(papers) - len(new_papers)} already stored or claimed)"
+        )
+
+        budget_skipped = 0
+        if budget is not None:
+            granted = budget.reserve(len(new_papers))
+            budget_skipped = len(new_papers) - granted
+            if budget_skipped:
+                logger.warning(f"{daily_date}: LLM budget exhausted, skipping {budget_skipped} papers")
+                # Release the claims so a later run can pick these papers up
+                for paper in new_papers[granted:]:
+                    claimed.discard(paper.paper_id)
+                new_papers = new_papers[:granted]
+        if progress:
+            progress.advance("skipped", len(papers) - len(new_papers))
+
+        # Each paper is uploaded as soon as its PDF is downloaded, on the upload pool,
+        # and analyzed once uploaded, so uploads overlap other papers' generation; the
+        # file manager keeps at most GEMINI_UPLOADS_PER_WORKER uploads per worker live.
+        # The local PDF is freed right after upload, so in-memory buffers return to
+        # the pool while later downloads wait for room; the upload is always deleted.
+        loop = asyncio.get_running_loop()
+
+        async def download_and_analyze(paper: Paper, session) -> Optional[bool]:
+            pdf = await self.fetcher.download_paper(paper, session)
+            if pdf is None:
+                logger.warning(f"Skipping paper {paper.paper_id} - PDF download failed")
+                if budget is not None:
+                    budget.refund(1)
+                if progress:
+                    progress.fail(paper.paper_id, "download", "PDF download failed")
+                return None
+            if progress:
+                progress.advance("downloaded")
+            try:
+                uploaded_file, key_index = await files.upload(pdf, paper.paper_id)
+            except Exception as e:
+                logger.error(f"Error uploading paper {paper.paper_id}: {str(e)}")
+                if budget is not None:
+                    budget.refund(1)
+                self.metrics.inc("paperflux_papers_total", outcome="failed")
+                if progress:
+                    progress.fail(paper.paper_id, "upload", str(e))
+                return False
+            finally:
+                self._release_pdf(pdf)
+            self.metrics.inc("paperflux_queue_depth", queue="analysis")
+            try:
+                return await loop.run_in_executor(
+                    executor, self.analyze_and_store_paper, paper, uploaded_file, progress, key_index
+                )
+            finally:
+                self.metrics.inc("paperflux_queue_depth", -1, queue="analysis")
+                files.delete(uploaded_file)
+
+        async with self.fetcher.download_session() as session:
+            results = await asyncio.gather(
+                *(download_and_analyze(paper, session) for paper in new_papers)
+            )
+        downloaded = sum(1 for result in results if result is not None)
+        stored = sum(1 for result in results if result)
+        logger.info(f"{daily_date}: downloaded {downloaded} out of {len(new_papers)} papers")
+        logger.info(f"{daily_date}: successfully processed {stored} out of {downloaded} papers")
+
+        return {
+            "stored": stored,
+            "failed": len(new_papers) - stored,
+            "budget_skipped": budget_skipped,
+        }
+
+    async def _renew_lease(self):
+        """Keep this run's processing lease alive until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(PROCESSING_HEARTBEAT_SECONDS)
+            try:
+                held = await loop.run_in_executor(None, self.db.renew_processing_lease, self.owner)
+            except Exception as e:
+                logger.warning(f"Could not renew the processing lease: {str(e)}")
+                continue
+            if not held:
+                logger.error("The processing lease was taken over by another run")
+                return
+
+    @profiled("process_papers")
     async def process_papers(self):
         """Process all daily papers"""
         if self._running:
             logger.warning("Previous processing still running, skipping...")
             return False
 
+        if not self.db.try_start_processing(self.owner):
+            logger.warning("Another run is processing papers, skipping...")
+            return False
+
         self._running = True
-        self.db.set_processing_status(True)
-        
+        heartbeat = asyncio.ensure_future(self._renew_lease())
+        run_started = self.metrics.snapshot()
+        progress = ProgressReporter(self.db, "daily")
+        progress.start()
+        status = "failed"
+
         logger.info("Starting paper processing...")
+        files = None
 
         try:
-            # Clear existing papers
-            self.db.clear_papers_collection()
-            
+            files = self._file_manager()
+            # Clean up uploads left behind by crashed runs while this one starts
+            files.reap_orphans_in_background()
+
             # Fetch list of all papers
             papers = await self.fetcher.fetch_papers()
             logger.info(f"Fetched {len(papers)} papers, downloading PDFs...")
 
-            # Download all papers in parallel
-            paper_paths = await self.fetcher.download_papers(papers)
-            logger.info(f"Successfully downloaded {len(paper_paths)} out of {len(papers)} papers")
-
-            # Configure thread pool based on number of available API keys
-            api_key_count = len(self.analyzer.api_keys)
-            max_workers = min(api_key_count, 10)
-            
+            max_workers = self._max_workers()
             logger.info(f"Starting analysis with {max_workers} workers")
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-
-                for paper in papers:
-                    paper_id = paper["paper"]["id"]
-                    if paper_id in paper_paths:
-                        futures.append(
-                            executor.submit(
-                                self.analyze_and_store_paper,
-                                paper,
-                                paper_paths[paper_id],
-                            )
-                        )
-                    else:
-                        logger.warning(f"Skipping paper {paper_id} - PDF download failed")
-
-                processed_count = 0
-                for future in futures:
-                    if future.result():
-                        processed_count += 1
-                
-                logger.info(f"Successfully processed {processed_count} out of {len(futures)} papers")
-                    
+                await self._ingest_papers(
+                    papers, datetime.utcnow().date().isoformat(), executor, files, progress=progress
+                )
+
             # Update last processed date
             self.db.update_last_processed_date()
             logger.info("Paper processing completed successfully")
+            status = "completed"
             return True
 
         except Exception as e:
             logger.error(f"Error in paper processing: {str(e)}")
             return False
-            
+
+        finally:
+            await self._close_files(files)
+            self._running = False
+            progress.finish(status)
+            heartbeat.cancel()
+            self.db.release_processing(self.owner)
+            self._save_run_metrics("daily", run_started)
+
+    @profiled("backfill")
+    async def backfill(
+        self,
+        start_date: date,
+        end_date: date,
+        max_concurrent_days: int = BACKFILL_MAX_CONCURRENT_DAYS,
+        llm_budget: Optional[int] = None,
+    ) -> Dict[str, int]:
+        """
+        Populate the archive with the daily papers of every date in
+        [start_date, end_date]. Days are fetched concurrently, at most
+        `max_concurrent_days` at a time, and share one analysis pool.
+        Completed days are checkpointed so an interrupted backfill resumes
+        where it stopped. `llm_budget` caps the total number of analyses.
+        """
+        if self._running:
+            logger.warning("Previous processing still running, skipping backfill...")
+            return {}
+
+        if end_date < start_date:
+            raise ValueError("Backfill end date must not be before start date")
+        if max_concurrent_days < 1:
+            raise ValueError("Backfill must process at least one day at a time")
+
+        # Takes the same processing lease as daily runs, which skip while a backfill runs
+        if not self.db.try_start_processing(self.owner):
+            logger.warning("Another run is processing papers, skipping backfill...")
+            return {}
+
+        self._running = True
+        heartbeat = asyncio.ensure_future(self._renew_lease())
+        run_started = self.metrics.snapshot()
+        progress = ProgressReporter(self.db, "backfill")
+        progress.start()
+        status = "failed"
+        totals = {"days": 0, "stored": 0, "failed": 0, "budget_skipped": 0}
+        files = None
+
+        try:
+            files = self._file_manager()
+            files.reap_orphans_in_background()
+            completed = self.db.get_backfill_checkpoint()
+            days = []
+            current = start_date
+            while current <= end_date:
+                if current.isoformat() not in completed:
+                    days.append(current.isoformat())
+                current += timedelta(days=1)
+            logger.info(
+                f"Backfilling {len(days)} days from {start_date} to {end_date} "
+                f"({max_concurrent_days} at a time)"
+            )
+
+            semaphore = asyncio.Semaphore(max_concurrent_days)
+            budget = LLMBudget(llm_budget)
+            claimed: Set[str] = set()
+
+            with ThreadPoolExecutor(max_workers=self._max_workers()) as executor:
+
+                async def backfill_day(day: str):
+                    async with semaphore:
+                        if budget.exhausted:
+                            logger.info(f"{day}: LLM budget exhausted, leaving day for a later run")
+                            return None
+                        try:
+                            papers = await self.fetcher.fetch_papers(date=day)
+                            counts = await self._ingest_papers(
+                                papers, day, executor, files, claimed, budget, progress
+                            )
+                        except Exception as e:
+                            logger.error(f"Error backfilling {day}: {str(e)}")
+                            return None
+                        if counts["failed"] == 0 and counts["budget_skipped"] == 0:
+                            self.db.mark_backfill_date_completed(day)
+                        return counts
+
+                results = await asyncio.gather(*(backfill_day(day) for day in days))
+
+            for counts in results:
+                if counts is None:
+                    continue
+                totals["days"] += 1
+                for key in ("stored", "failed", "budget_skipped"):
+                    totals[key] += counts[key]
+
+            logger.info(f"Backfill finished: {totals}")
+            status = "completed"
+            return totals
+
         finally:
+            await self._close_files(files)
             self._running = False
-            self.db.set_processing_status(False)
+            progress.finish(status)
+            heartbeat.cancel()
+            self.db.release_processing(self.owner)
+            self._save_run_metrics("backfill", run_started)
@@ -0,0 +1,308 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from paperflux.src.config.settings import (
+    PROFILE_DIR,
+    PROFILING_ENABLED,
+    PROFILE_LOOP_LAG_INTERVAL_SECONDS,
+    PROFILE_SLOW_CALLBACK_SECONDS,
+)
+
+logger = logging.getLogger("paperflux.profiling")
+
+_enabled = PROFILING_ENABLED
+
+# tracemalloc, cProfile and loop debug settings are process- or loop-wide, while
+# sessions can overlap (concurrent renders, a render during a processing run)
+_state_lock = threading.Lock()
+# Sessions currently using tracemalloc, and whether profiling started it
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+# Only one session at a time runs cProfile; later ones skip the CPU profile
+_cpu_profile_lock = threading.Lock()
+# The session running cProfile, which also collects calls wrapped with thread_profiled
+_cpu_session: Optional["ProfileSession"] = None
+# Per event loop: [sessions using it, debug settings to restore when the last one exits]
+_loop_users = weakref.WeakKeyDictionary()
+
+
+def enable_profiling(enabled: bool = True):
+    """Turn profiling on or off for this process (PAPERFLUX_PROFILE sets the default)"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_profiling_enabled() -> bool:
+    return _enabled
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Collects the 'Executing <callback> took N seconds' warnings of asyncio debug mode"""
+
+    def __init__(self, records: List[str]):
+        super().__init__(level=logging.WARNING)
+        self.records = records
+
+    def emit(self, record):
+        message = record.getMessage()
+        if message.startswith("Executing"):
+            self.records.append(message)
+
+
+class ProfileSession:
+    """
+    Profiles one run and writes its artifacts to PROFILE_DIR/<name>-<timestamp>/:
+    cpu.prof and cpu.txt (cProfile of the calling thread, merged with the calls
+    to thread_profiled functions on worker threads), memory.txt (tracemalloc
+    snapshot diff) and summary.json. Used with `async with`, it also measures
+    event-loop lag and records slow callbacks into loop.json.
+    """
+
+    def __init__(self, name: str, profile_dir: str = PROFILE_DIR):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.artifact_dir: Optional[str] = None
+        self.lag_samples: List[float] = []
+        self.slow_callbacks: List[str] = []
+        self._profiler = None
+        self._thread = None
+        self._thread_stats = None
+        self._thread_calls = 0
+        self._thread_lock = threading.Lock()
+        self._lag_task = None
+        self._loop_settings = None
+        self._slow_handler = None
+
+    def start(self):
+        import cProfile
+        import pstats
+        import tracemalloc
+
+        global _tracemalloc_users, _tracemalloc_owned, _cpu_session
+        with _state_lock:
+            if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_owned = True
+            _tracemalloc_users += 1
+        self._memory_before = tracemalloc.take_snapshot()
+        self._start_time = time.perf_counter()
+        if _cpu_profile_lock.acquire(blocking=False):
+            self._thread = threading.current_thread()
+            self._thread_stats = pstats.Stats()
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            _cpu_session = self
+        else:
+            logger.info(f"Another session is profiling CPU, {self.name} records memory and timing only")
+        return self
+
+    def stop(self) -> str:
+        import tracemalloc
+
+        global _tracemalloc_users, _tracemalloc_owned, _cpu_session
+        if self._profiler is not None:
+            self._profiler.disable()
+            _cpu_session = None
+            _cpu_profile_lock.release()
+        duration = time.perf_counter() - self._start_time
+        memory_after = tracemalloc.take_snapshot()
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        with _state_lock:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0 and _tracemalloc_owned:
+                tracemalloc.stop()
+                _tracemalloc_owned = False
+
+        self.artifact_dir = os.path.join(
+            self.profile_dir, f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        )
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        if self._profiler is not None:
+            self._write_cpu_profile()
+        self._write_memory_diff(memory_after)
+
+        summary = {
+            "name": self.name,
+            "cpu_profiled": self._profiler is not None,
+            "thread_profiled_calls": self._thread_calls,
+            "duration_seconds": duration,
+            "traced_memory_bytes": current_memory,
+            "peak_traced_memory_bytes": peak_memory,
+        }
+        if self._loop_settings is not None:
+            summary["loop"] = self._write_loop_stats()
+        with open(os.path.join(self.artifact_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info(f"Wrote profile of {self.name} ({duration:.2f}s) to {self.artifact_dir}")
+        return self.artifact_dir
+
+    def _write_cpu_profile(self):
+        import pstats
+
+        with self._thread_lock:
+            stats = pstats.Stats(self._profiler)
+            stats.add(self._thread_stats)
+            self._thread_stats = None
+        stats.dump_stats(os.path.join(self.artifact_dir, "cpu.prof"))
+        with open(os.path.join(self.artifact_dir, "cpu.txt"), "w") as f:
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(50)
+            stats.sort_stats("tottime").print_stats(30)
+
+    def _add_thread_profile(self, profiler):
+        with self._thread_lock:
+            # Calls finishing after the CPU profile was written are dropped
+            if self._thread_stats is not None:
+                self._thread_stats.add(profiler)
+                self._thread_calls += 1
+
+    def _write_memory_diff(self, memory_after):
+        with open(os.path.join(self.artifact_dir, "memory.txt"), "w") as f:
+            f.write("Top allocation changes by line:\n")
+            for stat in memory_after.compare_to(self._memory_before, "lineno")[:30]:
+                f.write(f"{stat}\n")
+
+    def _write_loop_stats(self) -> Dict:
+        interval = PROFILE_LOOP_LAG_INTERVAL_SECONDS
+        samples = sorted(self.lag_samples)
+        stats = {
+            "samples": len(samples),
+            "interval_seconds": interval,
+            "max_lag_seconds": samples[-1] if samples else 0.0,
+            "mean_lag_seconds": sum(samples) / len(samples) if samples else 0.0,
+            "p95_lag_seconds": samples[int(len(samples) * 0.95)] if samples else 0.0,
+            "samples_over_slow_threshold": sum(
+                1 for lag in samples if lag > PROFILE_SLOW_CALLBACK_SECONDS
+            ),
+            "slow_callbacks": len(self.slow_callbacks),
+        }
+        with open(os.path.join(self.artifact_dir, "loop.json"), "w") as f:
+            json.dump({**stats, "slow_callback_details": self.slow_callbacks}, f, indent=2)
+        return stats
+
+    async def _monitor_lag(self):
+        """Sleep for a fixed interval and record how late the loop woke us up"""
+        interval = PROFILE_LOOP_LAG_INTERVAL_SECONDS
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.lag_samples.append(max(0.0, loop.time() - expected))
+
+    def _stop_quietly(self):
+        """Stop without letting a profiling failure fail the profiled run"""
+        try:
+            self.stop()
+        except Exception as e:
+            logger.warning(f"Could not write profile of {self.name}: {str(e)}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop_quietly()
+        return False
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        with _state_lock:
+            users = _loop_users.get(loop)
+            if users is None:
+                users = _loop_users[loop] = [0, (loop.get_debug(), loop.slow_callback_duration)]
+                loop.set_debug(True)
+                loop.slow_callback_duration = PROFILE_SLOW_CALLBACK_SECONDS
+            users[0] += 1
+        self._loop_settings = users[1]
+        self._slow_handler = _SlowCallbackHandler(self.slow_callbacks)
+        logging.getLogger("asyncio").addHandler(self._slow_handler)
+        self._lag_task = loop.create_task(self._monitor_lag())
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._lag_task.cancel()
+        try:
+            await self._lag_task
+        except asyncio.CancelledError:
+            pass
+        loop = asyncio.get_running_loop()
+        with _state_lock:
+            users = _loop_users[loop]
+            users[0] -= 1
+            if users[0] == 0:
+                # Restore the settings from before the first overlapping session
+                del _loop_users[loop]
+                loop.set_debug(self._loop_settings[0])
+                loop.slow_callback_duration = self._loop_settings[1]
+        logging.getLogger("asyncio").removeHandler(self._slow_handler)
+        self._stop_quietly()
+        return False
+
+
+def profiled(name: str):
+    """
+    Decorate a function or coroutine function so each call is profiled when
+    profiling is enabled. When disabled the only cost is one flag check per call.
+    """
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await func(*args, **kwargs)
+                async with ProfileSession(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with ProfileSession(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def thread_profiled(func):
+    """
+    Decorate a function run on worker threads (e.g. through an executor) so
+    that, while a session profiles CPU, each call is profiled on its thread and
+    merged into that session's CPU profile, which otherwise only covers the
+    thread that started it. When no session profiles CPU the only cost is one
+    check per call.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _cpu_session
+        if session is None or threading.current_thread() is session._thread:
+            return func(*args, **kwargs)
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the session's profiler already
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            session._add_thread_profile(profiler)
+
+    return wrapper
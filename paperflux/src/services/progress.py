@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from paperflux.src.config.settings import (
+    PROGRESS_MAX_FAILURES,
+    PROGRESS_WRITE_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger("paperflux.progress")
+
+# Per-paper stages, in pipeline order. "skipped" covers papers already stored
+# or left out by the LLM budget, "failed" papers that failed at any stage.
+STAGES = ["downloaded", "analyzed", "stored", "skipped", "failed"]
+
+
+class ProgressReporter:
+    """
+    Tracks a processing run per paper and publishes it as one small document
+    through DatabaseService.update_processing_progress. Updates are counted in
+    memory and written at most once per `min_interval_seconds`, so a run of
+    hundreds of papers costs a handful of writes.
+    """
+
+    def __init__(
+        self,
+        db,
+        run_type: str,
+        min_interval_seconds: float = PROGRESS_WRITE_INTERVAL_SECONDS,
+    ):
+        self.db = db
+        self.run_type = run_type
+        self.min_interval_seconds = min_interval_seconds
+        self.total = 0
+        self.counts = {stage: 0 for stage in STAGES}
+        self.failures: List[Dict] = []
+        self.started_at = datetime.utcnow()
+        self._start_time = time.monotonic()
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._publish(force=True)
+
+    def add_total(self, count: int):
+        """Add papers discovered by the run (a day's list for backfills)"""
+        with self._lock:
+            self.total += count
+        self._publish()
+
+    def advance(self, stage: str, count: int = 1):
+        """Count `count` papers as having completed `stage`"""
+        if not count:
+            return
+        with self._lock:
+            self.counts[stage] += count
+        self._publish()
+
+    def fail(self, paper_id: str, stage: str, error: str):
+        """Count a paper as failed, keeping the most recent failures for display"""
+        with self._lock:
+            self.counts["failed"] += 1
+            self.failures.append(
+                {"paper_id": paper_id, "stage": stage, "error": error[:300], "at": datetime.utcnow()}
+            )
+            del self.failures[:-PROGRESS_MAX_FAILURES]
+        self._publish()
+
+    def finish(self, status: str = "completed"):
+        self._publish(status=status, force=True)
+
+    def _eta_seconds(self) -> Optional[float]:
+        """Remaining papers divided by the measured throughput of finished papers"""
+        finished = self.counts["stored"] + self.counts["failed"]
+        remaining = self.total - finished - self.counts["skipped"]
+        elapsed = time.monotonic() - self._start_time
+        if finished == 0 or remaining <= 0 or elapsed <= 0:
+            return None
+        return remaining / (finished / elapsed)
+
+    def to_dict(self, status: str = "running") -> Dict:
+        with self._lock:
+            return {
+                "run_type": self.run_type,
+                "status": status,
+                "started_at": self.started_at,
+                "updated_at": datetime.utcnow(),
+                "total": self.total,
+                "counts": dict(self.counts),
+                "eta_seconds": self._eta_seconds(),
+                "failures": list(self.failures),
+            }
+
+    def _publish(self, status: str = "running", force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write < self.min_interval_seconds:
+                return
+            self._last_write = now
+        try:
+            self.db.update_processing_progress(self.to_dict(status))
+        except Exception as e:
+            logger.warning(f"Could not publish processing progress: {str(e)}")
@@ -0,0 +1,264 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from paperflux.src.config.settings import (
+    GEMINI_FILE_PREFIX,
+    QA_ANSWER_CACHE_SIZE,
+    QA_DOWNLOAD_TIMEOUT_SECONDS,
+    QA_MAX_SESSIONS,
+    QA_SESSION_TTL_SECONDS,
+)
+from paperflux.src.models.models import Paper, PaperDetail
+from paperflux.src.services.buffer_pool import PDFBuffer
+from paperflux.src.services.metrics import MetricsRegistry
+from paperflux.src.services.renderer import content_hash
+
+logger = logging.getLogger("paperflux.qa")
+
+# Sessions are retired this long before their cached content expires on Gemini's side,
+# so a question never lands on a context that is about to disappear
+EXPIRY_MARGIN_SECONDS = 60
+
+QA_DISPLAY_NAME_PREFIX = f"{GEMINI_FILE_PREFIX}qa-"
+
+
+class QASession:
+    """
+    A paper's uploaded file and cached context, shared by its follow-up
+    questions. Both belong to the API key they were created with, so the
+    session keeps using that key whatever the analyzer rotated to since.
+    """
+
+    __slots__ = ("paper_id", "uploaded_file", "cached_content", "key_index", "expires_at")
+
+    def __init__(self, paper_id: str, uploaded_file, cached_content, key_index: int, expires_at: float):
+        self.paper_id = paper_id
+        self.uploaded_file = uploaded_file
+        self.cached_content = cached_content
+        self.key_index = key_index
+        self.expires_at = expires_at
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) >= self.expires_at
+
+
+class PaperQAService:
+    """
+    Answers follow-up questions about stored papers. The first question on a
+    paper downloads and uploads its PDF once and, where the model supports it,
+    caches the PDF and its analysis as context, so later questions only send
+    the question. Sessions live for `ttl_seconds`, at most `max_sessions` at a
+    time, and are cleaned up in the background when they expire (by a sweeper
+    thread that runs while sessions are live) or are evicted. Answers are
+    memoized per paper, analysis and normalized question.
+    """
+
+    def __init__(
+        self,
+        analyzer=None,
+        ttl_seconds: int = QA_SESSION_TTL_SECONDS,
+        max_sessions: int = QA_MAX_SESSIONS,
+        answer_cache_size: int = QA_ANSWER_CACHE_SIZE,
+    ):
+        self._analyzer = analyzer
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.answer_cache_size = answer_cache_size
+        self.metrics = MetricsRegistry()
+        self._sessions: "OrderedDict[str, QASession]" = OrderedDict()
+        self._answers: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per paper with the number of threads using it, so concurrent first
+        # questions upload it only once; removed when the last of them is done
+        self._paper_locks: Dict[str, List] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._closing = threading.Event()
+        atexit.register(self.close)
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            from paperflux.src.services.paper_analyzer import PaperAnalyzer
+
+            self._analyzer = PaperAnalyzer()
+        return self._analyzer
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Case- and whitespace-insensitive form of a question, used as its memo key"""
+        return " ".join(question.lower().split()).rstrip(" ?!.")
+
+    def ask(self, paper: Union[Paper, PaperDetail], question: str) -> str:
+        """Answer a question about a paper, reusing its live session or memoized answer"""
+        normalized = self.normalize_question(question)
+        if not normalized:
+            raise ValueError("Question is empty")
+        # Keyed on the analysis too, so reprocessing a paper does not serve stale answers
+        key = (paper.paper_id, content_hash(paper.explanation or ""), normalized)
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is not None:
+                self._answers.move_to_end(key)
+        if answer is not None:
+            self.metrics.inc("paperflux_qa_questions_total", outcome="memoized")
+            return answer
+
+        self._release_expired()
+        try:
+            answer = self._answer(paper, question.strip())
+        except Exception:
+            self.metrics.inc("paperflux_qa_questions_total", outcome="failed")
+            raise
+        self.metrics.inc("paperflux_qa_questions_total", outcome="answered")
+
+        with self._lock:
+            self._answers[key] = answer
+            while len(self._answers) > self.answer_cache_size:
+                self._answers.popitem(last=False)
+        return answer
+
+    def _answer(self, paper, question: str) -> str:
+        session = self._session(paper)
+        try:
+            return self._ask_session(session, question, paper.explanation)
+        except Exception as e:
+            if "429" in str(e) or "quota" in str(e).lower():
+                raise
+            # The context may have been removed on Gemini's side; retry once on a fresh one
+            logger.warning(f"Q&A on {paper.paper_id} failed, retrying with a new session: {str(e)}")
+            self.close_session(paper.paper_id)
+            session = self._session(paper)
+            return self._ask_session(session, question, paper.explanation)
+
+    def _ask_session(self, session: QASession, question: str, explanation: Optional[str]) -> str:
+        return self.analyzer.answer_question(
+            question, session.uploaded_file, session.cached_content, explanation, session.key_index
+        )
+
+    def _acquire_paper_lock(self, paper_id: str) -> threading.Lock:
+        with self._lock:
+            entry = self._paper_locks.setdefault(paper_id, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry[0]
+
+    def _release_paper_lock(self, paper_id: str):
+        with self._lock:
+            entry = self._paper_locks[paper_id]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._paper_locks[paper_id]
+
+    def _session(self, paper) -> QASession:
+        """The paper's live session, creating it on first use"""
+        paper_id = paper.paper_id
+        self._acquire_paper_lock(paper_id)
+        try:
+            with self._lock:
+                session = self._sessions.get(paper_id)
+                if session is not None and not session.expired():
+                    self._sessions.move_to_end(paper_id)
+                    return session
+
+            pdf = self._download_pdf(paper)
+            key_index = self.analyzer.key_index
+            uploaded_file, cached_content = self.analyzer.create_qa_context(
+                pdf, paper.explanation, self.ttl_seconds, f"{QA_DISPLAY_NAME_PREFIX}{paper_id}", key_index
+            )
+            logger.info(
+                f"Opened Q&A session for {paper_id} with API key {key_index} "
+                f"({'cached context' if cached_content is not None else 'uploaded file'})"
+            )
+            session = QASession(
+                paper_id,
+                uploaded_file,
+                cached_content,
+                key_index,
+                time.monotonic() + max(self.ttl_seconds - EXPIRY_MARGIN_SECONDS, 0),
+            )
+            with self._lock:
+                replaced = self._sessions.pop(paper_id, None)
+                self._sessions[paper_id] = session
+                evicted = [replaced] if replaced is not None else []
+                while len(self._sessions) > self.max_sessions:
+                    evicted.append(self._sessions.popitem(last=False)[1])
+                self.metrics.set_gauge("paperflux_qa_sessions", len(self._sessions))
+                self._start_sweeper()
+        finally:
+            self._release_paper_lock(paper_id)
+        self._release_in_background(evicted)
+        return session
+
+    def _download_pdf(self, paper) -> PDFBuffer:
+        """Download the paper's PDF into memory for upload"""
+        import requests
+
+        with self.metrics.timer("qa_download"):
+            response = requests.get(paper.pdf_url, timeout=QA_DOWNLOAD_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        data = response.content
+        return PDFBuffer(paper.paper_id, data, len(data), None)
+
+    def close_session(self, paper_id: str):
+        """End a paper's session now, deleting its upload and cached context"""
+        with self._lock:
+            session = self._sessions.pop(paper_id, None)
+            self.metrics.set_gauge("paperflux_qa_sessions", len(self._sessions))
+        if session is not None:
+            self._release(session)
+
+    def _release_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [session for session in self._sessions.values() if session.expired(now)]
+            for session in expired:
+                del self._sessions[session.paper_id]
+            self.metrics.set_gauge("paperflux_qa_sessions", len(self._sessions))
+        self._release_in_background(expired)
+
+    def _start_sweeper(self):
+        """Start the thread releasing sessions as they expire, unless it runs already; needs _lock"""
+        if self._sweeper is None:
+            self._closing.clear()
+            self._sweeper = threading.Thread(target=self._sweep, name="paperflux-qa-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self):
+        """Release sessions as they expire, so idle ones do not wait for the next question"""
+        while True:
+            with self._lock:
+                if not self._sessions or self._closing.is_set():
+                    if self._sweeper is threading.current_thread():
+                        self._sweeper = None
+                    return
+                next_expiry = min(session.expires_at for session in self._sessions.values())
+            if self._closing.wait(max(next_expiry - time.monotonic(), 0)):
+                continue
+            self._release_expired()
+
+    def _release_in_background(self, sessions: List[QASession]):
+        if sessions:
+            threading.Thread(
+                target=lambda: [self._release(session) for session in sessions],
+                name="paperflux-qa-release",
+                daemon=True,
+            ).start()
+
+    def _release(self, session: QASession):
+        self.analyzer.release_qa_context(session.uploaded_file, session.cached_content, session.key_index)
+        logger.info(f"Closed Q&A session for {session.paper_id}")
+
+    def close(self):
+        """Release every live session, e.g. on shutdown"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self.metrics.set_gauge("paperflux_qa_sessions", 0)
+            self._closing.set()
+        for session in sessions:
+            self._release(session)
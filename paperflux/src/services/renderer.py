@@ -0,0 +1,126 @@
+import hashlib
+import html
+import logging
+import re
+import secrets
+from html.parser import HTMLParser
+from typing import Dict, List
+
+logger = logging.getLogger("paperflux.renderer")
+
+# Bump when the rendering or sanitizing rules change, so stored artifacts are re-rendered
+RENDERER_VERSION = "3"
+
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+
+# Display math first so "$$" is never read as two inline delimiters. Inline math has no
+# whitespace just inside its "$"s and no digit right after the closing one, so prices
+# such as "$5 and $10" or "$5-$10" stay text
+MATH_PATTERN = re.compile(
+    r"\$\$.+?\$\$|\\\[.+?\\\]|\\\(.+?\\\)|(?<![\\$])\$(?!\s)[^$\n]+?(?<![\s\\])\$(?!\d)",
+    re.DOTALL,
+)
+# Math spans are swapped for "PFXMATH<nonce>N<index>XMATH" while markdown runs; the nonce
+# is drawn per render so that text which happens to contain a placeholder is left alone
+MATH_PLACEHOLDER = "PFXMATH{nonce}N{index}XMATH"
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "code", "dd", "del", "div", "dl", "dt",
+    "em", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i", "li", "ol", "p", "pre",
+    "span", "strong", "sub", "sup", "table", "tbody", "td", "th", "thead", "tr", "ul",
+}
+VOID_TAGS = {"br", "hr"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "abbr": {"title"},
+    "code": {"class"},
+    "td": {"align"},
+    "th": {"align"},
+}
+ALLOWED_URL_SCHEMES = ("http://", "https://", "mailto:", "#")
+# Tags whose content is dropped along with the tag
+DROPPED_CONTENT_TAGS = {"script", "style", "iframe", "object", "embed", "template"}
+
+
+class _Sanitizer(HTMLParser):
+    """Rebuild HTML keeping only allowlisted tags and attributes"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_CONTENT_TAGS:
+            self._dropping += 1
+            return
+        if self._dropping or tag not in ALLOWED_TAGS:
+            return
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_ATTRIBUTES.get(tag, ()) or value is None:
+                continue
+            if name == "href" and not value.strip().lower().startswith(ALLOWED_URL_SCHEMES):
+                continue
+            kept.append(f' {name}="{html.escape(value, quote=True)}"')
+        if tag == "a":
+            kept.append(' target="_blank" rel="noopener noreferrer"')
+        self.parts.append(f"<{tag}{''.join(kept)}>")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROPPED_CONTENT_TAGS:
+            self._dropping -= 1
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_CONTENT_TAGS:
+            self._dropping = max(0, self._dropping - 1)
+            return
+        if self._dropping or tag not in ALLOWED_TAGS or tag in VOID_TAGS:
+            return
+        self.parts.append(f"</{tag}>")
+
+    def handle_data(self, data):
+        if not self._dropping:
+            self.parts.append(html.escape(data, quote=False))
+
+
+def sanitize_html(raw_html: str) -> str:
+    """Strip everything but a small allowlist of formatting tags and attributes"""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(raw_html)
+    sanitizer.close()
+    return "".join(sanitizer.parts)
+
+
+def content_hash(markdown_text: str) -> str:
+    """Hash identifying an explanation together with the renderer that produced its HTML"""
+    return hashlib.sha256(f"{RENDERER_VERSION}\n{markdown_text}".encode("utf-8")).hexdigest()
+
+
+def render_explanation(markdown_text: str) -> Dict[str, str]:
+    """
+    Render an explanation to sanitized HTML.
+    Math is kept verbatim (escaped) for client-side KaTeX rendering instead of
+    being mangled by the markdown parser. Returns the HTML and its content hash.
+    """
+    import markdown
+
+    math_spans: List[str] = []
+    nonce = secrets.token_hex(8)
+    while nonce in markdown_text:
+        nonce = secrets.token_hex(8)
+
+    def protect(match):
+        math_spans.append(match.group(0))
+        return MATH_PLACEHOLDER.format(nonce=nonce, index=len(math_spans) - 1)
+
+    protected = MATH_PATTERN.sub(protect, markdown_text)
+    rendered = sanitize_html(markdown.markdown(protected, extensions=MARKDOWN_EXTENSIONS))
+    # Quotes are escaped too, since a span can land inside an attribute such as a link's href
+    rendered = re.sub(
+        MATH_PLACEHOLDER.format(nonce=nonce, index=r"(\d+)"),
+        lambda match: html.escape(math_spans[int(match.group(1))], quote=True),
+        rendered,
+    )
+    return {"html": rendered, "hash": content_hash(markdown_text)}
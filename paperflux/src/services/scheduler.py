@@ -1,8 +1,7 @@
 import logging
 import threading
 import time
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone
 
 from paperflux.src.services.paper_processor import PaperProcessor
 from paperflux.src.services.database import DatabaseService
@@ -45,7 +44,7 @@ class PaperScheduler:
         """Main scheduler loop checking for processing time"""
         while self._running:
             try:
-                now = datetime.now(pytz.UTC)
+                now = datetime.now(timezone.utc)
                 
                 # Check if we should process papers
                 should_process = self._should_process_now(now)
@@ -86,7 +85,7 @@ class PaperScheduler:
             return False
             
         # Check if it's after 8:00 AM UTC
-        target_time = datetime.combine(current_date, datetime.min.time(), tzinfo=pytz.UTC)
+        target_time = datetime.combine(current_date, datetime.min.time(), tzinfo=timezone.utc)
         target_time = target_time.replace(hour=8, minute=0)
         
         return current_time >= target_time
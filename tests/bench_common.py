@@ -0,0 +1,90 @@
+"""
+Harness shared by the offline benchmarks (pipeline_benchmark.py, db_benchmark.py).
+
+A benchmark provides its own argument parser on top of `build_parser`, a
+`run_scale(args, paper_count)` returning a JSON-serializable result and a
+`print_result(result, previous)` reporting one scale against its baseline.
+`main` runs each scale in a fresh interpreter, prints the report and saves
+the results, which a later run can be compared against with --baseline.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(ROOT_DIR, "bench_results")
+
+
+def build_parser(description, default_papers, db_name, results_prefix):
+    """Parser with the options every benchmark takes"""
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, nargs="+", default=default_papers, help="Paper counts to run")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--mongo-uri", help=f"Use a local MongoDB instead of mongomock (drops the {db_name} database)")
+    parser.add_argument("--output", help=f"Where to save results (default: bench_results/{results_prefix}-<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    return parser
+
+
+def mongo_client(mongo_uri, db_name):
+    """A client on a fresh `db_name`: the given MongoDB, or mongomock"""
+    if mongo_uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(mongo_uri)
+        client.drop_database(db_name)
+        return client
+    import mongomock
+
+    return mongomock.MongoClient()
+
+
+def run_in_subprocess(script, argv, paper_count):
+    """Run one scale of `script` in a fresh interpreter and return its result"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(script), *argv, "--run-one", str(paper_count)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark at {paper_count} papers failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def print_report(results, print_result, baseline=None):
+    baseline_by_size = {r["papers"]: r for r in (baseline or {}).get("results", [])}
+    for result in results:
+        print_result(result, baseline_by_size.get(result["papers"]))
+
+
+def main(script, parser, run_scale, print_result, results_prefix, argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+
+    if args.run_one is not None:
+        sys.path.insert(0, ROOT_DIR)
+        print(json.dumps(run_scale(args, args.run_one)))
+        return
+
+    results = [run_in_subprocess(script, argv, count) for count in args.papers]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, print_result, baseline)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{results_prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    config = {key: value for key, value in vars(args).items() if key not in ("run_one", "output", "baseline")}
+    with open(output, "w") as f:
+        json.dump({"config": config, "created_at": datetime.now().isoformat(), "results": results}, f, indent=2)
+    print(f"Saved results to {output}")
+    return output
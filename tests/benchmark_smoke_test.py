@@ -0,0 +1,67 @@
+"""
+Runs each offline benchmark end to end at a tiny scale, so the scripts keep
+working as the services they drive change.
+"""
+import json
+
+import pytest
+
+
+def load_results(output):
+    with open(output) as f:
+        return json.load(f)["results"]
+
+
+def test_pipeline_benchmark_runs(tmp_path):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("mongomock")
+    import pipeline_benchmark
+
+    output = pipeline_benchmark.main([
+        "--papers", "3",
+        "--api-latency", "0",
+        "--pdf-latency", "0",
+        "--pdf-size", "1000",
+        "--bandwidth", "0",
+        "--download-failure-rate", "0",
+        "--gemini-latency", "0.01",
+        "--rate-limit-rate", "0",
+        "--keys", "2",
+        "--output", str(tmp_path / "pipeline.json"),
+    ])
+    [result] = load_results(output)
+    assert result["success"] is True
+    assert result["stored"] == 3
+
+
+def test_pipeline_benchmark_reports_a_failed_daily_papers_request(tmp_path):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("mongomock")
+    import pipeline_benchmark
+
+    output = pipeline_benchmark.main([
+        "--papers", "3",
+        "--api-latency", "0",
+        "--api-failure-rate", "1",
+        "--output", str(tmp_path / "pipeline.json"),
+    ])
+    [result] = load_results(output)
+    assert result["success"] is False
+    assert result["stored"] == 0
+
+
+def test_db_benchmark_runs(tmp_path):
+    pytest.importorskip("mongomock")
+    import db_benchmark
+
+    output = db_benchmark.main([
+        "--papers", "40",
+        "--explanation-size", "200",
+        "--iterations", "2",
+        "--alloc-iterations", "1",
+        "--deep-pages", "1",
+        "--output", str(tmp_path / "db.json"),
+    ])
+    [result] = load_results(output)
+    assert result["papers"] == 40
+    assert {m["method"] for m in result["methods"]} >= {"get_papers_page (deep)", "upsert_paper (new)"}
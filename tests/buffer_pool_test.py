@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+import pytest
+
+from paperflux.src.models.models import Paper
+from paperflux.src.services.buffer_pool import BufferPool
+
+
+def test_waiters_are_granted_in_fifo_order():
+    async def run():
+        pool = BufferPool(100, 100)
+        held = await pool.acquire(100)
+        granted = []
+
+        async def wait(name, size):
+            await pool.acquire(size)
+            granted.append(name)
+
+        # The large head of the queue keeps later small requests waiting
+        tasks = [asyncio.ensure_future(wait(name, size)) for name, size in [("big", 80), ("small", 10), ("tiny", 5)]]
+        await asyncio.sleep(0)
+        pool.release(held)
+        await asyncio.gather(*tasks)
+        return granted, pool.used_bytes
+
+    granted, used = asyncio.run(run())
+    assert granted == ["big", "small", "tiny"]
+    assert used == 95
+
+
+def test_head_of_queue_blocks_requests_that_would_fit():
+    async def run():
+        pool = BufferPool(100, 100)
+        held = await pool.acquire(60)
+        big = asyncio.ensure_future(pool.acquire(60))
+        small = asyncio.ensure_future(pool.acquire(10))
+        await asyncio.sleep(0.01)
+        blocked = not big.done() and not small.done()
+        pool.release(held)
+        await asyncio.gather(big, small)
+        return blocked, pool.used_bytes
+
+    assert asyncio.run(run()) == (True, 70)
+
+
+def test_release_from_another_thread_wakes_the_waiter():
+    async def run():
+        pool = BufferPool(100, 100)
+        held = await pool.acquire(100)
+        waiter = asyncio.ensure_future(pool.acquire(50))
+        await asyncio.sleep(0)
+        thread = threading.Thread(target=pool.release, args=(held,))
+        thread.start()
+        await asyncio.wait_for(waiter, 5)
+        thread.join()
+        return pool.used_bytes
+
+    assert asyncio.run(run()) == 50
+
+
+def test_cancelled_waiter_is_skipped_and_its_grant_returned():
+    async def run():
+        pool = BufferPool(100, 100)
+        held = await pool.acquire(100)
+        first = asyncio.ensure_future(pool.acquire(100))
+        second = asyncio.ensure_future(pool.acquire(30))
+        await asyncio.sleep(0)
+        # The grant to `first` is scheduled on the loop, then it is cancelled before it runs
+        pool.release(held)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 5)
+        return pool.used_bytes
+
+    assert asyncio.run(run()) == 30
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        pool = BufferPool(100, 100)
+        held = await pool.acquire(100)
+        first = asyncio.ensure_future(pool.acquire(100))
+        second = asyncio.ensure_future(pool.acquire(30))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        pool.release(held)
+        await asyncio.wait_for(second, 5)
+        return pool.used_bytes, len(pool._waiters)
+
+    assert asyncio.run(run()) == (30, 0)
+
+
+def test_oversized_requests_are_refused():
+    async def run():
+        await BufferPool(100, 50).acquire(60)
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+
+
+def test_downloads_waiting_for_memory_do_not_open_connections(tmp_path, monkeypatch):
+    pytest.importorskip("aiohttp")
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+
+    from paperflux.src.services import paper_fetcher
+
+    monkeypatch.setattr(paper_fetcher, "TEMP_DIR", str(tmp_path))
+    pdf_size = 600
+    requests = {"HEAD": 0, "GET": 0}
+
+    async def pdf(request):
+        requests[request.method] += 1
+        return web.Response(body=b"%" * pdf_size, content_type="application/pdf")
+
+    def paper(paper_id, port):
+        return Paper(paper_id, "T", [], "S", "2025-01-01", pdf_url=f"http://127.0.0.1:{port}/pdf/{paper_id}.pdf")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/pdf/{paper_id}.pdf", pdf)
+        async with TestServer(app, port=0) as server:
+            fetcher = paper_fetcher.PaperFetcher(in_memory=True)
+            fetcher.buffer_pool = BufferPool(1000, 1000)
+            async with fetcher.download_session() as session:
+                first = await fetcher.download_paper(paper("a", server.port), session)
+                second = asyncio.ensure_future(fetcher.download_paper(paper("b", server.port), session))
+                await asyncio.sleep(0.1)
+                while_waiting = dict(requests)
+                first.release()
+                second = await asyncio.wait_for(second, 5)
+            return first, second, while_waiting, fetcher.buffer_pool.used_bytes
+
+    first, second, while_waiting, used = asyncio.run(run())
+    assert while_waiting == {"HEAD": 2, "GET": 1}
+    assert len(second.data) == pdf_size
+    assert used == pdf_size
@@ -0,0 +1,53 @@
+import os
+import re
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def db():
+    """A fresh DatabaseService singleton over an in-memory mongomock client"""
+    mongomock = pytest.importorskip("mongomock")
+    from paperflux.src.services.database import DatabaseService
+
+    DatabaseService._instance = None
+    service = DatabaseService(client=mongomock.MongoClient())
+    yield service
+    DatabaseService._instance = None
+
+
+def _without_text(query):
+    """`query` with $text searches rewritten as case-insensitive title/summary matches"""
+    if isinstance(query, list):
+        return [_without_text(part) for part in query]
+    if not isinstance(query, dict):
+        return query
+    rewritten = {}
+    for key, value in query.items():
+        if key == "$text":
+            words = value["$search"].split()
+            rewritten.setdefault("$and", []).append({
+                "$or": [
+                    {field: {"$regex": re.escape(word), "$options": "i"}}
+                    for word in words
+                    for field in ("title", "summary")
+                ]
+            })
+        else:
+            rewritten[key] = _without_text(value)
+    return rewritten
+
+
+@pytest.fixture
+def text_search(db, monkeypatch):
+    """Let `db` run text searches, which mongomock does not implement, as word matches"""
+    find = db.collection.find
+    monkeypatch.setattr(
+        db.collection, "find", lambda filter=None, *args, **kwargs: find(_without_text(filter), *args, **kwargs)
+    )
+    return db
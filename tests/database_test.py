@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+
+from paperflux.src.config.settings import SCHEMA_VERSION, SCHEMA_VERSION_ID
+from paperflux.src.models.models import Paper
+
+
+def test_migration_runs_once(db):
+    # As for a database last written before schema versions existed
+    db.metadata_collection.delete_one({"_id": SCHEMA_VERSION_ID})
+    db.collection.insert_one({"paper_id": "old", "processed_at": datetime(2024, 5, 1)})
+    db._migrate()
+    # Already migrated, so papers are no longer scanned on construction
+    db.collection.insert_one({"paper_id": "later", "processed_at": datetime(2024, 6, 1)})
+    db._migrate()
+
+    assert db.metadata_collection.find_one({"_id": SCHEMA_VERSION_ID})["version"] == SCHEMA_VERSION
+    assert db.collection.find_one({"paper_id": "old"})["daily_date"] == "2024-05-01"
+    assert "daily_date" not in db.collection.find_one({"paper_id": "later"})
+
+
+def make_paper(paper_id, daily_date, title="Title"):
+    return Paper(paper_id, title, [{"name": "A"}], "Summary", "2025-01-01T00:00:00Z", daily_date=daily_date)
+
+
+def walk_pages(db, limit, search=None):
+    """Every page from the first one on, following next_cursor"""
+    pages = [db.get_papers_page(limit=limit, search=search)]
+    while pages[-1]["next_cursor"]:
+        pages.append(db.get_papers_page(pages[-1]["next_cursor"], limit=limit, search=search))
+    return pages
+
+
+def ids(page):
+    return [paper.paper_id for paper in page["papers"]]
+
+
+def test_pages_walk_forward_and_back_across_days_with_many_papers(db):
+    # Several papers share each daily_date, so pages split inside a day
+    for i in range(7):
+        db.upsert_paper(make_paper(f"2501.{i:05d}", f"2025-01-{10 + i // 3:02d}"))
+
+    pages = walk_pages(db, limit=2)
+
+    assert [ids(page) for page in pages] == [
+        ["2501.00006", "2501.00003"],
+        ["2501.00004", "2501.00005"],
+        ["2501.00000", "2501.00001"],
+        ["2501.00002"],
+    ]
+    assert pages[0]["prev_cursor"] is None
+    # The last page has no next page
+    assert pages[-1]["next_cursor"] is None
+
+    back = [db.get_papers_page(page["prev_cursor"], backward=True, limit=2) for page in pages[1:]]
+    assert [ids(page) for page in back] == [ids(page) for page in pages[:-1]]
+    assert back[0]["prev_cursor"] is None
+    assert back[-1]["next_cursor"] == pages[-2]["next_cursor"]
+
+
+def test_a_page_without_a_cursor_is_the_first_page(db):
+    db.upsert_paper(make_paper("2501.00001", "2025-01-10"))
+    db.upsert_paper(make_paper("2501.00002", "2025-01-11"))
+
+    page = db.get_papers_page(None, limit=10)
+    assert ids(page) == ["2501.00002", "2501.00001"]
+    assert page["next_cursor"] is None and page["prev_cursor"] is None
+    assert ids(db.get_papers_page("", limit=10)) == ids(page)
+
+
+def test_invalid_cursors_are_rejected(db):
+    with pytest.raises(ValueError):
+        db.get_papers_page("not-a-cursor")
+
+
+def test_searched_pages_return_each_match_once(text_search):
+    db = text_search
+    for i in range(9):
+        title = "Diffusion models" if i % 2 else "Graph networks"
+        db.upsert_paper(make_paper(f"2501.{i:05d}", f"2025-01-{10 + i // 4:02d}", title))
+
+    pages = walk_pages(db, limit=2, search="diffusion")
+    found = [paper_id for page in pages for paper_id in ids(page)]
+
+    assert sorted(found) == ["2501.00001", "2501.00003", "2501.00005", "2501.00007"]
+    assert len(found) == len(set(found))
+
+
+def test_only_the_latest_run_metrics_are_kept(db, monkeypatch):
+    from paperflux.src.services import database
+
+    monkeypatch.setattr(database, "RUN_METRICS_KEEP", 3)
+    for run in range(5):
+        db.save_run_metrics("daily", {"run": run})
+
+    assert [doc["run"] for doc in db.get_run_metrics()] == [4, 3, 2]
+
+
+def test_migration_records_change_markers_of_stored_days(db):
+    db.metadata_collection.delete_one({"_id": SCHEMA_VERSION_ID})
+    db.collection.insert_one({"paper_id": "a", "daily_date": "2025-01-01"})
+    db.collection.insert_one({"paper_id": "b", "daily_date": "2025-01-02"})
+    db._migrate()
+
+    assert db.get_day_versions() == {"2025-01-01": 1, "2025-01-02": 1}
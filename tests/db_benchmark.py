@@ -0,0 +1,208 @@
+"""
+Micro-benchmarks of the DatabaseService read and write methods at archive scale.
+
+Each scale seeds synthetic papers with realistic explanation sizes into
+mongomock, or a local MongoDB given with --mongo-uri, then measures every
+method in a fresh interpreter:
+- latency (mean, p50, p95, max) over repeated calls
+- allocations per call (peak and retained bytes, from tracemalloc in a
+  separate pass so tracing does not skew latency)
+- cache hit ratio, from paperflux_db_cache_requests_total
+
+Results are saved as JSON and can be compared against an earlier run:
+    python tests/db_benchmark.py --papers 1000 10000 100000 --mongo-uri mongodb://localhost:27017
+    python tests/db_benchmark.py --baseline bench_results/db-<timestamp>.json
+
+mongomock scans and copies every document on each query, so 100k papers
+are only practical against a real MongoDB.
+"""
+import os
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import bench_common
+
+BENCH_DB_NAME = "paperflux_db_benchmark"
+PAPERS_PER_DAY = 30
+SEED_BATCH_SIZE = 1000
+CACHE_COUNTER = "paperflux_db_cache_requests_total"
+
+
+def make_paper(index, explanation_size):
+    from paperflux.src.models.models import Paper
+
+    daily_date = (date(2025, 6, 1) - timedelta(days=index // PAPERS_PER_DAY)).isoformat()
+    paragraph = "The method minimizes $\\mathcal{L}(\\theta)$ with a *novel* regularizer. "
+    explanation = (paragraph * (explanation_size // len(paragraph) + 1))[:explanation_size]
+    return Paper(
+        paper_id=f"{2500 + index // 100000}.{index % 100000:05d}",
+        title=f"Synthetic Paper {index}: Scaling Laws for Archive Workloads",
+        authors=[{"name": f"Author {index}-{j}"} for j in range(6)],
+        summary="We study synthetic workloads at archive scale. " * 30,
+        published_at="2025-01-15T00:00:00.000Z",
+        explanation=explanation,
+        pdf_url=f"https://arxiv.org/pdf/{index}.pdf",
+        daily_date=daily_date,
+        explanation_html=f"<p>{explanation}</p>",
+        explanation_hash=f"{index:064x}",
+    )
+
+
+def seed(db, paper_count, explanation_size):
+    """Insert `paper_count` papers in batches, bypassing the per-paper write path"""
+    for start in range(0, paper_count, SEED_BATCH_SIZE):
+        end = min(start + SEED_BATCH_SIZE, paper_count)
+        db.collection.insert_many([make_paper(i, explanation_size).to_dict() for i in range(start, end)])
+    db.update_last_processed_date()
+
+
+def cache_counts(metrics, before):
+    """Cache hits and misses recorded since `before`, per cache"""
+    counts = {}
+    for counter in metrics.summary_since(before)["counters"]:
+        if counter["name"] == CACHE_COUNTER:
+            cache = counts.setdefault(counter["labels"]["cache"], {"hit": 0, "miss": 0})
+            cache[counter["labels"]["result"]] += counter["value"]
+    return {
+        cache: {**c, "hit_ratio": c["hit"] / (c["hit"] + c["miss"])}
+        for cache, c in counts.items()
+        if c["hit"] + c["miss"]
+    }
+
+
+def measure(name, call, iterations, alloc_iterations, metrics, setup=None):
+    """Time `call` over `iterations` calls, then trace allocations over `alloc_iterations`"""
+    before = metrics.snapshot()
+    latencies = []
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        start = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - start)
+    caches = cache_counts(metrics, before)
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    for i in range(alloc_iterations):
+        if setup:
+            setup(i)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = call(i)
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - current)
+        retained.append(after - current)
+        del result
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "method": name,
+        "iterations": iterations,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "alloc_peak_bytes": sum(peaks) / len(peaks) if peaks else 0,
+        "alloc_retained_bytes": sum(retained) / len(retained) if retained else 0,
+        "cache": caches,
+    }
+
+
+def run_scale(args, paper_count):
+    """Seed `paper_count` papers and benchmark every method in this interpreter"""
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+
+    from paperflux.src.services.database import DatabaseService
+    from paperflux.src.services.metrics import MetricsRegistry
+
+    client = bench_common.mongo_client(args.mongo_uri, BENCH_DB_NAME)
+    db = DatabaseService(client=client)
+    metrics = MetricsRegistry()
+
+    seed_start = time.perf_counter()
+    seed(db, paper_count, args.explanation_size)
+    seed_seconds = time.perf_counter() - seed_start
+
+    rng = random.Random(args.seed)
+    ids = [make_paper(i, 0).paper_id for i in range(paper_count)]
+    first_page_ids = [p.paper_id for p in db.get_papers_page()["papers"]]
+
+    def hot_or_random(i):
+        # Most views are of the page the user is on, the rest jump around the archive
+        return rng.choice(first_page_ids) if rng.random() < args.hot_ratio else rng.choice(ids)
+
+    def deep_cursor():
+        page = db.get_papers_page()
+        for _ in range(args.deep_pages):
+            if not page["next_cursor"]:
+                break
+            page = db.get_papers_page(page["next_cursor"])
+        return page["prev_cursor"]
+
+    deep = deep_cursor()
+    n, a = args.iterations, args.alloc_iterations
+    new_ids = iter(range(paper_count, paper_count + 10 * (n + a)))
+
+    benchmarks = [
+        ("get_all_papers (cold)", lambda i: db.get_all_papers(), db._invalidate_cache, max(1, n // 10)),
+        ("get_all_papers (warm)", lambda i: db.get_all_papers(), None, n),
+        ("get_paper_by_id (cold)", lambda i: db.get_paper_by_id(rng.choice(ids)), db._invalidate_cache, n),
+        ("get_paper_by_id (mixed)", lambda i: db.get_paper_by_id(hot_or_random(i)), None, n),
+        ("prefetch_papers (page)", lambda i: db.prefetch_papers(first_page_ids), db._invalidate_cache, n),
+        ("get_papers_page (first)", lambda i: db.get_papers_page(), None, n),
+        ("get_papers_page (deep)", lambda i: db.get_papers_page(deep), None, n),
+        ("get_existing_paper_ids (100)", lambda i: db.get_existing_paper_ids(rng.sample(ids, min(100, len(ids)))), None, n),
+        ("get_papers_count", lambda i: db.get_papers_count(), None, n),
+        ("get_processing_metadata", lambda i: db.get_processing_metadata(), None, n),
+        ("should_process_today", lambda i: db.should_process_today(), None, n),
+        ("upsert_paper (new)", lambda i: db.upsert_paper(make_paper(next(new_ids), args.explanation_size)), None, n),
+        ("upsert_paper (replace)", lambda i: db.upsert_paper(make_paper(rng.randrange(paper_count), args.explanation_size)), None, n),
+        ("set_explanation_artifact", lambda i: db.set_explanation_artifact(rng.choice(ids), "<p>html</p>", "0" * 64), None, n),
+        ("update_processing_progress", lambda i: db.update_processing_progress({"total": i, "counts": {}}), None, n),
+        ("update_last_processed_date", lambda i: db.update_last_processed_date(), None, n),
+    ]
+
+    results = []
+    for name, call, setup, iterations in benchmarks:
+        setup_call = (lambda i, s=setup: s()) if setup else None
+        results.append(measure(name, call, iterations, min(a, iterations), metrics, setup_call))
+
+    return {"papers": paper_count, "seed_seconds": seed_seconds, "methods": results}
+
+
+def print_result(result, previous):
+    print(f"{result['papers']} papers (seeded in {result['seed_seconds']:.1f}s)")
+    previous_methods = {m["method"]: m for m in (previous or {}).get("methods", [])}
+    for method in result["methods"]:
+        line = (
+            f"  {method['method']:<30} {method['mean_ms']:9.3f} ms mean "
+            f"{method['p95_ms']:9.3f} ms p95 {method['alloc_peak_bytes'] / 1024:10.1f} KiB peak"
+        )
+        for cache, counts in sorted(method["cache"].items()):
+            line += f"  {cache} hits {counts['hit_ratio']:.0%}"
+        old = previous_methods.get(method["method"])
+        if old and old["mean_ms"]:
+            line += f"  ({method['mean_ms'] / old['mean_ms'] - 1:+.1%} vs baseline)"
+        print(line)
+
+
+def build_parser():
+    parser = bench_common.build_parser(__doc__, [1000, 10000, 100000], BENCH_DB_NAME, "db")
+    parser.add_argument("--explanation-size", type=int, default=12000, help="Characters per explanation")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per method")
+    parser.add_argument("--alloc-iterations", type=int, default=20, help="Traced calls per method")
+    parser.add_argument("--hot-ratio", type=float, default=0.8, help="Share of paper lookups on the first page")
+    parser.add_argument("--deep-pages", type=int, default=20, help="Pages to skip for the deep page benchmark")
+    return parser
+
+
+def main(argv=None):
+    return bench_common.main(__file__, build_parser(), run_scale, print_result, "db", argv)
+
+
+if __name__ == "__main__":
+    main()
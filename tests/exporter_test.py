@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from paperflux.src.models.models import Paper
+from paperflux.src.services.exporter import MANIFEST_FILE, ArchiveExporter, load_papers
+
+
+def make_paper(paper_id, daily_date):
+    return Paper(
+        paper_id,
+        f"Title {paper_id}",
+        [{"name": "A"}],
+        "Summary",
+        "2025-01-01T00:00:00Z",
+        explanation=f"Explanation of {paper_id}",
+        daily_date=daily_date,
+    )
+
+
+def test_only_new_or_changed_days_are_rewritten(db, tmp_path):
+    db.upsert_paper(make_paper("2501.00001", "2025-01-01"))
+    db.upsert_paper(make_paper("2501.00002", "2025-01-01"))
+    db.upsert_paper(make_paper("2501.00003", "2025-01-02"))
+    exporter = ArchiveExporter(db, str(tmp_path))
+
+    assert exporter.export() == ["2025-01-01", "2025-01-02"]
+    assert exporter.export() == []
+
+    # Same paper count, but the analysis was re-rendered
+    db.set_explanation_artifact("2501.00001", "<p>new</p>", "f" * 64)
+    assert exporter.export() == ["2025-01-01"]
+    assert exporter.export() == []
+
+    table = load_papers(str(tmp_path), columns=["paper_id", "explanation_hash"], start_date="2025-01-01", end_date="2025-01-01")
+    assert dict(zip(*table.to_pydict().values()))["2501.00001"] == "f" * 64
+
+
+def test_manifests_from_count_only_exports_are_rewritten(db, tmp_path):
+    db.upsert_paper(make_paper("2501.00001", "2025-01-01"))
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({"schema_version": "1", "days": {"2025-01-01": 1}}))
+
+    assert ArchiveExporter(db, str(tmp_path)).export() == ["2025-01-01"]
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert manifest["days"]["2025-01-01"]["papers"] == 1
+
+
+def test_unchanged_days_are_not_read(db, tmp_path, monkeypatch):
+    for i in range(3):
+        db.upsert_paper(make_paper(f"2501.0000{i}", f"2025-01-0{i + 1}"))
+    exporter = ArchiveExporter(db, str(tmp_path))
+    exporter.export()
+
+    read = []
+    iter_papers_for_date = db.iter_papers_for_date
+    monkeypatch.setattr(db, "iter_papers_for_date", lambda day: read.append(day) or iter_papers_for_date(day))
+    db.upsert_paper(make_paper("2501.00009", "2025-01-02"))
+
+    assert exporter.export() == ["2025-01-02"]
+    assert read == ["2025-01-02"]
+
+
+def test_days_without_papers_are_removed(db, tmp_path):
+    db.upsert_paper(make_paper("2501.00001", "2025-01-01"))
+    db.upsert_paper(make_paper("2501.00002", "2025-01-02"))
+    exporter = ArchiveExporter(db, str(tmp_path))
+    exporter.export()
+
+    # Reprocessed under another day, which leaves 2025-01-01 empty
+    db.upsert_paper(make_paper("2501.00001", "2025-01-02"))
+    assert exporter.export() == ["2025-01-01", "2025-01-02"]
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert list(manifest["days"]) == ["2025-01-02"]
+    assert not (tmp_path / "papers" / "daily_date=2025-01-01").exists()
+    assert "2025-01-01" not in db.get_day_versions()
+    assert exporter.export() == []
+
+    db.clear_papers_collection()
+    assert exporter.export() == ["2025-01-02"]
+    assert json.loads((tmp_path / MANIFEST_FILE).read_text())["days"] == {}
+    assert list((tmp_path / "papers").iterdir()) == []
+
+
+def test_a_day_refilled_after_being_cleared_is_rewritten(db, tmp_path):
+    db.upsert_paper(make_paper("2501.00001", "2025-01-01"))
+    exporter = ArchiveExporter(db, str(tmp_path))
+    exporter.export()
+
+    db.clear_papers_collection()
+    db.upsert_paper(make_paper("2501.00002", "2025-01-01"))
+
+    assert exporter.export() == ["2025-01-01"]
+    table = load_papers(str(tmp_path), columns=["paper_id"])
+    assert table.column("paper_id").to_pylist() == ["2501.00002"]
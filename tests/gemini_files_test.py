@@ -0,0 +1,193 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from paperflux.src.models.models import Paper
+from paperflux.src.services.gemini_files import ANALYSIS_DISPLAY_NAME_PREFIX, GeminiFileManager
+
+from pipeline_benchmark import make_fake_analyzer
+
+
+def fake_analyzer(rate_limit_rate=0.0, key_count=3):
+    return make_fake_analyzer(latency=0.0, rate_limit_rate=rate_limit_rate, key_count=key_count, seed=1)
+
+
+def stored_file(analyzer, key_index, name, display_name, age):
+    uploaded_file = SimpleNamespace(
+        name=name, display_name=display_name, create_time=datetime.now(timezone.utc) - age
+    )
+    analyzer.stored[key_index][name] = uploaded_file
+    return uploaded_file
+
+
+class FakeFetcher:
+    """Serves `papers` and writes a small PDF per paper under `pdf_dir`"""
+
+    def __init__(self, papers, pdf_dir):
+        self.papers = papers
+        self.pdf_dir = pdf_dir
+
+    async def fetch_papers(self, date=None):
+        return self.papers
+
+    @asynccontextmanager
+    async def download_session(self):
+        yield None
+
+    async def download_paper(self, paper, session=None):
+        path = self.pdf_dir / f"{paper.paper_id}.pdf"
+        path.write_bytes(b"%PDF")
+        return str(path)
+
+
+def test_uploads_are_deleted_with_the_key_they_were_uploaded_with():
+    analyzer = fake_analyzer()
+    analyzer.key_index = 1
+
+    async def run():
+        with GeminiFileManager(analyzer) as files:
+            uploaded_file, key_index = await files.upload("paper.pdf", "2501.00001")
+            # Analyses rotate the analyzer's key before the upload is deleted
+            analyzer.key_index = 2
+            files.delete(uploaded_file)
+        return uploaded_file, key_index
+
+    uploaded_file, key_index = asyncio.run(run())
+    assert key_index == 1
+    assert uploaded_file.display_name == f"{ANALYSIS_DISPLAY_NAME_PREFIX}2501.00001"
+    assert analyzer.deleted == [(uploaded_file.name, 1)]
+    assert analyzer.stored == [{}, {}, {}]
+
+
+def test_uploads_are_deleted_when_analysis_fails(db, tmp_path):
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    papers = [Paper(f"2501.0000{i}", "T", [{"name": "A"}], "S", "2025-01-01") for i in range(3)]
+    # Every generation is rate limited, so each analysis fails after its retries
+    analyzer = fake_analyzer(rate_limit_rate=1.0)
+    processor = PaperProcessor(fetcher=FakeFetcher(papers, tmp_path), analyzer=analyzer)
+
+    assert asyncio.run(processor.process_papers()) is True
+
+    assert db.get_papers_count() == 0
+    assert sorted(name for name, _ in analyzer.deleted) == [f"files/2501.0000{i}.pdf" for i in range(3)]
+    assert analyzer.stored == [{}, {}, {}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_orphans_are_reaped_from_every_key():
+    analyzer = fake_analyzer()
+    old = timedelta(days=2)
+    stored_file(analyzer, 0, "files/old-0", f"{ANALYSIS_DISPLAY_NAME_PREFIX}1", old)
+    stored_file(analyzer, 2, "files/old-2", f"{ANALYSIS_DISPLAY_NAME_PREFIX}2", old)
+    stored_file(analyzer, 1, "files/recent", f"{ANALYSIS_DISPLAY_NAME_PREFIX}3", timedelta(minutes=1))
+    stored_file(analyzer, 1, "files/not-ours", "someone-else.pdf", old)
+    live = stored_file(analyzer, 2, "files/live", f"{ANALYSIS_DISPLAY_NAME_PREFIX}4", old)
+
+    with GeminiFileManager(analyzer) as files:
+        files._live[live.name] = (live, 2)
+        reaped = files.reap_orphans(max_age_seconds=3600)
+
+    assert reaped == 2
+    assert sorted(analyzer.deleted) == [("files/old-0", 0), ("files/old-2", 2)]
+    assert sorted(analyzer.stored[1]) == ["files/not-ours", "files/recent"]
+    assert list(analyzer.stored[2]) == ["files/live"]
+
+
+def test_a_key_that_cannot_be_listed_does_not_stop_reaping_the_others():
+    analyzer = fake_analyzer(key_count=2)
+    stored_file(analyzer, 1, "files/old", f"{ANALYSIS_DISPLAY_NAME_PREFIX}1", timedelta(days=2))
+    list_files = analyzer.list_files
+
+    def failing_list_files(key_index=None):
+        if key_index == 0:
+            raise Exception("403 API key not valid")
+        return list_files(key_index)
+
+    analyzer.list_files = failing_list_files
+    with GeminiFileManager(analyzer) as files:
+        assert files.reap_orphans(max_age_seconds=3600) == 1
+    assert analyzer.deleted == [("files/old", 1)]
+
+
+def test_closing_waits_for_pending_deletes_and_stops_the_threads():
+    analyzer = fake_analyzer()
+
+    async def run():
+        files = GeminiFileManager(analyzer)
+        uploaded = [await files.upload(f"{i}.pdf", str(i)) for i in range(5)]
+        for uploaded_file, _ in uploaded:
+            files.delete(uploaded_file)
+        files.close()
+        return files
+
+    files = asyncio.run(run())
+    assert len(analyzer.deleted) == 5
+    assert files._live == {}
+    assert files._uploads._shutdown and files._deletes._shutdown
+
+
+def test_analyses_generate_with_the_key_of_their_upload(db, tmp_path):
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    papers = [Paper(f"2501.0000{i}", "T", [{"name": "A"}], "S", "2025-01-01") for i in range(6)]
+    # Analyses rotate the shared key while other uploads wait to be analyzed, and
+    # the fake model refuses files stored under another key
+    analyzer = fake_analyzer()
+    processor = PaperProcessor(fetcher=FakeFetcher(papers, tmp_path), analyzer=analyzer)
+
+    assert asyncio.run(processor.process_papers()) is True
+
+    assert db.get_papers_count() == len(papers)
+    assert len(analyzer.deleted) == len(papers)
+
+
+def test_rate_limited_analyses_retry_with_the_key_of_their_upload():
+    analyzer = fake_analyzer()
+    uploaded_file = analyzer.upload_file("paper.pdf", key_index=1)
+    model = analyzer._model
+    generations = []
+
+    class FlakyModel:
+        def __init__(self, key_index):
+            self.model = model(key_index)
+            self.key_index = key_index
+
+        def generate_content(self, contents, **kwargs):
+            generations.append(self.key_index)
+            if len(generations) == 1:
+                raise Exception("429 Resource has been exhausted (e.g. check quota).")
+            return self.model.generate_content(contents, **kwargs)
+
+    analyzer._model = FlakyModel
+    assert analyzer.analyze_uploaded_file(uploaded_file, 1)
+    assert generations == [1, 1]
+    # The shared key still moved on for later uploads
+    assert analyzer.key_index != 0
+
+    analyzer._model = model
+    with pytest.raises(Exception, match="403"):
+        analyzer.analyze_uploaded_file(uploaded_file, 0)
+
+
+def test_uploads_wait_while_the_live_limit_is_reached():
+    analyzer = fake_analyzer()
+
+    async def run():
+        with GeminiFileManager(analyzer, max_live=2) as files:
+            uploads = [asyncio.ensure_future(files.upload(f"{i}.pdf", str(i))) for i in range(3)]
+            await asyncio.sleep(0.1)
+            done_before_delete = sum(upload.done() for upload in uploads)
+            first_done = next(upload for upload in uploads if upload.done())
+            files.delete(first_done.result()[0])
+            await asyncio.wait_for(asyncio.gather(*uploads), 5)
+            for upload in uploads:
+                if upload is not first_done:
+                    files.delete(upload.result()[0])
+        return done_before_delete
+
+    assert asyncio.run(run()) == 2
+    assert len(analyzer.deleted) == 3
@@ -0,0 +1,195 @@
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from paperflux.src.models.models import Paper
+from paperflux.src.services.api import PaperAPI
+
+
+def make_paper(index, daily_date="2025-01-15"):
+    return Paper(
+        f"2501.{index:05d}",
+        f"Title {index}",
+        [{"name": "A"}, {"name": "B"}],
+        "Summary " * 200,
+        "2025-01-15T00:00:00Z",
+        explanation="Explanation",
+        daily_date=daily_date,
+    )
+
+
+def serve(api, requests):
+    """Run `requests(client)` against the API app on a local test server"""
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def run():
+        async with TestClient(TestServer(api.create_app())) as client:
+            return await requests(client)
+
+    return asyncio.run(run())
+
+
+def test_unchanged_responses_are_answered_with_304(db):
+    db.upsert_paper(make_paper(1))
+    api = PaperAPI(db)
+
+    async def requests(client):
+        first = await client.get("/api/papers/2501.00001")
+        etag = first.headers["ETag"]
+        again = await client.get("/api/papers/2501.00001", headers={"If-None-Match": etag})
+        other = await client.get("/api/papers/2501.00001", headers={"If-None-Match": 'W/"0-stale"'})
+        return first.status, etag, again.status, await again.read(), other.status
+
+    status, etag, again_status, again_body, other_status = serve(api, requests)
+    assert status == 200 and etag.startswith('W/"')
+    assert again_status == 304 and again_body == b""
+    assert other_status == 200
+
+
+def test_etag_changes_with_the_data_version(db):
+    db.upsert_paper(make_paper(1))
+    api = PaperAPI(db)
+
+    async def requests(client):
+        before = (await client.get("/api/papers")).headers["ETag"]
+        db.upsert_paper(make_paper(2))
+        api.version = db.get_data_version()
+        after = await client.get("/api/papers", headers={"If-None-Match": before})
+        return before, after.status, after.headers["ETag"], await after.json()
+
+    before, status, after, payload = serve(api, requests)
+    assert status == 200 and after != before
+    assert len(payload["papers"]) == 2
+
+
+def test_large_responses_are_gzipped_when_accepted(db):
+    db.upsert_paper(make_paper(1))
+    api = PaperAPI(db)
+
+    async def requests(client):
+        zipped = await client.get(
+            "/api/papers/2501.00001", headers={"Accept-Encoding": "gzip"}, auto_decompress=False
+        )
+        plain = await client.get("/api/papers/2501.00001", headers={"Accept-Encoding": "identity"})
+        return zipped.headers.get("Content-Encoding"), await zipped.read(), plain.headers.get("Content-Encoding"), await plain.read()
+
+    zipped_encoding, zipped_body, plain_encoding, plain_body = serve(api, requests)
+    assert zipped_encoding == "gzip"
+    assert plain_encoding is None
+    assert gzip.decompress(zipped_body) == plain_body
+    assert json.loads(plain_body)["paper_id"] == "2501.00001"
+
+
+def test_cursor_pagination_walks_every_paper_both_ways(db):
+    for i in range(5):
+        db.upsert_paper(make_paper(i, daily_date=f"2025-01-{10 + i % 2}"))
+    api = PaperAPI(db)
+
+    async def requests(client):
+        pages = [await (await client.get("/api/papers", params={"limit": "2"})).json()]
+        while pages[-1]["next_cursor"]:
+            params = {"limit": "2", "cursor": pages[-1]["next_cursor"]}
+            pages.append(await (await client.get("/api/papers", params=params)).json())
+        params = {"limit": "2", "cursor": pages[-1]["prev_cursor"], "direction": "prev"}
+        back = await (await client.get("/api/papers", params=params)).json()
+        bad = await client.get("/api/papers", params={"cursor": "nope"})
+        return pages, back, bad.status
+
+    pages, back, bad_status = serve(api, requests)
+    ids = [paper["paper_id"] for page in pages for paper in page["papers"]]
+    assert sorted(ids) == [f"2501.{i:05d}" for i in range(5)]
+    assert len(set(ids)) == 5
+    assert pages[0]["prev_cursor"] is None
+    assert back["papers"] == pages[-2]["papers"]
+    assert bad_status == 400
+
+
+def test_search_pages_through_matching_papers(text_search):
+    db = text_search
+    for i in range(5):
+        paper = make_paper(i)
+        paper.title = f"Diffusion {i}" if i % 2 == 0 else f"Graphs {i}"
+        db.upsert_paper(paper)
+    api = PaperAPI(db)
+
+    async def requests(client):
+        first = await (await client.get("/api/search", params={"q": "diffusion", "limit": "2"})).json()
+        params = {"q": "diffusion", "limit": "2", "cursor": first["next_cursor"]}
+        second = await (await client.get("/api/search", params=params)).json()
+        missing = await client.get("/api/search", params={"q": "  "})
+        return first, second, missing.status
+
+    first, second, missing_status = serve(api, requests)
+    ids = [paper["paper_id"] for page in (first, second) for paper in page["papers"]]
+    assert ids == ["2501.00000", "2501.00002", "2501.00004"]
+    assert second["next_cursor"] is None
+    assert missing_status == 400
+
+
+def test_missing_paper_is_404(db):
+    api = PaperAPI(db)
+
+    async def requests(client):
+        response = await client.get("/api/papers/2501.99999")
+        return response.status, await response.json()
+
+    status, payload = serve(api, requests)
+    assert status == 404 and "2501.99999" in payload["error"]
+
+
+def test_concurrent_misses_build_the_response_once(db):
+    db.upsert_paper(make_paper(1))
+    api = PaperAPI(db)
+    builds = []
+    release = threading.Event()
+
+    def build():
+        builds.append(1)
+        release.wait(5)
+        return 200, {"ok": True}
+
+    before = api.metrics.snapshot()
+
+    async def run():
+        waiters = [asyncio.ensure_future(api._cached(("slow",), build)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        responses = await asyncio.gather(*waiters)
+        cached = await api._cached(("slow",), build)
+        return responses, cached
+
+    responses, cached = asyncio.run(run())
+    assert len(builds) == 1
+    assert all(response is responses[0] for response in responses)
+    assert cached is responses[0]
+    assert api._building == {}
+    coalesced = [c for c in api.metrics.summary_since(before)["counters"] if c["name"] == "paperflux_api_coalesced_total"]
+    assert [c["value"] for c in coalesced] == [4]
+    assert "# TYPE paperflux_api_coalesced_total counter" in api.metrics.render_prometheus()
+
+
+def test_a_failed_build_fails_its_waiters_and_is_retried(db):
+    api = PaperAPI(db)
+    calls = []
+
+    def build():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("mongo down")
+        return 200, {"ok": True}
+
+    async def run():
+        results = await asyncio.gather(
+            api._cached(("flaky",), build), api._cached(("flaky",), build), return_exceptions=True
+        )
+        return results, await api._cached(("flaky",), build)
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried.status == 200
+    assert len(calls) == 2
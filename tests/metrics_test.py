@@ -0,0 +1,99 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from paperflux.src.services.metrics import DEFAULT_BUCKETS, MetricsRegistry
+
+
+@pytest.fixture
+def metrics():
+    """A fresh MetricsRegistry singleton"""
+    MetricsRegistry._instance = None
+    registry = MetricsRegistry()
+    yield registry
+    if registry._server is not None:
+        registry._server.shutdown()
+        registry._server.server_close()
+    MetricsRegistry._instance = None
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name) and not line.startswith("#")]
+
+
+def test_counters_and_gauges_are_rendered_with_help_and_type(metrics):
+    metrics.inc("paperflux_papers_total", outcome="stored")
+    metrics.inc("paperflux_papers_total", 2, outcome="stored")
+    metrics.set_gauge("paperflux_queue_depth", 4, queue="analysis")
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE paperflux_papers_total counter" in text
+    assert "# HELP paperflux_queue_depth " in text
+    assert "# TYPE paperflux_queue_depth gauge" in text
+    assert sample_lines(text, "paperflux_papers_total") == ['paperflux_papers_total{outcome="stored"} 3']
+    assert sample_lines(text, "paperflux_queue_depth") == ['paperflux_queue_depth{queue="analysis"} 4']
+
+
+def test_label_values_are_escaped(metrics):
+    metrics.inc("paperflux_api_requests_total", route='say "hi"\\\n', status=200)
+
+    text = metrics.render_prometheus()
+
+    assert sample_lines(text, "paperflux_api_requests_total") == [
+        'paperflux_api_requests_total{route="say \\"hi\\"\\\\\\n",status="200"} 1'
+    ]
+
+
+def test_histogram_buckets_are_cumulative(metrics):
+    for value in (0.005, 0.2, 0.2, 1000):
+        metrics.observe("paperflux_stage_duration_seconds", value, stage="pdf_download")
+
+    lines = sample_lines(metrics.render_prometheus(), "paperflux_stage_duration_seconds")
+    buckets = [line for line in lines if "_bucket" in line]
+
+    assert len(buckets) == len(DEFAULT_BUCKETS) + 1
+    assert buckets[0] == 'paperflux_stage_duration_seconds_bucket{stage="pdf_download",le="0.01"} 1'
+    assert 'paperflux_stage_duration_seconds_bucket{stage="pdf_download",le="0.1"} 1' in buckets
+    assert 'paperflux_stage_duration_seconds_bucket{stage="pdf_download",le="0.25"} 3' in buckets
+    assert buckets[-2].endswith('le="300"} 3')
+    assert buckets[-1] == 'paperflux_stage_duration_seconds_bucket{stage="pdf_download",le="+Inf"} 4'
+    assert 'paperflux_stage_duration_seconds_sum{stage="pdf_download"} 1000.405' in lines
+    assert 'paperflux_stage_duration_seconds_count{stage="pdf_download"} 4' in lines
+
+
+def test_summary_since_reports_only_what_changed(metrics):
+    metrics.inc("paperflux_papers_total", 5, outcome="stored")
+    metrics.observe("paperflux_stage_duration_seconds", 1.0, stage="gemini_generate")
+    before = metrics.snapshot()
+
+    metrics.inc("paperflux_papers_total", 2, outcome="stored")
+    metrics.inc("paperflux_papers_total", outcome="failed")
+    metrics.set_gauge("paperflux_queue_depth", 7, queue="analysis")
+    metrics.observe("paperflux_stage_duration_seconds", 2.0, stage="gemini_generate")
+    metrics.observe("paperflux_stage_duration_seconds", 4.0, stage="gemini_generate")
+
+    summary = metrics.summary_since(before)
+
+    assert sorted((c["labels"]["outcome"], c["value"]) for c in summary["counters"]) == [("failed", 1), ("stored", 2)]
+    assert summary["stages"] == {"gemini_generate": {"count": 2, "total_seconds": 6.0, "mean_seconds": 3.0}}
+    assert summary["duration_seconds"] >= 0
+
+
+def test_metrics_are_served_over_http(metrics):
+    metrics.inc("paperflux_papers_total", outcome="stored")
+    server = metrics.start_server(0)
+    assert metrics.start_server(0) is server
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+        content_type = response.headers["Content-Type"]
+        body = response.read().decode()
+    with pytest.raises(urllib.error.HTTPError) as missing:
+        urllib.request.urlopen(f"{url}/other", timeout=5)
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert body == metrics.render_prometheus()
+    assert 'paperflux_papers_total{outcome="stored"} 1' in body
+    assert missing.value.code == 404
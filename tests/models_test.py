@@ -0,0 +1,108 @@
+from datetime import datetime
+
+import pytest
+
+from paperflux.src.config.settings import PDF_BASE_URL
+from paperflux.src.models.models import Paper, PaperDetail, PaperSchemaError
+from paperflux.src.services.paper_fetcher import PaperFetcher
+
+
+def hf_entry(paper_id="2501.00001", **overrides):
+    paper = {
+        "id": paper_id,
+        "title": "Title",
+        "authors": [{"name": "Ada", "hidden": False}, {"_id": "anonymous"}],
+        "summary": "Summary",
+        "publishedAt": "2025-01-15T00:00:00.000Z",
+        "upvotes": 12,
+    }
+    paper.update(overrides)
+    return {"paper": paper, "numComments": 3}
+
+
+def test_hf_entries_are_decoded_to_the_fields_we_use():
+    paper = Paper.from_hf_entry(hf_entry(), "2025-01-15")
+
+    assert paper.paper_id == "2501.00001"
+    assert paper.authors == [{"name": "Ada"}, {"name": ""}]
+    assert paper.published_at == "2025-01-15T00:00:00.000Z"
+    assert paper.pdf_url == PDF_BASE_URL.format(id="2501.00001")
+    assert paper.daily_date == "2025-01-15"
+    assert paper.explanation is None and paper.processed_at is None
+
+
+@pytest.mark.parametrize(
+    "entry",
+    [
+        None,
+        [],
+        {},
+        {"paper": None},
+        {"paper": {"id": "2501.00001", "title": "Title"}},
+        hf_entry(authors="Ada"),
+        hf_entry(authors=["Ada"]),
+        hf_entry(id=2501.00001),
+        hf_entry(title=None),
+        hf_entry(summary=["Summary"]),
+        hf_entry(publishedAt=None),
+    ],
+)
+def test_malformed_hf_entries_are_rejected(entry):
+    with pytest.raises(PaperSchemaError):
+        Paper.from_hf_entry(entry)
+
+
+def test_malformed_entries_are_dropped_from_a_daily_papers_response():
+    entries = [hf_entry("2501.00001"), {"paper": "oops"}, hf_entry("2501.00002", title=None), hf_entry("2501.00003")]
+
+    papers = PaperFetcher.decode_papers(entries, "2025-01-15")
+
+    assert [paper.paper_id for paper in papers] == ["2501.00001", "2501.00003"]
+    assert all(paper.daily_date == "2025-01-15" for paper in papers)
+
+
+def test_a_daily_papers_response_that_is_not_a_list_is_rejected():
+    with pytest.raises(PaperSchemaError):
+        PaperFetcher.decode_papers({"error": "rate limited"})
+
+
+def test_documents_round_trip_and_missing_fields_get_defaults():
+    processed_at = datetime(2025, 1, 15, 8, 30)
+    paper = Paper(
+        "2501.00001", "Title", [{"name": "Ada"}], "Summary", "2025-01-15T00:00:00Z",
+        explanation="# Analysis", pdf_url="https://arxiv.org/pdf/2501.00001.pdf", daily_date="2025-01-15",
+        explanation_html="<h1>Analysis</h1>", explanation_hash="a" * 64, processed_at=processed_at,
+    )
+    doc = {"_id": "mongo-id", **paper.to_dict()}
+
+    assert Paper.from_document(doc).to_dict() == paper.to_dict()
+
+    sparse = Paper.from_document({"paper_id": "2501.00002", "authors": None})
+    assert (sparse.title, sparse.authors, sparse.summary, sparse.published_at) == ("", [], "", "")
+    assert sparse.explanation is None and sparse.daily_date is None and sparse.processed_at is None
+    # processed_at is stamped when a paper without one is serialized for storage
+    assert isinstance(sparse.to_dict()["processed_at"], datetime)
+
+
+@pytest.mark.parametrize(
+    "names, expected",
+    [
+        ([], ""),
+        (["Ada"], "Ada"),
+        (["Ada", "Alan", "Grace"], "Ada, Alan, Grace"),
+        (["Ada", "Alan", "Grace", "Edsger"], "Ada, Alan, Grace et al."),
+    ],
+)
+def test_detail_lists_at_most_three_authors(names, expected):
+    assert PaperDetail.format_authors([{"name": name} for name in names]) == expected
+
+
+def test_detail_formats_the_publication_date():
+    paper = Paper("2501.00001", "Title", [{"name": "Ada"}], "Summary", "2025-01-05T00:00:00.000Z", explanation="# A")
+    detail = PaperDetail.from_paper(paper)
+
+    assert detail.published_date == "Jan 05, 2025"
+    assert (detail.paper_id, detail.authors_text, detail.explanation) == ("2501.00001", "Ada", "# A")
+
+    paper.published_at = "sometime in 2025"
+    assert PaperDetail.from_paper(paper).published_date == "sometime in 2025"
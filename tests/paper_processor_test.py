@@ -0,0 +1,88 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from paperflux.src.models.models import Paper
+from paperflux.src.config.settings import PROGRESS_STALE_SECONDS
+from paperflux.src.services.database import FAILED_EXPLANATION_PREFIX
+
+
+class FailingAnalyzer:
+    api_keys = ["fake-key"]
+
+    def analyze_uploaded_file(self, uploaded_file, key_index=None):
+        raise Exception("Failed to analyze paper after 3 attempts")
+
+
+def make_paper(paper_id):
+    return Paper(paper_id, f"Title {paper_id}", [{"name": "A"}], "Summary", "2025-01-01T00:00:00Z")
+
+
+def test_failed_analysis_is_not_stored(db):
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    processor = PaperProcessor(analyzer=FailingAnalyzer())
+    stored = processor.analyze_and_store_paper(make_paper("2501.00001"), SimpleNamespace(name="files/x"))
+
+    assert stored is False
+    assert db.get_paper_by_id("2501.00001") is None
+
+
+def test_papers_stored_with_a_failed_analysis_are_retried(db):
+    failed = make_paper("2501.00001")
+    failed.explanation = f"{FAILED_EXPLANATION_PREFIX} 429 quota exceeded"
+    analyzed = make_paper("2501.00002")
+    analyzed.explanation = "# Analysis"
+    db.upsert_paper(failed)
+    db.upsert_paper(analyzed)
+
+    assert db.get_existing_paper_ids(["2501.00001", "2501.00002"]) == {"2501.00002"}
+
+
+def test_processing_status_is_held_by_one_run(db):
+    assert db.try_start_processing("run-a")
+    assert not db.try_start_processing("run-b")
+    assert db.get_processing_metadata().is_processing
+    db.release_processing("run-a")
+    assert db.try_start_processing("run-b")
+
+
+def test_a_stale_processing_lease_is_taken_over(db):
+    assert db.try_start_processing("run-a")
+    # run-a died without releasing its lease and stopped renewing it
+    db.metadata_collection.update_one(
+        {"_id": "processing_metadata"},
+        {"$set": {"heartbeat": datetime.utcnow() - timedelta(seconds=PROGRESS_STALE_SECONDS + 1)}},
+    )
+    assert not db.get_processing_metadata().is_processing
+
+    assert db.try_start_processing("run-b")
+    assert not db.renew_processing_lease("run-a")
+    # A late release by the dead run leaves the new lease alone
+    db.release_processing("run-a")
+    assert db.get_processing_metadata().is_processing
+    assert db.renew_processing_lease("run-b")
+    assert not db.try_start_processing("run-c")
+
+
+def test_backfill_skips_while_another_run_is_processing(db):
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    db.try_start_processing("another-run")
+    processor = PaperProcessor(analyzer=FailingAnalyzer())
+    result = asyncio.run(processor.backfill(date(2025, 1, 1), date(2025, 1, 2)))
+
+    assert result == {}
+    # The other run's status is left alone
+    assert db.get_processing_metadata().is_processing
+
+
+def test_backfill_needs_at_least_one_day_at_a_time(db):
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    processor = PaperProcessor(analyzer=FailingAnalyzer())
+    with pytest.raises(ValueError):
+        asyncio.run(processor.backfill(date(2025, 1, 1), date(2025, 1, 2), max_concurrent_days=0))
+    assert not db.get_processing_metadata().is_processing
@@ -0,0 +1,291 @@
+"""
+Offline end-to-end throughput benchmark for PaperProcessor.process_papers.
+
+Every external service is replaced by a local stand-in, so runs are
+reproducible and need no network or API keys:
+- a fake Hugging Face daily_papers API and arXiv PDF server (aiohttp, in its
+  own thread) with configurable latency, bandwidth and failure rates
+- a fake Gemini analyzer with configurable latency and 429 rate, which goes
+  through the real retry and key rotation logic of PaperAnalyzer
+- mongomock, or a local MongoDB given with --mongo-uri
+
+Each scale runs in a fresh interpreter and reports wall time, throughput,
+peak RSS and per-stage latency. Results are saved as JSON and can be
+compared against an earlier run:
+    python tests/pipeline_benchmark.py --papers 30 300 3000
+    python tests/pipeline_benchmark.py --baseline bench_results/pipeline-<timestamp>.json
+"""
+import asyncio
+import logging
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import bench_common
+
+BENCH_DB_NAME = "paperflux_benchmark"
+
+# Roughly the size of a real multi-section analysis, math included
+FAKE_EXPLANATION = (
+    "# Paper Title\n\n## Core Contribution\n\n"
+    + "The method minimizes $\\mathcal{L}(\\theta) = \\sum_i \\ell(f_\\theta(x_i), y_i)$ "
+    "with a *novel* regularizer.\n\n$$\nR(\\theta) = \\lambda \\|\\theta\\|_2^2\n$$\n\n" * 60
+)
+
+
+class FakePaperServer:
+    """Serves a fake daily_papers list and fake PDFs from a background event loop"""
+
+    def __init__(self, paper_count, api_latency, pdf_latency, pdf_size, bandwidth, failure_rate, seed, api_failure_rate=0.0):
+        self.paper_count = paper_count
+        self.api_latency = api_latency
+        self.api_failure_rate = api_failure_rate
+        self.pdf_latency = pdf_latency
+        self.pdf_size = pdf_size
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.port = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        from aiohttp import web
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/api/daily_papers", self.daily_papers)
+        app.router.add_get("/pdf/{paper_id}.pdf", self.pdf)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        self.port = runner.addresses[0][1]
+        self._ready.set()
+        loop.run_forever()
+
+    async def daily_papers(self, request):
+        from aiohttp import web
+
+        await asyncio.sleep(self.api_latency)
+        if self.random.random() < self.api_failure_rate:
+            return web.Response(status=503)
+        return web.json_response([
+            {
+                "paper": {
+                    "id": f"2501.{i:05d}",
+                    "title": f"Benchmark Paper {i}: Scaling Laws for Synthetic Workloads",
+                    "authors": [{"name": f"Author {i}-{j}", "hidden": False} for j in range(6)],
+                    "summary": "We study synthetic workloads. " * 40,
+                    "publishedAt": "2025-01-15T00:00:00.000Z",
+                }
+            }
+            for i in range(self.paper_count)
+        ])
+
+    async def pdf(self, request):
+        from aiohttp import web
+
+        await asyncio.sleep(self.pdf_latency)
+        if request.method == "HEAD":
+            return web.Response(headers={"Content-Type": "application/pdf", "Content-Length": str(self.pdf_size)})
+        if self.random.random() < self.failure_rate:
+            return web.Response(status=503)
+        response = web.StreamResponse(headers={"Content-Type": "application/pdf"})
+        response.content_length = self.pdf_size
+        await response.prepare(request)
+        chunk = b"%" * 65536
+        remaining = self.pdf_size
+        while remaining > 0:
+            size = min(len(chunk), remaining)
+            await response.write(chunk[:size])
+            remaining -= size
+            if self.bandwidth:
+                await asyncio.sleep(size / self.bandwidth)
+        await response.write_eof()
+        return response
+
+
+def make_fake_analyzer(latency, rate_limit_rate, key_count, seed):
+    """Build a PaperAnalyzer whose Gemini calls are simulated in-process"""
+    from paperflux.src.services.metrics import MetricsRegistry
+    from paperflux.src.services.paper_analyzer import PaperAnalyzer
+
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class FakeModel:
+        """Generates with one key, which like Gemini can only read that key's uploads"""
+
+        def __init__(self, analyzer, key_index):
+            self.analyzer = analyzer
+            self.key_index = key_index
+
+        def generate_content(self, contents, safety_settings=None, generation_config=None):
+            for part in contents:
+                name = getattr(part, "name", None)
+                if name is None:
+                    continue
+                with self.analyzer._files_lock:
+                    if name not in self.analyzer.stored[self.key_index]:
+                        raise Exception(f"403 You do not have permission to access the File {name} with key {self.key_index}")
+            with rng_lock:
+                jitter = rng.uniform(0.5, 1.5)
+                rate_limited = rng.random() < rate_limit_rate
+            time.sleep(latency * jitter)
+            if rate_limited:
+                raise Exception("429 Resource has been exhausted (e.g. check quota).")
+            return SimpleNamespace(
+                text=FAKE_EXPLANATION,
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=12000, candidates_token_count=4000, total_token_count=16000
+                ),
+            )
+
+    class FakeGeminiAnalyzer(PaperAnalyzer):
+        rate_limit_backoff_seconds = 0.05
+        max_backoff_seconds = 0.2
+
+        def __init__(self):
+            # Skips PaperAnalyzer.__init__, which reads real API keys from the environment
+            self.metrics = MetricsRegistry()
+            self.api_keys = [f"fake-key-{i}" for i in range(key_count)]
+            self.key_index = 0
+            # The simulated file store of each key, and every delete as (name, key index)
+            self.stored = [{} for _ in range(key_count)]
+            self.deleted = []
+            self._files_lock = threading.Lock()
+            self._configure_client()
+
+        def _configure_client(self):
+            self.safety_settings = {}
+
+        def _model(self, key_index):
+            return FakeModel(self, key_index)
+
+        def upload_file(self, pdf, display_name=None, key_index=None):
+            time.sleep(latency / 10)
+            key_index = self.key_index if key_index is None else key_index
+            uploaded_file = SimpleNamespace(
+                name=f"files/{os.path.basename(str(pdf))}",
+                display_name=display_name,
+                create_time=datetime.now(timezone.utc),
+            )
+            with self._files_lock:
+                self.stored[key_index][uploaded_file.name] = uploaded_file
+            return uploaded_file
+
+        def delete_file(self, uploaded_file, key_index=None):
+            key_index = self.key_index if key_index is None else key_index
+            with self._files_lock:
+                if self.stored[key_index].pop(uploaded_file.name, None) is None:
+                    raise Exception(f"404 {uploaded_file.name} not found with key {key_index}")
+                self.deleted.append((uploaded_file.name, key_index))
+
+        def list_files(self, key_index=None):
+            key_index = self.key_index if key_index is None else key_index
+            with self._files_lock:
+                return list(self.stored[key_index].values())
+
+    return FakeGeminiAnalyzer()
+
+
+def run_scale(args, paper_count):
+    """Run one process_papers pass over `paper_count` papers in this interpreter"""
+    logging.basicConfig(level=logging.WARNING)
+    server = FakePaperServer(
+        paper_count,
+        args.api_latency,
+        args.pdf_latency,
+        args.pdf_size,
+        args.bandwidth,
+        args.download_failure_rate,
+        args.seed,
+        args.api_failure_rate,
+    ).start()
+
+    temp_dir = tempfile.mkdtemp(prefix="paperflux-bench-")
+    os.environ["HF_API_URL"] = f"http://127.0.0.1:{server.port}/api/daily_papers"
+    os.environ["PDF_BASE_URL"] = f"http://127.0.0.1:{server.port}/pdf/{{id}}.pdf"
+    os.environ["TEMP_DIR"] = temp_dir
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+    if args.in_memory:
+        os.environ["PAPERFLUX_IN_MEMORY_DOWNLOADS"] = "1"
+        os.environ["PAPERFLUX_DOWNLOAD_MEMORY_LIMIT_MB"] = str(args.memory_limit_mb)
+
+    from paperflux.src.services.database import DatabaseService
+    from paperflux.src.services.metrics import MetricsRegistry
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    client = bench_common.mongo_client(args.mongo_uri, BENCH_DB_NAME)
+    db = DatabaseService(client=client)
+
+    analyzer = make_fake_analyzer(args.gemini_latency, args.rate_limit_rate, args.keys, args.seed)
+    processor = PaperProcessor(analyzer=analyzer)
+    metrics = MetricsRegistry()
+
+    before = metrics.snapshot()
+    start = time.perf_counter()
+    success = asyncio.run(processor.process_papers())
+    wall_time = time.perf_counter() - start
+    summary = metrics.summary_since(before)
+
+    stored = db.get_papers_count()
+    return {
+        "papers": paper_count,
+        "success": success,
+        "stored": stored,
+        "wall_seconds": wall_time,
+        "throughput_papers_per_second": stored / wall_time if wall_time else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": summary["stages"],
+        "counters": summary["counters"],
+    }
+
+
+def print_result(result, previous):
+    line = (
+        f"{result['papers']:>5} papers: {result['wall_seconds']:8.2f}s wall, "
+        f"{result['throughput_papers_per_second']:7.2f} papers/s, "
+        f"{result['peak_rss_mb']:8.1f} MB peak RSS, {result['stored']} stored"
+    )
+    if previous and previous["throughput_papers_per_second"]:
+        change = result["throughput_papers_per_second"] / previous["throughput_papers_per_second"] - 1
+        line += f" ({change:+.1%} throughput vs baseline)"
+    print(line)
+    for stage, stats in sorted(result["stages"].items()):
+        print(f"        {stage:<16} {stats['count']:>6} calls, {stats['mean_seconds'] * 1000:9.2f} ms mean")
+
+
+def build_parser():
+    parser = bench_common.build_parser(__doc__, [30, 300, 3000], BENCH_DB_NAME, "pipeline")
+    parser.add_argument("--api-latency", type=float, default=0.3, help="Daily papers API latency (s)")
+    parser.add_argument("--pdf-latency", type=float, default=0.05, help="PDF time to first byte (s)")
+    parser.add_argument("--pdf-size", type=int, default=200_000, help="PDF size (bytes)")
+    parser.add_argument("--bandwidth", type=float, default=20_000_000, help="Per-download bandwidth (bytes/s, 0 for unlimited)")
+    parser.add_argument("--api-failure-rate", type=float, default=0.0, help="Fraction of daily papers API requests answered with 503")
+    parser.add_argument("--download-failure-rate", type=float, default=0.01, help="Fraction of PDF requests answered with 503")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Mean generation latency (s)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02, help="Fraction of generations failing with 429")
+    parser.add_argument("--keys", type=int, default=10, help="Number of fake Gemini API keys")
+    parser.add_argument("--in-memory", action="store_true", help="Keep downloaded PDFs in memory instead of TEMP_DIR")
+    parser.add_argument("--memory-limit-mb", type=int, default=256, help="Buffer pool cap with --in-memory")
+    return parser
+
+
+def main(argv=None):
+    return bench_common.main(__file__, build_parser(), run_scale, print_result, "pipeline", argv)
+
+
+if __name__ == "__main__":
+    main()
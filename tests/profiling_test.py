@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tracemalloc
+
+from paperflux.src.services.profiling import ProfileSession
+
+
+def summary(artifact_dir):
+    with open(os.path.join(artifact_dir, "summary.json")) as f:
+        return json.load(f)
+
+
+def test_overlapping_sessions_stop_in_any_order(tmp_path):
+    a = ProfileSession("a", profile_dir=str(tmp_path)).start()
+    b = ProfileSession("b", profile_dir=str(tmp_path)).start()
+    a_dir = a.stop()
+    # tracemalloc must still be tracing for B after A stops
+    assert tracemalloc.is_tracing()
+    b_dir = b.stop()
+    assert not tracemalloc.is_tracing()
+
+    # Only the first session profiles CPU, the second records memory and timing
+    assert summary(a_dir)["cpu_profiled"] is True
+    assert os.path.exists(os.path.join(a_dir, "cpu.prof"))
+    assert summary(b_dir)["cpu_profiled"] is False
+    assert not os.path.exists(os.path.join(b_dir, "cpu.prof"))
+    assert os.path.exists(os.path.join(b_dir, "memory.txt"))
+
+    # CPU profiling is free again once the first session stopped
+    c = ProfileSession("c", profile_dir=str(tmp_path)).start()
+    assert summary(c.stop())["cpu_profiled"] is True
+
+
+def test_tracemalloc_started_elsewhere_is_left_running(tmp_path):
+    tracemalloc.start()
+    try:
+        with ProfileSession("a", profile_dir=str(tmp_path)):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_overlapping_async_sessions_restore_loop_settings(tmp_path):
+    async def run():
+        loop = asyncio.get_running_loop()
+        before = (loop.get_debug(), loop.slow_callback_duration)
+
+        async def profiled(name, delay):
+            async with ProfileSession(name, profile_dir=str(tmp_path)) as session:
+                await asyncio.sleep(delay)
+            return session.artifact_dir
+
+        dirs = await asyncio.gather(profiled("a", 0.01), profiled("b", 0.03))
+        return before, (loop.get_debug(), loop.slow_callback_duration), dirs
+
+    before, after, dirs = asyncio.run(run())
+    assert after == before
+    assert sorted(summary(d)["cpu_profiled"] for d in dirs) == [False, True]
+    assert all("loop" in summary(d) for d in dirs)
+
+
+def test_worker_thread_calls_are_merged_into_the_cpu_profile(tmp_path):
+    import pstats
+    from concurrent.futures import ThreadPoolExecutor
+
+    from paperflux.src.services.profiling import thread_profiled
+
+    def busy_work_in_a_worker():
+        return sum(i * i for i in range(10000))
+
+    profiled_work = thread_profiled(busy_work_in_a_worker)
+    with ProfileSession("a", profile_dir=str(tmp_path)) as session:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert list(executor.map(lambda _: profiled_work(), range(3)))[0] == 333283335000
+    # Calls made after the session ended are not profiled
+    profiled_work()
+
+    assert summary(session.artifact_dir)["thread_profiled_calls"] == 3
+    stats = pstats.Stats(os.path.join(session.artifact_dir, "cpu.prof")).stats
+    calls = [value[1] for (_, _, name), value in stats.items() if name == "busy_work_in_a_worker"]
+    assert calls == [3]
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+from paperflux.src.config.settings import PROGRESS_MAX_FAILURES
+from paperflux.src.services import progress as progress_module
+from paperflux.src.services.progress import ProgressReporter
+
+
+class RecordingDB:
+    """Keeps every progress document the reporter writes"""
+
+    def __init__(self):
+        self.writes = []
+
+    def update_processing_progress(self, progress):
+        self.writes.append(progress)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_advances_are_written_at_most_once_per_interval(clock):
+    db = RecordingDB()
+    reporter = ProgressReporter(db, "daily", min_interval_seconds=2)
+    reporter.start()
+    reporter.add_total(100)
+    for _ in range(50):
+        reporter.advance("downloaded")
+    assert len(db.writes) == 1
+
+    clock.now += 2
+    reporter.advance("downloaded")
+    assert len(db.writes) == 2
+    assert db.writes[-1]["counts"]["downloaded"] == 51
+    assert db.writes[-1]["total"] == 100
+
+
+def test_finish_is_always_written(clock):
+    db = RecordingDB()
+    reporter = ProgressReporter(db, "backfill", min_interval_seconds=60)
+    reporter.start()
+    reporter.advance("stored", 3)
+    reporter.finish("failed")
+
+    assert len(db.writes) == 2
+    assert db.writes[-1]["status"] == "failed"
+    assert db.writes[-1]["run_type"] == "backfill"
+    assert db.writes[-1]["counts"]["stored"] == 3
+
+
+def test_eta_comes_from_the_throughput_of_finished_papers(clock):
+    reporter = ProgressReporter(RecordingDB(), "daily")
+    reporter.add_total(12)
+    assert reporter.to_dict()["eta_seconds"] is None
+
+    clock.now += 10
+    reporter.advance("stored", 3)
+    reporter.fail("2501.00001", "analyze", "boom")
+    reporter.advance("skipped", 2)
+    # 4 papers in 10 seconds, 6 remaining
+    assert reporter.to_dict()["eta_seconds"] == pytest.approx(15.0)
+
+    reporter.advance("stored", 6)
+    assert reporter.to_dict()["eta_seconds"] is None
+
+
+def test_only_the_latest_failures_are_kept_truncated(clock):
+    reporter = ProgressReporter(RecordingDB(), "daily")
+    for i in range(PROGRESS_MAX_FAILURES + 5):
+        reporter.fail(f"2501.{i:05d}", "download", "x" * 1000)
+
+    progress = reporter.to_dict()
+    assert progress["counts"]["failed"] == PROGRESS_MAX_FAILURES + 5
+    assert [f["paper_id"] for f in progress["failures"]] == [
+        f"2501.{i:05d}" for i in range(5, PROGRESS_MAX_FAILURES + 5)
+    ]
+    assert all(len(f["error"]) == 300 and f["stage"] == "download" for f in progress["failures"])
+
+
+def test_a_failing_write_does_not_stop_the_run(clock):
+    class BrokenDB:
+        def update_processing_progress(self, progress):
+            raise Exception("mongo down")
+
+    reporter = ProgressReporter(BrokenDB(), "daily")
+    reporter.start()
+    reporter.advance("downloaded")
+    reporter.finish()
@@ -0,0 +1,146 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from paperflux.src.models.models import Paper
+from paperflux.src.services.buffer_pool import PDFBuffer
+from paperflux.src.services.qa import EXPIRY_MARGIN_SECONDS, PaperQAService
+
+
+class FakeQAAnalyzer:
+    """Records the Q&A contexts it creates and releases, and the key of every call"""
+
+    def __init__(self, setup_seconds=0.0):
+        self.key_index = 0
+        self.setup_seconds = setup_seconds
+        self.created = []
+        self.questions = []
+        self.released = []
+        self.all_released = threading.Condition()
+
+    def create_qa_context(self, pdf, explanation, ttl_seconds, display_name, key_index):
+        time.sleep(self.setup_seconds)
+        uploaded_file = SimpleNamespace(name=f"files/{len(self.created)}", display_name=display_name)
+        self.created.append((uploaded_file.name, key_index))
+        return uploaded_file, None
+
+    def answer_question(self, question, uploaded_file, cached_content=None, explanation=None, key_index=None):
+        self.questions.append((question, uploaded_file.name, key_index))
+        return f"answer to {question}"
+
+    def release_qa_context(self, uploaded_file, cached_content=None, key_index=None):
+        with self.all_released:
+            self.released.append((uploaded_file.name, key_index))
+            self.all_released.notify_all()
+
+    def wait_released(self, count):
+        with self.all_released:
+            assert self.all_released.wait_for(lambda: len(self.released) >= count, 5)
+
+
+def make_paper(paper_id):
+    return Paper(paper_id, "Title", [{"name": "A"}], "Summary", "2025-01-01", explanation="Analysis")
+
+
+def make_service(analyzer, **kwargs):
+    service = PaperQAService(analyzer, **kwargs)
+    service._download_pdf = lambda paper: PDFBuffer(paper.paper_id, b"%PDF", 4, None)
+    return service
+
+
+def test_questions_share_a_session_and_memoize_answers():
+    analyzer = FakeQAAnalyzer()
+    service = make_service(analyzer, ttl_seconds=3600)
+    paper = make_paper("2501.00001")
+
+    assert service.ask(paper, "What is the method?") == "answer to What is the method?"
+    service.ask(paper, "And the results?")
+    service.ask(paper, "  what is the METHOD ")
+
+    assert len(analyzer.created) == 1
+    assert [q for q, _, _ in analyzer.questions] == ["What is the method?", "And the results?"]
+    assert service._paper_locks == {}
+
+
+def test_expired_sessions_are_replaced_and_released():
+    analyzer = FakeQAAnalyzer()
+    service = make_service(analyzer, ttl_seconds=3600)
+    paper = make_paper("2501.00001")
+    service.ask(paper, "First?")
+
+    service._sessions[paper.paper_id].expires_at = time.monotonic() - 1
+    service.ask(paper, "Second?")
+
+    analyzer.wait_released(1)
+    assert analyzer.released == [("files/0", 0)]
+    assert [name for name, _ in analyzer.created] == ["files/0", "files/1"]
+    assert analyzer.questions[-1][1] == "files/1"
+
+
+def test_idle_sessions_are_released_when_they_expire():
+    analyzer = FakeQAAnalyzer()
+    # Retired one second after opening, with nobody asking again
+    service = make_service(analyzer, ttl_seconds=EXPIRY_MARGIN_SECONDS + 1)
+    service.ask(make_paper("2501.00001"), "First?")
+
+    analyzer.wait_released(1)
+    assert analyzer.released == [("files/0", 0)]
+    assert service._sessions == {}
+    # With no session left the sweeper stops
+    sweeper = service._sweeper
+    if sweeper is not None:
+        sweeper.join(5)
+    assert service._sweeper is None
+
+
+def test_a_ttl_within_the_expiry_margin_never_reuses_a_session():
+    analyzer = FakeQAAnalyzer()
+    service = make_service(analyzer, ttl_seconds=30)
+    paper = make_paper("2501.00001")
+    service.ask(paper, "First?")
+    service.ask(paper, "Second?")
+
+    assert len(analyzer.created) == 2
+    analyzer.wait_released(1)
+
+
+def test_least_recently_used_sessions_are_evicted():
+    analyzer = FakeQAAnalyzer()
+    service = make_service(analyzer, ttl_seconds=3600, max_sessions=1)
+    service.ask(make_paper("2501.00001"), "First?")
+    service.ask(make_paper("2501.00002"), "Second?")
+
+    analyzer.wait_released(1)
+    assert analyzer.released == [("files/0", 0)]
+    assert list(service._sessions) == ["2501.00002"]
+
+
+def test_sessions_keep_the_key_they_were_created_with():
+    analyzer = FakeQAAnalyzer()
+    service = make_service(analyzer, ttl_seconds=3600)
+    paper = make_paper("2501.00001")
+    service.ask(paper, "First?")
+
+    # The processing pipeline rotates keys on the shared analyzer meanwhile
+    analyzer.key_index = 3
+    service.ask(paper, "Second?")
+    service.close()
+
+    assert analyzer.created == [("files/0", 0)]
+    assert [key for _, _, key in analyzer.questions] == [0, 0]
+    assert analyzer.released == [("files/0", 0)]
+
+
+def test_concurrent_first_questions_open_one_session():
+    analyzer = FakeQAAnalyzer(setup_seconds=0.05)
+    service = make_service(analyzer, ttl_seconds=3600)
+    paper = make_paper("2501.00001")
+    threads = [threading.Thread(target=service.ask, args=(paper, f"Question {i}?")) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(analyzer.created) == 1
+    assert len(analyzer.questions) == 5
+    assert service._paper_locks == {}
@@ -0,0 +1,88 @@
+import pytest
+
+pytest.importorskip("markdown")
+
+from paperflux.src.services.renderer import MATH_PATTERN, render_explanation, sanitize_html
+
+
+def render(markdown_text):
+    return render_explanation(markdown_text)["html"]
+
+
+def test_script_tags_are_dropped_with_their_content():
+    html = sanitize_html("<p>before</p><script>alert(1)</script><p>after</p>")
+    assert "script" not in html
+    assert "alert" not in html
+    assert "<p>before</p>" in html and "<p>after</p>" in html
+
+
+def test_event_handler_attributes_are_dropped():
+    html = sanitize_html('<a href="https://arxiv.org" onclick="alert(1)">x</a><b onmouseover="alert(2)">y</b>')
+    assert "onclick" not in html and "onmouseover" not in html
+    assert 'href="https://arxiv.org"' in html
+    assert "<b>y</b>" in html
+
+
+def test_disallowed_tags_and_their_attributes_are_dropped():
+    html = sanitize_html('<img src="x" onerror="alert(1)"><svg onload="alert(2)"></svg><iframe src="https://evil"></iframe>')
+    assert html == ""
+
+
+@pytest.mark.parametrize(
+    "href",
+    ["javascript:alert(1)", " JavaScript:alert(1)", "jav&#x09;ascript:alert(1)", "data:text/html,<script>", "vbscript:x"],
+)
+def test_unsafe_url_schemes_are_dropped(href):
+    html = sanitize_html(f'<a href="{href}">link</a>')
+    assert "href" not in html
+    assert "link" in html
+
+
+def test_markdown_links_with_javascript_urls_are_dropped():
+    html = render("[click](javascript:alert(1))")
+    assert "javascript" not in html.lower()
+    assert "click" in html
+
+
+def test_nested_and_unclosed_tags_do_not_leak_script():
+    html = sanitize_html("<script><script>alert(1)</script>text</script><div><script>alert(2)")
+    assert "alert" not in html
+    assert "<script" not in html
+    assert "text" in html
+
+
+def test_comments_and_declarations_are_dropped():
+    html = sanitize_html("<!-- <script>alert(1)</script> --><![CDATA[<script>]]><p>ok</p>")
+    assert html == "<p>ok</p>"
+
+
+def test_math_with_markup_characters_is_escaped_verbatim():
+    html = render(r"Inequality $a < b \& c > d$ and display $$x_1 < y_2$$")
+    assert r"$a &lt; b \&amp; c &gt; d$" in html
+    assert "$$x_1 &lt; y_2$$" in html
+    # The markdown parser never saw the math, so underscores are not emphasis
+    assert "<em>" not in html
+
+
+def test_math_inside_a_link_cannot_break_out_of_the_attribute():
+    html = render('[x](https://arxiv.org/$" onmouseover="alert(1)$)')
+    assert 'onmouseover="' not in html
+    assert "&quot; onmouseover=&quot;" in html
+
+
+def test_text_containing_a_placeholder_token_is_rendered_as_is():
+    text = "Literal PFXMATH0XMATH and PFXMATHabcN7XMATH next to $x^2$"
+    html = render(text)
+    assert "PFXMATH0XMATH" in html
+    assert "PFXMATHabcN7XMATH" in html
+    assert "$x^2$" in html
+
+
+@pytest.mark.parametrize("text", ["It costs $5 and $10 a month", "Between $5-$10 per run", "From $5,$10 to $20"])
+def test_prices_are_not_math(text):
+    assert MATH_PATTERN.findall(text) == []
+    assert render(text) == f"<p>{text}</p>"
+
+
+def test_math_next_to_prices_is_still_math():
+    assert MATH_PATTERN.findall("For $x_1$ it costs $5-$10, or $$y$$") == ["$x_1$", "$$y$$"]
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_settings_read_values_from_dotenv(tmp_path):
+    (tmp_path / ".env").write_text(
+        "PAPERFLUX_READ_ONLY=1\nPAPERFLUX_METRICS_PORT=9100\nPAPERFLUX_QA_SESSION_TTL_SECONDS=600\n"
+    )
+    env = {key: value for key, value in os.environ.items() if not key.startswith("PAPERFLUX_")}
+    env["PYTHONPATH"] = ROOT_DIR
+    # A fresh interpreter in the .env's directory, so settings are imported from scratch
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import json; from paperflux.src.config import settings as s; "
+            "print(json.dumps([s.READ_ONLY, s.METRICS_PORT, s.QA_SESSION_TTL_SECONDS]))",
+        ],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == [True, 9100, 600]
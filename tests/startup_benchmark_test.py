@@ -0,0 +1,119 @@
+"""
+Startup-time benchmark for PaperFlux.
+
+Measures how long the service modules take to import and how long the
+Streamlit app takes to render for the first time, and checks that a
+read-only replica never loads the Gemini SDK.
+
+Run directly to print the measurements:
+    python tests/startup_benchmark_test.py
+
+Run with pytest to check that no heavy module is loaded. The timing budgets
+below depend on the machine, so they are only enforced with
+PAPERFLUX_CHECK_BUDGETS=1. The first-render check needs MONGODB_URI, or
+mongomock as a local stand-in.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORT_BUDGET_SECONDS = 0.5
+FIRST_RENDER_BUDGET_SECONDS = 5.0
+CHECK_BUDGETS = os.environ.get("PAPERFLUX_CHECK_BUDGETS", "").lower() in ("1", "true", "yes")
+
+# Modules that only the processing path should ever need
+HEAVY_MODULES = ["google.generativeai", "aiohttp", "pytz"]
+
+
+def measure_import():
+    """Import every service module and report the time taken and heavy modules loaded"""
+    start = time.perf_counter()
+    import paperflux.src.services.database  # noqa: F401
+    import paperflux.src.services.paper_processor  # noqa: F401
+    import paperflux.src.services.scheduler  # noqa: F401
+    elapsed = time.perf_counter() - start
+    return {
+        "import_seconds": elapsed,
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES + ["pymongo"] if m in sys.modules],
+    }
+
+
+def measure_first_render():
+    """Render app.py once as a read-only replica and report the time taken"""
+    os.environ["PAPERFLUX_READ_ONLY"] = "1"
+    from streamlit.testing.v1 import AppTest
+    from paperflux.src.services.database import DatabaseService
+
+    if not os.environ.get("MONGODB_URI"):
+        import mongomock
+
+        DatabaseService(client=mongomock.MongoClient())
+
+    app = AppTest.from_file(os.path.join(ROOT_DIR, "app.py"), default_timeout=60)
+    already_loaded = set(sys.modules)
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    return {
+        "first_render_seconds": elapsed,
+        "rendered_elements": len(app.markdown),
+        "render_errors": [str(e.value) for e in app.exception],
+        "heavy_modules_loaded": [
+            m for m in HEAVY_MODULES if m in sys.modules and m not in already_loaded
+        ],
+    }
+
+
+def run_in_subprocess(mode):
+    """Measure in a fresh interpreter so nothing imported by pytest skews the result"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), mode],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{mode} benchmark failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_time():
+    pytest.importorskip("dotenv")
+    stats = run_in_subprocess("import")
+    assert stats["heavy_modules_loaded"] == []
+    if CHECK_BUDGETS:
+        assert stats["import_seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_first_render_time():
+    pytest.importorskip("streamlit")
+    pytest.importorskip("pymongo")
+    if not os.environ.get("MONGODB_URI"):
+        pytest.importorskip("mongomock")
+    stats = run_in_subprocess("render")
+    assert stats["render_errors"] == []
+    assert stats["rendered_elements"] > 0
+    assert stats["heavy_modules_loaded"] == []
+    if CHECK_BUDGETS:
+        assert stats["first_render_seconds"] < FIRST_RENDER_BUDGET_SECONDS
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT_DIR)
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode == "import":
+        print(json.dumps(measure_import()))
+    elif mode == "render":
+        # Keep the app's logging off stdout, which carries the result
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(measure_first_render()))
+    else:
+        print(json.dumps({**run_in_subprocess("import"), **run_in_subprocess("render")}, indent=2))
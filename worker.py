@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("paperflux.worker")
+
+from paperflux.src.config.settings import (
+    API_HOST,
+    API_PORT,
+    BACKFILL_MAX_CONCURRENT_DAYS,
+    EXPORT_DIR,
+    METRICS_PORT,
+)
+
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Invalid count '{value}', expected a positive integer")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Run PaperFlux processing jobs outside the Streamlit app"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Serve Prometheus metrics on this local port (0 disables)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Profile the run and write its artifacts under the profiles directory; the CPU profile "
+            "covers the event loop and the uploads and analyses on worker threads"
+        ),
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("process", help="Fetch and analyze today's papers")
+
+    backfill = subparsers.add_parser(
+        "backfill", help="Fetch and analyze the daily papers of past dates"
+    )
+    backfill.add_argument("--start", type=parse_date, required=True, help="First date (YYYY-MM-DD)")
+    backfill.add_argument(
+        "--end",
+        type=parse_date,
+        default=datetime.utcnow().date(),
+        help="Last date, inclusive (YYYY-MM-DD, default: today)",
+    )
+    backfill.add_argument(
+        "--max-concurrent-days",
+        type=positive_int,
+        default=BACKFILL_MAX_CONCURRENT_DAYS,
+        help="How many days to fetch and process at once",
+    )
+    backfill.add_argument(
+        "--llm-budget",
+        type=int,
+        default=None,
+        help="Maximum number of paper analyses for the whole backfill",
+    )
+    subparsers.add_parser(
+        "render-artifacts",
+        help="Pre-render explanations that have no HTML artifact or a stale one",
+    )
+    export = subparsers.add_parser(
+        "export", help="Write new or changed days of the archive to date-partitioned Parquet files"
+    )
+    export.add_argument("--output", default=EXPORT_DIR, help="Export directory")
+    export.add_argument(
+        "--include-today", action="store_true", help="Also export today, which may still be processing"
+    )
+    export.add_argument("--full", action="store_true", help="Rewrite every day, ignoring the manifest")
+    serve_api = subparsers.add_parser(
+        "serve-api", help="Serve the paper list, details and search as a read-only JSON API"
+    )
+    serve_api.add_argument("--host", default=API_HOST, help="Interface to listen on")
+    serve_api.add_argument("--port", type=int, default=API_PORT, help="Port to listen on")
+    return parser
+
+
+def render_artifacts() -> int:
+    """Render the HTML artifact of every paper whose stored one is missing or stale"""
+    from paperflux.src.services.database import DatabaseService
+    from paperflux.src.services.renderer import content_hash, render_explanation
+
+    db = DatabaseService()
+    rendered = 0
+    for doc in db.iter_explanations():
+        if doc.get("explanation_hash") == content_hash(doc["explanation"]):
+            continue
+        artifact = render_explanation(doc["explanation"])
+        db.set_explanation_artifact(doc["paper_id"], artifact["html"], artifact["hash"])
+        rendered += 1
+    logger.info(f"Rendered {rendered} explanation artifacts")
+    return rendered
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.profile:
+        from paperflux.src.services.profiling import enable_profiling
+
+        enable_profiling()
+
+    if args.metrics_port:
+        from paperflux.src.services.metrics import MetricsRegistry
+
+        MetricsRegistry().start_server(args.metrics_port)
+
+    if args.command == "render-artifacts":
+        render_artifacts()
+        return 0
+
+    if args.command == "export":
+        from paperflux.src.services.exporter import ArchiveExporter
+
+        days = ArchiveExporter(export_dir=args.output).export(
+            include_today=args.include_today, full=args.full
+        )
+        logger.info(f"Exported {len(days)} days to {args.output}")
+        return 0
+
+    if args.command == "serve-api":
+        from paperflux.src.services.api import run_api
+
+        run_api(args.host, args.port)
+        return 0
+
+    from paperflux.src.services.paper_processor import PaperProcessor
+
+    processor = PaperProcessor()
+
+    if args.command == "process":
+        success = asyncio.run(processor.process_papers())
+        return 0 if success else 1
+
+    if args.command == "backfill":
+        totals = asyncio.run(
+            processor.backfill(
+                args.start,
+                args.end,
+                max_concurrent_days=args.max_concurrent_days,
+                llm_budget=args.llm_budget,
+            )
+        )
+        if not totals:
+            # Skipped because another run holds the processing lease
+            return 1
+        logger.info(f"Backfill summary: {totals}")
+        return 0
+
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())